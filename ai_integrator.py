@@ -1,47 +1,132 @@
 # ai_integrator.py
 # This module integrates the LLaMa model for humanizing astrological predictions.
+#
+# torch and transformers take seconds to import, so they are imported only inside the
+# functions that run the model. The model itself is loaded and warmed up on a background
+# thread (start_model_loading), letting the app render and compute charts meanwhile.
+#
+# Nothing here depends on a UI framework: the Streamlit app (app.py) and the HTTP
+# service (service.py) both use this module, and each shows loading and errors its own way.
 
-import streamlit as st
-from transformers import AutoModelForCausalLM, AutoTokenizer
-import torch
+import functools
+import logging
 import os
+import time
+from concurrent.futures import Future
+from threading import Event, Thread
+
+from context_builder import ContextStore, ConversationContext
+from model_loading import MODEL_PROFILE_ENV, MODEL_THREADS_ENV, resolve_profile
+from prompt_cache import PromptStateCache
+from response_cache import response_cache, response_key
+from telemetry import record_generation, register_stats, span
+
+logger = logging.getLogger(__name__)
 
 # --- Model Configuration ---
 # IMPORTANT: Using TinyLlama-1.1B-Chat-v1.0 for deployability on free tiers.
 # If you use a larger model, expect memory/size issues.
 MODEL_NAME = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
 # Path to local model if downloaded, otherwise Hugging Face Hub will be used.
-# If you download the model, ensure it's in a path accessible to Streamlit.
+# If you download the model, ensure it's in a path accessible to the app.
 # E.g., MODEL_PATH = "./models/TinyLlama-1.1B-Chat-v1.0"
+# Set JYOTISH_MODEL_DIR to such a directory to load it offline with memory-mapped safetensors.
 
-# --- Global AI Model Loading (Cached) ---
-# @st.cache_resource ensures this function runs only once per app deployment.
-@st.cache_resource
-def load_ai_model():
+# CPU load profile (model_loading.py): fp32 (default), bf16, int8 or auto.
+# int8 cuts the resident footprint to roughly a quarter, so several replicas fit on one box.
+MODEL_PROFILE = resolve_profile(os.environ.get(MODEL_PROFILE_ENV, "fp32"))
+MODEL_THREADS = int(os.environ.get(MODEL_THREADS_ENV, "0")) or None
+# The profile changes the model's outputs, so cached answers are kept per profile.
+MODEL_CACHE_NAME = f"{MODEL_NAME}@{MODEL_PROFILE}"
+
+# --- Global AI Model Loading (Background, Cached) ---
+def _load_and_warm_up():
     """
-    Loads the LLaMa model and tokenizer using Hugging Face Transformers.
-    This function is cached by Streamlit to run only once.
+    Loads the LLaMa model and tokenizer using Hugging Face Transformers, then runs one
+    short generation so the first user does not pay for lazy initialization.
+
+    Returns:
+        tuple: (tokenizer, model, report) with load time, resident memory and tokens/sec.
     """
-    try:
-        # Provide a visual cue to the user that the model is loading
-        with st.spinner(f"Loading AI Astrologer ({MODEL_NAME})... This might take a minute on first run."):
-            tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-            # Use torch_dtype=torch.float16 if you have a GPU or specific quantized models.
-            # Otherwise, it might be safer to omit for CPU-only deployments or small models.
-            # For TinyLlama, the default float32 is fine on CPU, but float16 can reduce RAM.
-            model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32)
-
-            # Ensure model is on CPU if no GPU available (Streamlit Cloud often uses CPU for free tier)
-            if not torch.cuda.is_available():
-                model.to("cpu")
-            
-            st.success(f"AI Astrologer '{MODEL_NAME}' loaded successfully!")
-            return tokenizer, model
-    except Exception as e:
-        st.error(f"Failed to load AI model '{MODEL_NAME}'. Error: {e}")
-        st.info("Possible reasons: Insufficient memory, model too large, network issues during download.")
-        st.info("Consider trying a smaller or quantized model, or upgrading your hosting plan.")
+    import torch
+    from model_loading import load_model, measure_tokens_per_second
+
+    if torch.cuda.is_available():
+        # On a GPU, float16 halves memory with no speed penalty.
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        model = AutoModelForCausalLM.from_pretrained(MODEL_NAME, torch_dtype=torch.float16)
+        model.to("cuda")
+        report = {"profile": "cuda-fp16"}
+    else:
+        # On CPU (Streamlit Cloud free tier), load with the configured profile.
+        tokenizer, model, report = load_model(MODEL_NAME, MODEL_PROFILE, MODEL_THREADS)
+    report["tokens_per_second"] = round(measure_tokens_per_second(tokenizer, model, new_tokens=8), 1)
+    return tokenizer, model, report
+
+
+class _BackgroundModel:
+    """
+    Loads and warms up the model on a daemon thread as soon as it is created.
+    Callers poll `status` and wait with `wait`.
+    """
+
+    def __init__(self):
+        self.tokenizer = None
+        self.model = None
+        self.report = {}
+        self.error = None
+        self._done = Event()
+        Thread(target=self._run, name="model-loader", daemon=True).start()
+
+    def _run(self):
+        try:
+            self.tokenizer, self.model, self.report = _load_and_warm_up()
+            logger.info("Model load report: %s", self.report)
+        except Exception as e:
+            logger.exception("Failed to load AI model '%s'", MODEL_NAME)
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def status(self) -> str:
+        """"loading", "ready" or "failed"."""
+        if not self._done.is_set():
+            return "loading"
+        return "failed" if self.error is not None else "ready"
+
+    def wait(self, timeout: float = None) -> bool:
+        """Blocks until loading finishes (or `timeout` seconds pass); True once finished."""
+        return self._done.wait(timeout)
+
+
+# The cache ensures the model is loaded only once per process.
+@functools.lru_cache(maxsize=None)
+def start_model_loading():
+    """
+    Starts loading the model in the background and returns immediately.
+    Cached, so every session and request shares the one loader.
+    """
+    return _BackgroundModel()
+
+
+def load_ai_model(timeout: float = None):
+    """
+    Returns the loaded (tokenizer, model), waiting for the background load if it is still running.
+
+    Args:
+        timeout (float, optional): Seconds to wait at most; None waits until loading finishes.
+
+    Returns:
+        tuple: (tokenizer, model), or (None, None) if loading failed or is still running after `timeout`.
+    """
+    loader = start_model_loading()
+    loader.wait(timeout)
+    if loader.status != "ready":
         return None, None # Return None if loading fails
+    return loader.tokenizer, loader.model
 
 # --- AI System Prompt ---
 SYSTEM_PROMPT = (
@@ -54,111 +139,402 @@ SYSTEM_PROMPT = (
     "The user will provide raw astrological insights and sometimes follow-up questions."
 )
 
-# --- Humanization Function ---
-def humanize_response(raw_predictions: list, conversation_history: list = None, current_user_query: str = None):
+# --- Generation Settings ---
+# Adjust generation parameters for desired quality/length/creativity.
+# These settings are part of the response cache key, so changing them invalidates cached answers.
+GENERATION_CONFIG = {
+    "max_new_tokens": 400,       # Max length of AI's response
+    "do_sample": True,           # Enable sampling for more creative output
+    "top_k": 50,                 # Consider top 50 most likely tokens
+    "top_p": 0.95,               # Consider tokens that sum up to 95% probability
+    "temperature": 0.7,          # Controls randomness (higher = more random)
+    "num_return_sequences": 1,   # Generate only one sequence
+}
+
+INTERPRETATION_MARKER = "Astrologer's Interpretation:"
+# Generation stops as soon as the model starts writing one of these turns itself.
+STOP_MARKERS = ("User:",)
+# Seconds the UI waits for the next chunk before giving up on a stalled generation.
+STREAM_TIMEOUT_SECONDS = 120.0
+
+# --- Cross-Session Batching ---
+# With JYOTISH_BATCHED_INFERENCE=1, requests from all sessions are grouped into shared
+# generate() calls (inference_scheduler.py). Answers then arrive whole rather than streamed,
+# trading time-to-first-token for throughput when many sessions are active.
+BATCHED_INFERENCE = os.environ.get("JYOTISH_BATCHED_INFERENCE", "0") == "1"
+MAX_BATCH_SIZE = int(os.environ.get("JYOTISH_MAX_BATCH_SIZE", "4"))
+MAX_BATCH_WAIT_SECONDS = float(os.environ.get("JYOTISH_MAX_BATCH_WAIT_MS", "50")) / 1000.0
+
+# Attention state of already-processed prompt prefixes, per chat session (prompt_cache.py).
+prompt_state_cache = PromptStateCache()
+register_stats("prompt_state", prompt_state_cache.stats)
+register_stats("cache", response_cache.stats, cache="responses")
+
+# --- Conversation Context Budget ---
+# Prompt tokens allowed; TinyLlama's 2048-token window minus room for the answer.
+# Older turns beyond the budget are compressed into a rolling summary (context_builder.py).
+PROMPT_TOKEN_BUDGET = int(os.environ.get("JYOTISH_PROMPT_TOKEN_BUDGET", "1600"))
+SUMMARY_TOKEN_BUDGET = int(os.environ.get("JYOTISH_SUMMARY_TOKEN_BUDGET", "256"))
+_context_store = ContextStore()
+
+
+def _conversation_context(session_id: str, tokenizer) -> ConversationContext:
+    """The session's token-budgeted conversation context; a fresh one if there is no session."""
+    def factory():
+        return ConversationContext(
+            lambda text: len(tokenizer(text, add_special_tokens=False)["input_ids"]),
+            budget_tokens=PROMPT_TOKEN_BUDGET,
+            summary_tokens=SUMMARY_TOKEN_BUDGET,
+        )
+    if session_id is None:
+        return factory()
+    return _context_store.get(session_id, factory)
+
+# --- Prompt Engineering for LLaMa ---
+def _format_turn(msg: dict) -> str:
+    """One chat message as a prompt line, formatted for LLM to understand turns."""
+    if msg["role"] == "user":
+        return f"User: {msg['content']}"
+    if msg["role"] == "assistant":
+        # Avoid feeding back the detailed AI generated initial prediction to save token space
+        if "Astrologer's Interpretation:" in msg['content']:
+            # Take only the actual interpretation part
+            interpreted_content = msg['content'].split("Astrologer's Interpretation:", 1)[-1].strip()
+            return f"Astrologer: {interpreted_content}"
+        return f"Astrologer: {msg['content']}" # For subsequent short AI replies
+    return None
+
+
+def build_prompt(raw_predictions: list, conversation_history: list = None, current_user_query: str = None,
+                 context: ConversationContext = None) -> str:
     """
-    Converts raw astrological predictions into human-like, empathetic text using the LLaMa model.
+    Builds the model input from the system prompt, raw insights, past turns and the current query.
 
     Args:
-        raw_predictions (list): A list of raw astrological insights (strings) from the rule matcher.
-        conversation_history (list, optional): List of dicts {"role": "user/assistant", "content": "text"}
-                                              representing past chat for conversational context.
-        current_user_query (str, optional): The user's latest question for follow-up.
+        raw_predictions (list): Raw astrological insights from the rule matcher; for a follow-up
+                                (with `current_user_query`), the insights retrieved for the query.
+        conversation_history (list, optional): Past chat messages, oldest first.
+        current_user_query (str, optional): The user's latest question.
+        context (ConversationContext, optional): Keeps the history within the token budget,
+                                                 absorbing only messages added since its last use.
+                                                 Without it every past message is included.
 
     Returns:
-        str: AI-generated humanized astrological interpretation.
+        str: Prompt text ending with the interpretation marker.
     """
-    # Access the globally loaded tokenizer and model
-    global tokenizer, model
-    if tokenizer is None or model is None:
-        return "AI Astrologer is currently unavailable. Please check the deployment logs."
-
-    # --- Prompt Engineering for LLaMa ---
     prompt_parts = []
 
     # 1. System Instruction (Always first)
     prompt_parts.append(SYSTEM_PROMPT)
 
     # 2. Raw Astrological Insights (if initial prediction)
-    if raw_predictions:
+    if raw_predictions and not current_user_query:
         prompt_parts.append("\n\n--- Astrological Insights to Interpret ---")
         prompt_parts.extend([f"- {pred}" for pred in raw_predictions]) # Format as list
         prompt_parts.append("\n") # Add a newline for separation
 
+    # 4./5. Current User Query (if follow-up) and the final instruction for LLM to start its response
+    tail_parts = []
+    if raw_predictions and current_user_query:
+        # Follow-ups carry the few insights retrieved for this query (insight_retrieval.py). They go
+        # after the history so the session's cached prompt prefix (prompt_cache.py) stays valid.
+        tail_parts.append("--- Chart Insights Relevant to the Query ---")
+        tail_parts.extend([f"- {pred}" for pred in raw_predictions])
+        tail_parts.append("")
+    if current_user_query:
+        tail_parts.append(f"User's Current Query: {current_user_query}")
+        tail_parts.append("") # Add a newline
+    tail_parts.append(INTERPRETATION_MARKER)
+
     # 3. Conversation History (for follow-up context)
     if conversation_history:
+        if context is not None:
+            context.extend(conversation_history, _format_turn)
+            fixed_tokens = context.cached_count("\n".join(prompt_parts)) + context.cached_count("\n".join(tail_parts))
+            summary_lines, turn_lines = context.render(fixed_tokens)
+        else:
+            summary_lines = []
+            turn_lines = [line for line in map(_format_turn, conversation_history) if line]
         prompt_parts.append("\n\n--- Previous Conversation ---")
-        # Include past messages, format for LLM to understand turns
-        # Exclude the very first welcome message if it's generic
-        for msg in conversation_history:
-            if msg["role"] == "user":
-                prompt_parts.append(f"User: {msg['content']}")
-            elif msg["role"] == "assistant":
-                # Avoid feeding back the detailed AI generated initial prediction to save token space
-                # If you need it, you might summarize it or pass a truncated version
-                if "Astrologer's Interpretation:" in msg['content']:
-                    # Take only the actual interpretation part
-                    interpreted_content = msg['content'].split("Astrologer's Interpretation:", 1)[-1].strip()
-                    prompt_parts.append(f"Astrologer: {interpreted_content}")
-                else: # For subsequent short AI replies
-                    prompt_parts.append(f"Astrologer: {msg['content']}")
-        prompt_parts.append("") # Add a newline
-    
-    # 4. Current User Query (if follow-up)
-    if current_user_query:
-        prompt_parts.append(f"User's Current Query: {current_user_query}")
+        if summary_lines:
+            prompt_parts.append("(Summary of earlier conversation)")
+            prompt_parts.extend(summary_lines)
+            prompt_parts.append("(Most recent messages)")
+        prompt_parts.extend(turn_lines)
         prompt_parts.append("") # Add a newline
 
-    # 5. Final instruction for LLM to start its response
-    prompt_parts.append("Astrologer's Interpretation:")
-    
-    input_text = "\n".join(prompt_parts)
+    prompt_parts.extend(tail_parts)
+    return "\n".join(prompt_parts)
+
+
+def _until_marker(chunks, markers=STOP_MARKERS):
+    """
+    Passes streamed text through up to the first turn marker.
+    The last few characters are held back until it is clear they do not begin a marker.
+    """
+    hold = max(len(marker) for marker in markers) - 1
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        cuts = [buffer.find(marker) for marker in markers if marker in buffer]
+        if cuts:
+            if buffer[:min(cuts)]:
+                yield buffer[:min(cuts)]
+            return
+        if len(buffer) > hold:
+            yield buffer[:-hold] if hold else buffer
+            buffer = buffer[-hold:] if hold else ""
+    if buffer:
+        yield buffer
+
 
+def _generate_into(model, streamer, outputs: list, errors: list, **generate_kwargs):
+    """Runs `model.generate` on a worker thread; on failure ends the stream so the reader is not left waiting."""
     try:
-        # Tokenize input and move to appropriate device (CPU/GPU)
+        outputs.append(model.generate(**generate_kwargs, streamer=streamer))
+    except Exception as e:
+        errors.append(e)
+        streamer.end()
+
+
+@functools.lru_cache(maxsize=None)
+def get_inference_scheduler():
+    """
+    The batching scheduler shared by all sessions, created once per process.
+    Returns None if the model failed to load.
+    """
+    tokenizer, model = load_ai_model()
+    if tokenizer is None or model is None:
+        return None
+    from inference_scheduler import InferenceScheduler
+
+    scheduler = InferenceScheduler(tokenizer, model, GENERATION_CONFIG, max_batch_size=MAX_BATCH_SIZE,
+                                   max_wait_seconds=MAX_BATCH_WAIT_SECONDS, stop_markers=STOP_MARKERS)
+    register_stats("scheduler", scheduler.stats)
+    return scheduler
+
+
+def humanize_response_async(raw_predictions: list, conversation_history: list = None, current_user_query: str = None,
+                            session_id: str = None):
+    """
+    Queues a humanization request on the shared batching scheduler.
+    Waits for the background model load if it is still running.
+
+    Args:
+        raw_predictions (list): A list of raw astrological insights (strings) from the rule matcher.
+        conversation_history (list, optional): Past chat messages for conversational context.
+        current_user_query (str, optional): The user's latest question for follow-up.
+        session_id (str, optional): Chat session identifier; keeps the session's conversation
+                                    context between calls so only new messages are processed.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the interpretation text. Already resolved
+                                   when the answer is in the response cache.
+    """
+    cache_key = response_key(MODEL_CACHE_NAME, GENERATION_CONFIG, SYSTEM_PROMPT, raw_predictions, current_user_query,
+                             session_id, conversation_history)
+    with span("llm.cache_lookup") as lookup:
+        cached = response_cache.get(cache_key)
+        lookup.set(hit=cached is not None)
+    if cached is not None:
+        future = Future()
+        future.set_result(cached)
+        return future
+
+    tokenizer, _ = load_ai_model()
+    with span("llm.build_prompt"):
+        context = _conversation_context(session_id, tokenizer) if tokenizer is not None else None
+        input_text = build_prompt(raw_predictions, conversation_history, current_user_query, context)
+    return _submit_batched(cache_key, input_text)
+
+
+def _submit_batched(cache_key: str, input_text: str) -> Future:
+    """Queues a built prompt on the scheduler; the answer is added to the response cache when it arrives."""
+    scheduler = get_inference_scheduler()
+    if scheduler is None:
+        future = Future()
+        future.set_result("AI Astrologer is currently unavailable. Please check the deployment logs.")
+        return future
+
+    future = scheduler.submit(input_text)
+    future.add_done_callback(lambda f: f.exception() is None and response_cache.add(cache_key, f.result()))
+    return future
+
+
+# --- Humanization Function ---
+def humanize_response_stream(raw_predictions: list, conversation_history: list = None, current_user_query: str = None,
+                             session_id: str = None):
+    """
+    Streaming variant of `humanize_response`: yields the interpretation in text chunks
+    while the model is still generating, and stops at the first "User:" turn marker.
+    Answers are served from the response cache (response_cache.py) when the same predictions
+    and question were answered before with the same model and settings (for a follow-up,
+    also in the same session with the same history); a cached answer is yielded as a
+    single chunk.
+
+    Args:
+        raw_predictions (list): A list of raw astrological insights (strings) from the rule matcher.
+        conversation_history (list, optional): List of dicts {"role": "user/assistant", "content": "text"}
+                                              representing past chat for conversational context.
+        current_user_query (str, optional): The user's latest question for follow-up.
+        session_id (str, optional): Chat session identifier. With it, the attention state of the
+                                    prompt is kept so the next turn only prefills the new text.
+
+    Yields:
+        str: Consecutive pieces of the AI-generated interpretation.
+    """
+    with span("llm.humanize", follow_up=current_user_query is not None):
+        yield from _humanize_stream(raw_predictions, conversation_history, current_user_query, session_id)
+
+
+def _humanize_stream(raw_predictions, conversation_history, current_user_query, session_id):
+    cache_key = response_key(MODEL_CACHE_NAME, GENERATION_CONFIG, SYSTEM_PROMPT, raw_predictions, current_user_query,
+                             session_id, conversation_history)
+    with span("llm.cache_lookup") as lookup:
+        cached = response_cache.get(cache_key)
+        lookup.set(hit=cached is not None)
+    if cached is not None:
+        yield cached
+        return
+
+    tokenizer, model = load_ai_model()
+    if tokenizer is None or model is None:
+        yield "AI Astrologer is currently unavailable. Please check the deployment logs."
+        return
+
+    with span("llm.build_prompt"):
+        input_text = build_prompt(raw_predictions, conversation_history, current_user_query,
+                                  _conversation_context(session_id, tokenizer))
+
+    try:
+        if BATCHED_INFERENCE:
+            with span("llm.batched"):
+                yield _submit_batched(cache_key, input_text).result()
+            return
+
+        pieces = []
+        for piece in stream_generation(tokenizer, model, input_text, session_id):
+            pieces.append(piece)
+            yield piece
+        response_cache.add(cache_key, "".join(pieces).strip())
+
+    except Exception as e:
+        logger.exception("Error during AI response generation: %s", e)
+        yield "I apologize, a temporary cosmic disruption prevents me from offering deeper insights right now. Please rephrase your question or try again after a moment."
+
+
+def stream_generation(tokenizer, model, input_text: str, session_id: str = None, state_cache: PromptStateCache = None,
+                      generation_config: dict = None):
+    """
+    Generates the answer to a built prompt, yielding text as the model produces it and
+    stopping at the first turn marker. The attention state of the prompt prefix the
+    session (or the shared system prompt) already went through is reused, so generate()
+    only encodes the rest; the state after this turn is kept for the session's next one.
+    Closing the generator early (or a stream timeout) stops generation at the next token.
+
+    Args:
+        tokenizer: The model's tokenizer.
+        model: The causal LM.
+        input_text (str): Prompt from build_prompt().
+        session_id (str, optional): Chat session identifier; None keeps no state.
+        state_cache (PromptStateCache, optional): Defaults to the process-wide prompt_state_cache.
+        generation_config (dict, optional): Defaults to GENERATION_CONFIG.
+
+    Yields:
+        str: Consecutive pieces of the generated text.
+
+    Raises:
+        Exception: Whatever generation raised.
+    """
+    import torch
+    from transformers import StoppingCriteriaList, TextIteratorStreamer
+    from inference_scheduler import stop_on_marker
+
+    state_cache = prompt_state_cache if state_cache is None else state_cache
+    generation_config = GENERATION_CONFIG if generation_config is None else generation_config
+
+    # Tokenize input and move to appropriate device (CPU/GPU)
+    with span("llm.tokenize") as tokenize:
         inputs = tokenizer(input_text, return_tensors="pt")
         device = "cuda" if torch.cuda.is_available() else "cpu"
         inputs = {key: value.to(device) for key, value in inputs.items()}
         model.to(device) # Ensure model is also on the correct device
+        prompt_tokens = inputs["input_ids"].shape[1]
+        tokenize.set(prompt_tokens=prompt_tokens)
+
+    with span("llm.prefix_reuse") as prefix_reuse:
+        if not state_cache.has_shared_prefix:
+            state_cache.set_shared_prefix(model, tokenizer(SYSTEM_PROMPT)["input_ids"])
+        past_key_values, reused_tokens = state_cache.checkout(session_id, inputs["input_ids"][0].tolist())
+        prefix_reuse.set(reused_tokens=reused_tokens)
 
-        # Generate response
-        # Adjust generation parameters for desired quality/length/creativity
-        output_tokens = model.generate(
+    # Generate on a worker thread; the streamer hands decoded text back as it is produced.
+    # skip_prompt leaves only the new text, so no marker splitting is needed afterwards.
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True,
+                                   timeout=STREAM_TIMEOUT_SECONDS)
+    abort = Event()
+    stopping_criteria = StoppingCriteriaList([stop_on_marker(tokenizer, prompt_tokens, STOP_MARKERS, abort=abort)])
+    outputs, errors = [], []
+    worker = Thread(
+        target=_generate_into,
+        args=(model, streamer, outputs, errors),
+        kwargs=dict(
             **inputs,
-            max_new_tokens=400,          # Max length of AI's response
-            do_sample=True,             # Enable sampling for more creative output
-            top_k=50,                   # Consider top 50 most likely tokens
-            top_p=0.95,                 # Consider tokens that sum up to 95% probability
-            temperature=0.7,            # Controls randomness (higher = more random)
-            num_return_sequences=1,     # Generate only one sequence
+            **generation_config,
+            past_key_values=past_key_values,
+            stopping_criteria=stopping_criteria,
             pad_token_id=tokenizer.eos_token_id, # Handle padding for variable length inputs
             eos_token_id=tokenizer.eos_token_id # Stop generation at end-of-sequence token
-        )
-        response_text = tokenizer.decode(output_tokens[0], skip_special_tokens=True)
-
-        # --- Post-processing AI response ---
-        # This is critical for getting clean output from the LLM.
-        # Often, LLMs will repeat the prompt or add extra conversational filler.
-        # We want to extract only the astrologer's interpretation.
+        ),
+        daemon=True,
+    )
+    finished = False
+    try:
+        with span("llm.generate") as generate:
+            started = time.perf_counter()
+            worker.start()
 
-        # Find the start of the actual interpretation
-        interpretation_start_marker = "Astrologer's Interpretation:"
-        if interpretation_start_marker in response_text:
-            response_text = response_text.split(interpretation_start_marker, 1)[1].strip()
-        else:
-            # Fallback: if marker not found, try to remove the input text itself
-            # This is less precise but works if the model just continues the prompt
-            if response_text.startswith(input_text):
-                response_text = response_text[len(input_text):].strip()
-            # If still not clean, just return what was generated, potentially with warnings.
+            first = True
+            for piece in _until_marker(streamer):
+                if first:
+                    piece = piece.lstrip()
+                    if not piece:
+                        continue
+                    first = False
+                    generate.set(first_chunk_ms=round((time.perf_counter() - started) * 1000.0, 1))
+                yield piece
+            worker.join()
+            finished = True
+            if errors:
+                raise errors[0]
+            record_generation(prompt_tokens, len(outputs[0][0]) - prompt_tokens, time.perf_counter() - started)
+    finally:
+        if not finished and worker.is_alive():
+            # The reader went away (GeneratorExit on a Streamlit rerun or client disconnect) or the
+            # stream timed out: stop generate() at its next step instead of at max_new_tokens.
+            abort.set()
+            worker.join()
+        # The cache matches whatever was generated, so a cut-short turn still leaves reusable state.
+        if outputs and not errors:
+            state_cache.checkin(session_id, outputs[0][0], past_key_values)
 
-        # Remove any lingering system prompts or artifacts that the model might generate
-        response_text = response_text.replace(SYSTEM_PROMPT, "").strip()
-        response_text = response_text.split("User:", 1)[0].strip() # Stop if it starts generating user turn
 
-        return response_text
+def humanize_response(raw_predictions: list, conversation_history: list = None, current_user_query: str = None,
+                      session_id: str = None):
+    """
+    Converts raw astrological predictions into human-like, empathetic text using the LLaMa model.
+    Blocking wrapper around `humanize_response_stream` for callers that need the whole text.
 
-    except Exception as e:
-        st.error(f"Error during AI response generation: {e}")
-        return "I apologize, a temporary cosmic disruption prevents me from offering deeper insights right now. Please rephrase your question or try again after a moment."
+    Args:
+        raw_predictions (list): A list of raw astrological insights (strings) from the rule matcher.
+        conversation_history (list, optional): List of dicts {"role": "user/assistant", "content": "text"}
+                                              representing past chat for conversational context.
+        current_user_query (str, optional): The user's latest question for follow-up.
+        session_id (str, optional): Chat session identifier for prompt-state reuse.
 
+    Returns:
+        str: AI-generated humanized astrological interpretation.
+    """
+    return "".join(
+        humanize_response_stream(raw_predictions, conversation_history, current_user_query, session_id)
+    ).strip()
@@ -3,14 +3,22 @@
 import streamlit as st
 import datetime
 import pytz # Make sure pytz is in requirements.txt
-import sys
-print("Python Path:", sys.path) # <--- ADD THIS LINE FOR DEBUGGING
-# ... rest of your imports and code
+import uuid
 
 # Import your modular components
-from astrology_engine.calculator import calculate_chart
-from astrology_engine.rule_matcher import match_rules, _load_all_rules_cached
-from ai_integrator import humanize_response, load_ai_model # load_ai_model is @st.cache_resource
+from astrology_engine.chart_cache import cache_stats, calculate_chart_cached, match_rules_cached
+from astrology_engine.birth_record import parse_birth_record
+from astrology_engine.rule_matcher import _load_all_rules_cached, rule_load_errors
+from ai_integrator import humanize_response_stream, start_model_loading # start_model_loading is lru_cached: one background loader per process
+from insight_retrieval import index_session, relevant_insights
+from report import get_report_renderer
+from telemetry import configure_from_env, register_stats, span
+
+# Stage timings and metrics (telemetry.py): JYOTISH_TELEMETRY=1 records them, JYOTISH_LOG_FORMAT=json
+# logs traces as JSON, JYOTISH_METRICS_PORT serves them for Prometheus.
+configure_from_env()
+register_stats("cache", lambda: cache_stats()["charts"], cache="charts")
+register_stats("cache", lambda: cache_stats()["predictions"], cache="predictions")
 
 # --- 1. Streamlit Page Configuration ---
 st.set_page_config(
@@ -134,10 +142,22 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# --- 3. Global AI Model Loading (Cached) ---
-# This ensures the model is loaded only once when the app starts,
-# saving time and resources on subsequent interactions.
-tokenizer, model = load_ai_model() # Call the cached function from ai_integrator.py
+# --- 3. Global AI Model Loading (Background, Cached) ---
+# The model is loaded only once when the app starts, on a background thread, so the
+# form renders immediately and charts are calculated while the model is still loading.
+model_loader = start_model_loading() # Returns at once; see ai_integrator.py
+
+
+def wait_for_model():
+    """Shows a spinner until the background model load finishes, and the reason if it failed."""
+    if model_loader.status == "loading":
+        # Provide a visual cue to the user that the model is loading
+        with st.spinner("Loading AI Astrologer... This might take a minute on first run."):
+            model_loader.wait()
+    if model_loader.status == "failed":
+        st.error(f"Failed to load AI model. Error: {model_loader.error}")
+        st.info("Possible reasons: Insufficient memory, model too large, network issues during download.")
+        st.info("Consider trying a smaller or quantized model, or upgrading your hosting plan.")
 
 # --- 4. Session State Initialization ---
 # These variables persist across user interactions.
@@ -151,11 +171,16 @@ if "birth_details_submitted" not in st.session_state:
     st.session_state.birth_details_submitted = False
 if "birth_details" not in st.session_state:
     st.session_state.birth_details = {}
+if "session_id" not in st.session_state:
+    # Identifies this chat to the AI prompt-state cache (prompt_cache.py).
+    st.session_state.session_id = uuid.uuid4().hex
 
 # --- 5. Main Application Logic ---
 
 st.title("JyotishAI 🔮")
 st.subheader("Your AI-Powered Vedic Astrologer & Cosmic Guide")
+if model_loader.status == "loading":
+    st.caption("The AI Astrologer is waking up in the background; you can enter your details meanwhile.")
 
 # Birth Details Form Section
 if not st.session_state.birth_details_submitted:
@@ -170,54 +195,89 @@ if not st.session_state.birth_details_submitted:
         with col2:
             birth_time = st.time_input("Time of Birth (HH:MM)", datetime.time(12, 0), help="Exact time of birth is crucial for accuracy.")
             birth_place = st.text_input("Place of Birth", placeholder="e.g., Mumbai, India", help="City, State, Country of birth.")
-            # For timezone, you would typically need a lookup service or a selectbox
-            # For simplicity, let's assume a default timezone or ask user to input
-            # You'll need to expand this for actual timezone handling in calculator.py
+            # The place is resolved to coordinates and timezone with the offline gazetteer
+            # (astrology_engine/gazetteer.py). These fields are only used if the place is not found.
             timezone_str = st.text_input("Birth Timezone (e.g., Asia/Kolkata)", "Asia/Kolkata", help="Enter standard timezone string.")
+            latitude_text = st.text_input("Latitude (optional)", placeholder="e.g., 19.0760",
+                                          help="Needed only if the place of birth is not found. North is positive.")
+            longitude_text = st.text_input("Longitude (optional)", placeholder="e.g., 72.8777",
+                                           help="Needed only if the place of birth is not found. East is positive.")
 
 
         st.markdown("---") # Visual separator
         submit_button = st.form_submit_button("Unveil My Cosmic Blueprint ✨")
 
+        details = None
         if submit_button:
             # Basic form validation
             if not all([name, gender, birth_date, birth_time, birth_place, timezone_str]):
                 st.error("Please fill in all birth details to proceed.")
-            elif tokenizer is None or model is None:
-                st.warning("AI Astrologer is still loading or failed to load. Please wait a moment or refresh if issue persists.")
+            elif model_loader.status == "failed":
+                st.warning("AI Astrologer failed to load. Please refresh if the issue persists.")
             else:
+                # The same validation as the service and bulk runs (birth_record.py): coordinates
+                # typed in are used as given, otherwise the place must be found in the gazetteer.
                 try:
-                    # Store birth details in session state
-                    st.session_state.birth_details = {
-                        "name": name,
-                        "gender": gender,
-                        "dob": birth_date,
-                        "tob": birth_time,
-                        "pob": birth_place,
-                        "timezone": timezone_str
-                    }
-
-                    with st.spinner("Consulting the celestial archives and calculating your cosmic blueprint..."):
-                        # Step 1: Calculate astrological chart
-                        chart_data = calculate_chart(
-                            name, gender, birth_date, birth_time, birth_place # Add timezone_str if calculator uses it
-                        )
-                        st.write(f"Chart for {name} calculated!") # For debugging
-
-                        # Step 2: Load rules and match them to the chart
-                        # Load rules only once if possible, or pass as argument
-                        all_rules = _load_all_rules_cached() # Now directly callable # Using internal cached function
-                        raw_predictions = match_rules(chart_data, all_rules)
-                        st.write("Raw predictions generated!") # For debugging
-
-                        # Step 3: Humanize predictions with LLaMa
-                        ai_interpretation = humanize_response(raw_predictions)
-                        
-                        # Add initial AI response to chat history
-                        st.session_state.chat_history.append(
-                            {"role": "assistant", "content": ai_interpretation}
-                        )
-                        st.success("Cosmic insights unveiled! Ready to chat.")
+                    with span("place.resolve"):
+                        details = parse_birth_record({
+                            "name": name, "gender": gender, "dob": birth_date.isoformat(),
+                            "tob": birth_time.isoformat(), "pob": birth_place, "timezone": timezone_str,
+                            "latitude": latitude_text, "longitude": longitude_text,
+                        })
+                except ValueError as e:
+                    st.error(f"{e}.")
+            if details is not None:
+                try:
+                    with span("request.submit"):
+                        latitude, longitude = details["latitude"], details["longitude"]
+                        timezone_str = details["timezone_str"]
+                        st.caption(f"Birth place: {latitude:.4f}, {longitude:.4f} ({timezone_str}).")
+
+                        # Store birth details in session state
+                        st.session_state.birth_details = {
+                            "name": name,
+                            "gender": gender,
+                            "dob": birth_date,
+                            "tob": birth_time,
+                            "pob": birth_place,
+                            "timezone": timezone_str,
+                            "latitude": latitude,
+                            "longitude": longitude
+                        }
+
+                        with st.spinner("Consulting the celestial archives and calculating your cosmic blueprint..."):
+                            # Step 1: Calculate astrological chart
+                            # Equivalent birth moments are served from the chart cache.
+                            with span("chart.calculate"):
+                                chart_data = calculate_chart_cached(
+                                    name, gender, birth_date, birth_time, birth_place, timezone_str, latitude, longitude
+                                )
+                            st.session_state.chart_data = chart_data  # summary pages of the PDF report
+
+                            # Step 2: Load rules and match them to the chart
+                            with span("rules.load"):
+                                all_rules = _load_all_rules_cached() # Shared, hot-reloaded rule store
+                            for error in rule_load_errors():
+                                st.error(error)
+                            with span("rules.match") as matching:
+                                raw_predictions = match_rules_cached(chart_data, all_rules)
+                                matching.set(predictions=len(raw_predictions))
+                            # Follow-up questions retrieve the relevant ones instead of resending all.
+                            index_session(st.session_state.session_id, raw_predictions, all_rules, chart_data)
+
+                        # Step 3: Humanize predictions with LLaMa, rendering the text as it is generated
+                        with span("model.wait"):
+                            wait_for_model()
+                        with st.chat_message("assistant"):
+                            ai_interpretation = st.write_stream(
+                                humanize_response_stream(raw_predictions, session_id=st.session_state.session_id)
+                            )
+
+                    # Add initial AI response to chat history
+                    st.session_state.chat_history.append(
+                        {"role": "assistant", "content": ai_interpretation}
+                    )
+                    st.success("Cosmic insights unveiled! Ready to chat.")
 
                     st.session_state.birth_details_submitted = True
                     st.rerun() # Rerun to switch to the chat interface
@@ -248,42 +308,46 @@ if st.session_state.birth_details_submitted:
         with st.chat_message("user"):
             st.markdown(user_query)
         
-        with st.spinner("Consulting the stars for your answer..."):
-            # You might need to formulate a more complex context for LLaMa
-            # by including previous chat messages or initial predictions.
-            # For this example, we'll just pass the current query.
-            ai_response = humanize_response(
-                raw_predictions=[], # You might pass relevant raw predictions based on context
-                conversation_history=st.session_state.chat_history, # Pass history for context
-                current_user_query=user_query
-            )
-            
-            # Add AI response to chat history
-            st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
-            st.rerun() # Rerun to display the new message
+        with span("request.chat"):
+            with span("model.wait"):
+                wait_for_model()
+            with st.chat_message("assistant"):
+                # Only the chart insights relevant to this query are sent (insight_retrieval.py),
+                # which keeps the prompt short and the answer grounded in the chart.
+                # The answer is streamed into the chat bubble as the model generates it.
+                ai_response = st.write_stream(humanize_response_stream(
+                    raw_predictions=relevant_insights(st.session_state.session_id, user_query),
+                    conversation_history=st.session_state.chat_history, # Pass history for context
+                    current_user_query=user_query,
+                    session_id=st.session_state.session_id
+                ))
+
+        # Add AI response to chat history
+        st.session_state.chat_history.append({"role": "assistant", "content": ai_response})
+        st.rerun() # Rerun to display the new message
 
     st.markdown("---")
-    # PDF Download Button (Placeholder - requires actual implementation)
-    # Ensure fpdf2 is installed (pip install fpdf2)
-    # from fpdf import FPDF
-    # @st.cache_data # Cache PDF generation
-    # def generate_pdf(history, details):
-    #     pdf = FPDF()
-    #     pdf.add_page()
-    #     pdf.set_font("Arial", size=12)
-    #     pdf.multi_cell(0, 10, txt=f"Astrology Report for {details['name']}\n\n")
-    #     for msg in history:
-    #         pdf.multi_cell(0, 10, txt=f"{msg['role'].capitalize()}: {msg['content']}\n")
-    #     return pdf.output(dest='S').encode('latin-1')
-
-    # if st.button("Download My Cosmic Report 📄"):
-    #     pdf_data = generate_pdf(st.session_state.chat_history, st.session_state.birth_details)
-    #     st.download_button(
-    #         label="Click to Download PDF",
-    #         data=pdf_data,
-    #         file_name=f"{st.session_state.birth_details['name']}_Astrology_Report.pdf",
-    #         mime="application/pdf"
-    #     )
-    #     st.success("Report ready for download!")
+    # The report is rendered in the background (report.py) whenever the chat changes, so the
+    # download is usually ready by the time it is clicked; unchanged chats are served from cache.
+    report_future = get_report_renderer().submit(
+        st.session_state.session_id, st.session_state.birth_details, st.session_state.chat_history,
+        st.session_state.get("chart_data"),
+    )
+    report_name = f"{st.session_state.birth_details['name']}_Astrology_Report.pdf"
+    if report_future.done() and report_future.exception() is None:
+        st.download_button(
+            label="Download My Cosmic Report 📄",
+            data=report_future.result(),
+            file_name=report_name,
+            mime="application/pdf"
+        )
+    elif report_future.done():
+        st.error(f"Could not prepare the PDF report: {report_future.exception()}")
+    else:
+        st.caption("Your cosmic report is being prepared in the background...")
+        if st.button("Prepare My Cosmic Report 📄"):
+            with st.spinner("Finishing your report..."):
+                report_future.exception()  # waits only for the remaining render time
+            st.rerun()
 
     st.info("💡 Your journey with JyotishAI is confidential and insightful. Feel free to ask more!")
\ No newline at end of file
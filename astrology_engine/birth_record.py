@@ -0,0 +1,82 @@
+# astrology_engine/birth_record.py
+# This module validates birth details arriving as plain records (HTTP request bodies,
+# CSV rows, JSONL lines) and turns them into calculate_chart arguments.
+
+import datetime
+
+import pytz
+
+from astrology_engine.gazetteer import resolve_birth_place
+
+# Fields read from a birth record; CSV input names them in its header row.
+BIRTH_FIELDS = ("name", "gender", "dob", "tob", "pob", "timezone", "latitude", "longitude")
+# Birth years accepted. The ephemeris (astronomy.py) is fitted to 1900-2100 and drifts
+# slowly outside it; far-off dates also overflow the dasha periods' datetimes.
+MIN_BIRTH_YEAR = 1800
+MAX_BIRTH_YEAR = 2200
+
+
+def _blank(value) -> bool:
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def parse_birth_record(record: dict) -> dict:
+    """
+    Validates one birth record.
+
+    Args:
+        record (dict): {"name", "gender", "dob": "YYYY-MM-DD", "tob": "HH:MM[:SS]", "pob",
+                        "timezone" (default UTC), "latitude"/"longitude" (optional)}.
+                       Values may be strings, as read from CSV. Without coordinates the
+                       place is resolved with the offline gazetteer.
+
+    Returns:
+        dict: Keyword arguments for calculate_chart / calculate_chart_cached.
+
+    Raises:
+        ValueError: If a required field is missing or malformed, the date of birth or the
+                    coordinates are out of range, or the place cannot be resolved and no
+                    coordinates were given.
+    """
+    for field in ("dob", "tob"):
+        if _blank(record.get(field)):
+            raise ValueError(f"Missing field '{field}'")
+    try:
+        dob = datetime.date.fromisoformat(str(record["dob"]).strip())
+        tob = datetime.time.fromisoformat(str(record["tob"]).strip())
+    except ValueError as e:
+        raise ValueError(f"Invalid date or time: {e}") from None
+    if not MIN_BIRTH_YEAR <= dob.year <= MAX_BIRTH_YEAR:
+        raise ValueError(f"dob must be between {MIN_BIRTH_YEAR} and {MAX_BIRTH_YEAR}, got {dob.isoformat()}")
+
+    pob = str(record.get("pob") or "").strip()
+    timezone_str = str(record.get("timezone") or "UTC").strip()
+    if not _blank(record.get("latitude")) and not _blank(record.get("longitude")):
+        try:
+            latitude, longitude = float(record["latitude"]), float(record["longitude"])
+        except (TypeError, ValueError):
+            raise ValueError("latitude and longitude must be numbers") from None
+        if not -90.0 <= latitude <= 90.0:
+            raise ValueError(f"latitude must be between -90 and 90, got {latitude}")
+        if not -180.0 <= longitude <= 180.0:
+            raise ValueError(f"longitude must be between -180 and 180, got {longitude}")
+    else:
+        resolved = resolve_birth_place(pob, timezone_str)
+        if resolved["place"] is None:
+            raise ValueError(f"Place of birth '{pob}' not found; give latitude and longitude")
+        latitude, longitude, timezone_str = resolved["latitude"], resolved["longitude"], resolved["timezone"]
+    try:
+        pytz.timezone(timezone_str)
+    except pytz.UnknownTimeZoneError:
+        raise ValueError(f"Unknown timezone '{timezone_str}'") from None
+
+    return {
+        "name": str(record.get("name") or ""),
+        "gender": str(record.get("gender") or ""),
+        "dob": dob,
+        "tob": tob,
+        "pob": pob,
+        "timezone_str": timezone_str,
+        "latitude": latitude,
+        "longitude": longitude,
+    }
@@ -1,14 +1,89 @@
 # astrology_engine/calculator.py
-# This module contains functions for core astrological calculations using PySwisseph.
+# This module contains functions for core astrological calculations; positions come from
+# astronomy.py (or the precomputed table in ephemeris_table.py).
 
 import datetime
-# import swisseph as se # Uncomment and use after pyswisseph is fully installed and configured
 
-def calculate_chart(name: str, gender: str, dob: datetime.date, tob: datetime.time, pob: str, timezone_str: str = "UTC"):
+import numpy as np
+import pytz
+
+from astrology_engine import astronomy, divisional, doshas, ephemeris_table
+from astrology_engine.dasha import VimshottariDasha
+from astrology_engine.panchang import panchang_at
+from astrology_engine.astronomy import PLANETS, ZODIAC_SIGNS
+
+# Points carried through the divisional charts: the nine grahas plus the Ascendant.
+CHART_POINTS = PLANETS + ("Ascendant",)
+
+
+def _to_utc(dob: datetime.date, tob: datetime.time, timezone_str: str) -> datetime.datetime:
+    """Converts a local birth date/time in an IANA timezone to a naive UTC datetime."""
+    local_moment = pytz.timezone(timezone_str).localize(datetime.datetime.combine(dob, tob))
+    return local_moment.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def calculate_chart_batch(birth_moments_utc, latitudes, longitudes):
+    """
+    Calculates D1 positions for a whole batch of births in one vectorized pass.
+    This is the same computation `calculate_chart` performs for a single person,
+    so both paths always agree. Positions come from the precomputed ephemeris table
+    when it has been built and covers every instant (see ephemeris_table.py).
+
+    Args:
+        birth_moments_utc (array-like): Birth instants in UTC (naive `datetime.datetime`
+                                        objects, ISO strings or `datetime64` values), shape (n,).
+        latitudes (array-like): Geographic latitudes in degrees, north positive, shape (n,).
+        longitudes (array-like): Geographic longitudes in degrees, east positive, shape (n,).
+
+    Returns:
+        dict: NumPy arrays for the batch:
+              - "jd_ut": Julian Days (UT), shape (n,)
+              - "longitudes": sidereal longitudes, shape (n, 9), columns ordered as PLANETS
+              - "speeds": daily motion in degrees (negative = retrograde), shape (n, 9)
+              - "signs": sign indices (0 = Aries), shape (n, 9)
+              - "ascendant": sidereal Ascendant longitude, shape (n,)
+              - "ascendant_sign": Ascendant sign index, shape (n,)
+              - "divisional_signs": int8 sign indices of every varga, shape (n, 10, len(divisional.VARGAS)),
+                                    points ordered as CHART_POINTS, vargas as divisional.VARGAS
+    """
+    jd_ut = astronomy.datetime64_to_jd(np.atleast_1d(birth_moments_utc))
+    latitudes = np.broadcast_to(np.asarray(latitudes, dtype=np.float64), jd_ut.shape)
+    longitudes = np.broadcast_to(np.asarray(longitudes, dtype=np.float64), jd_ut.shape)
+
+    planet_longitudes, planet_speeds = ephemeris_table.sidereal_positions(jd_ut)
+    ascendant = astronomy.sidereal_ascendant(jd_ut, latitudes, longitudes)
+    point_longitudes = np.concatenate([planet_longitudes, ascendant[:, None]], axis=1)
+    return {
+        "jd_ut": jd_ut,
+        "longitudes": planet_longitudes,
+        "speeds": planet_speeds,
+        "signs": astronomy.sign_index(planet_longitudes),
+        "ascendant": ascendant,
+        "ascendant_sign": astronomy.sign_index(ascendant),
+        "divisional_signs": divisional.divisional_signs(point_longitudes),
+    }
+
+
+def _position_entry(longitude: float, speed: float = None) -> dict:
+    entry = {
+        "sign": ZODIAC_SIGNS[int(longitude // 30.0)],
+        "degree": round(longitude % 30.0, 2),
+        "longitude": longitude,
+    }
+    if speed is not None:
+        entry["speed"] = speed
+        entry["retrograde"] = speed < 0
+    return entry
+
+
+def calculate_chart(name: str, gender: str, dob: datetime.date, tob: datetime.time, pob: str, timezone_str: str = "UTC",
+                    latitude: float = 0.0, longitude: float = 0.0):
     """
-    MOCK FUNCTION: Replace with your actual PySwisseph calculations.
     Calculates astrological chart details (planetary positions, houses, dashas, etc.)
     based on birth information.
+    Planetary positions, the Ascendant, divisional charts, Vimshottari Mahadashas and
+    the birth panchang are computed (sidereal, Lahiri ayanamsa). Doshas and yogas are detected
+    in the D1 chart (see doshas.py).
 
     Args:
         name (str): Full name.
@@ -17,66 +92,57 @@ def calculate_chart(name: str, gender: str, dob: datetime.date, tob: datetime.ti
         tob (datetime.time): Time of birth.
         pob (str): Place of birth (e.g., "Kolkata, India").
         timezone_str (str): IANA timezone string (e.g., "Asia/Kolkata", "America/New_York").
+        latitude (float): Latitude of the place of birth in degrees, north positive.
+        longitude (float): Longitude of the place of birth in degrees, east positive.
 
     Returns:
         dict: A dictionary containing calculated chart data.
-              In your actual implementation, this will include precise astrological points.
     """
-    # --- Placeholder Logic for Demonstration ---
-    # In a real scenario, you'd use pyswisseph here to:
-    # 1. Convert DOB/TOB/POB to Julian Day (JD) for Swiss Ephemeris.
-    #    You'd need a robust way to convert place names to lat/lon/timezone offset.
-    # 2. Calculate planetary positions for D1, D9, etc.
-    # 3. Calculate house cusps.
-    # 4. Determine Vimshottari Dasha periods.
-    # 5. Check for basic yogas/doshas based on planetary placements.
-
-    # Mock data to allow app.py to run immediately
-    mock_chart_data = {
+    # Resolve `pob` to coordinates and timezone with gazetteer.py before calling; without them
+    # the Ascendant is for 0°N 0°E. Planetary longitudes do not depend on the location.
+    birth_utc = _to_utc(dob, tob, timezone_str)
+    batch = calculate_chart_batch([birth_utc], [latitude], [longitude])
+
+    planet_positions = {
+        planet: _position_entry(float(batch["longitudes"][0, i]), float(batch["speeds"][0, i]))
+        for i, planet in enumerate(PLANETS)
+    }
+    planet_positions["Ascendant"] = _position_entry(float(batch["ascendant"][0]))
+
+    # Mahadashas only; Antardashas and Pratyantars are expanded on demand (see dasha.py).
+    dasha = VimshottariDasha(planet_positions["Moon"]["longitude"], float(batch["jd_ut"][0]))
+
+    # D1 sign of every point, columns in CHART_POINTS order (== doshas.POINTS).
+    d1_signs = batch["divisional_signs"][0, :, divisional.VARGAS.index(1)].tolist()
+
+    chart_data = {
         "birth_details": {
             "name": name,
             "gender": gender,
             "dob": dob.isoformat(),
             "tob": tob.isoformat(),
             "pob": pob,
-            "timezone": timezone_str
-        },
-        "planet_positions": {
-            "Sun": {"sign": "Aries", "degree": 15.23},
-            "Moon": {"sign": "Cancer", "degree": 22.78},
-            "Mars": {"sign": "Leo", "degree": 5.11},
-            "Mercury": {"sign": "Taurus", "degree": 28.01},
-            "Jupiter": {"sign": "Scorpio", "degree": 10.99},
-            "Venus": {"sign": "Gemini", "degree": 7.45},
-            "Saturn": {"sign": "Aquarius", "degree": 1.67},
-            "Rahu": {"sign": "Libra", "degree": 8.00}, # North Node
-            "Ketu": {"sign": "Aries", "degree": 8.00}, # South Node
-            "Ascendant": {"sign": "Virgo", "degree": 20.50},
-            # Add other important points like MC, fortune, etc.
+            "timezone": timezone_str,
+            "latitude": latitude,
+            "longitude": longitude,
+            "utc": birth_utc.isoformat(),
         },
-        "dasha_periods": [
-            {"planet": "Moon", "start_year": dob.year, "end_year": dob.year + 6},
-            {"planet": "Mars", "start_year": dob.year + 6, "end_year": dob.year + 13},
-            {"planet": "Rahu", "start_year": dob.year + 13, "end_year": dob.year + 31},
-            {"planet": "Jupiter", "start_year": dob.year + 31, "end_year": dob.year + 47},
-            # This is a highly simplified example, actual dashas are complex
-        ],
-        "basic_panchang": {
-            "tithi": "Shukla Paksha Dashami",
-            "nakshatra": "Purva Phalguni",
-            "yoga": "Shukla",
-            "karana": "Garija"
+        "planet_positions": planet_positions,
+        "divisional_charts": {
+            "vargas": list(divisional.VARGAS),
+            "points": list(CHART_POINTS),
+            "signs": batch["divisional_signs"][0].tolist(),
         },
-        "doshas": [
-            {"type": "Mangal Dosha", "present": True, "details": "Mars in 7th house from Lagna"},
-            # Add more detailed dosha analysis
-        ]
+        "dasha_periods": [period.to_dict() for period in dasha.mahadashas()],
+        "basic_panchang": panchang_at(planet_positions["Sun"]["longitude"], planet_positions["Moon"]["longitude"]),
+        "doshas": doshas.detect_doshas(d1_signs),
     }
-    return mock_chart_data
+    return chart_data
 
 if __name__ == '__main__':
     # Example usage for direct testing of this module
     dob_test = datetime.date(1990, 5, 15)
     tob_test = datetime.time(10, 30)
-    chart = calculate_chart("Test User", "Female", dob_test, tob_test, "New Delhi, India", "Asia/Kolkata")
-    print(f"Generated Mock Chart:\n{chart}")
+    chart = calculate_chart("Test User", "Female", dob_test, tob_test, "New Delhi, India", "Asia/Kolkata",
+                            latitude=28.6139, longitude=77.2090)
+    print(f"Generated Chart:\n{chart}")
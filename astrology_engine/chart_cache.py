@@ -0,0 +1,99 @@
+# astrology_engine/chart_cache.py
+# This module caches chart and raw-prediction results so that repeated submits of
+# the same birth moment (page refreshes, family members re-entering a parent's
+# details, A/B runs of the AI text) skip `calculate_chart` and `match_rules`.
+#
+# Results are kept in a TwoTierCache (result_cache.py): a bounded in-process LRU,
+# optionally backed by a SQLite file shared by all workers. Keys are built from
+# the normalized UTC instant, coordinates and ayanamsa, never from raw form strings,
+# so "Asia/Kolkata 10:30" and "UTC 05:00" on the same day hit the same entry.
+
+import datetime
+import hashlib
+import os
+
+from astrology_engine.astronomy import AYANAMSA
+from astrology_engine.calculator import _to_utc, calculate_chart
+from astrology_engine.doshas import default_catalogue
+from astrology_engine.result_cache import TwoTierCache
+from astrology_engine.rule_matcher import get_rule_index, match_rules
+
+# Set to a file path to enable the on-disk tier, e.g. /var/cache/jyotish/charts.sqlite3.
+CACHE_DB_ENV = "JYOTISH_CHART_CACHE_DB"
+# Coordinates are rounded to 4 decimals (about 11 m), far below any astrological effect.
+_COORDINATE_DECIMALS = 4
+
+
+def chart_key(birth_utc: datetime.datetime, latitude: float, longitude: float, ayanamsa: str = AYANAMSA) -> str:
+    """
+    Normalized cache key for a birth moment.
+
+    Args:
+        birth_utc (datetime.datetime): Naive UTC birth instant.
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees.
+        ayanamsa (str): Ayanamsa used for sidereal positions.
+
+    Returns:
+        str: e.g. "1990-05-15T05:00:00|28.6139|77.2090|lahiri".
+    """
+    return (f"{birth_utc.replace(microsecond=0).isoformat()}"
+            f"|{round(float(latitude), _COORDINATE_DECIMALS):.{_COORDINATE_DECIMALS}f}"
+            f"|{round(float(longitude), _COORDINATE_DECIMALS):.{_COORDINATE_DECIMALS}f}"
+            f"|{ayanamsa}")
+
+
+_chart_cache = TwoTierCache("charts", maxsize=2048, disk_path=os.environ.get(CACHE_DB_ENV))
+_prediction_cache = TwoTierCache("predictions", maxsize=2048, disk_path=os.environ.get(CACHE_DB_ENV))
+
+
+def calculate_chart_cached(name: str, gender: str, dob: datetime.date, tob: datetime.time, pob: str,
+                           timezone_str: str = "UTC", latitude: float = 0.0, longitude: float = 0.0):
+    """
+    Same as `calculate_chart`, but reuses the result for an equivalent birth moment.
+    Personal details (name, gender, place text, timezone) are refreshed from the
+    arguments on every hit, only the computed chart is shared.
+    """
+    birth_utc = _to_utc(dob, tob, timezone_str)
+    # Charts embed the detected doshas, so a catalogue edit must not hit charts cached before it.
+    key = f"{chart_key(birth_utc, latitude, longitude)}|{default_catalogue().fingerprint[:12]}"
+    chart_data = _chart_cache.get(key)
+    if chart_data is None:
+        chart_data = calculate_chart(name, gender, dob, tob, pob, timezone_str, latitude, longitude)
+        _chart_cache.put(key, chart_data)
+    chart_data["birth_details"].update({
+        "name": name,
+        "gender": gender,
+        "dob": dob.isoformat(),
+        "tob": tob.isoformat(),
+        "pob": pob,
+        "timezone": timezone_str,
+    })
+    chart_data["birth_details"]["cache_key"] = key
+    return chart_data
+
+
+def match_rules_cached(chart_data: dict, rules, on_date: datetime.date = None):
+    """
+    Same as `match_rules`, but reuses raw predictions for the same chart, name,
+    rule contents and day (the active dasha depends on the date).
+    """
+    details = chart_data["birth_details"]
+    key = details.get("cache_key")
+    if key is None:
+        return match_rules(chart_data, rules, on_date)
+    on_date = on_date or datetime.date.today()
+    fingerprint = get_rule_index(rules).fingerprint
+    prediction_key = hashlib.sha1(
+        f"{key}|{details['name']}|{fingerprint}|{on_date.isoformat()}".encode("utf-8")
+    ).hexdigest()
+    raw_predictions = _prediction_cache.get(prediction_key)
+    if raw_predictions is None:
+        raw_predictions = match_rules(chart_data, rules, on_date)
+        _prediction_cache.put(prediction_key, raw_predictions)
+    return raw_predictions
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the chart and prediction caches."""
+    return {"charts": _chart_cache.stats(), "predictions": _prediction_cache.stats()}
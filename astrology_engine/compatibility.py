@@ -0,0 +1,313 @@
+# astrology_engine/compatibility.py
+# This module scores marriage compatibility with the Ashtakoota (guna milan) system
+# and searches large candidate pools for the best matches.
+#
+# Every one of the eight kootas depends only on the Moon's nakshatra and sign of the
+# two people, and both follow from the Moon's pada (108 padas of 3°20', 4 per
+# nakshatra, 9 per sign). So all 108 x 108 boy/girl combinations are scored once at
+# import, in half-points to fit uint8 (36 gunas = 72). Pada rather than nakshatra
+# resolution is needed for the Nadi exception (same nakshatra, different pada).
+#
+# A CandidatePool keeps each candidate as one uint8 pada, one int8 gender and one
+# Mangal Dosha flag. Scoring a profile against the pool is a single gather of the
+# profile's row (or column) of the table by the pool's padas; top-k selection uses
+# argpartition, so 100k candidates take well under a millisecond to score.
+
+import numpy as np
+
+from astrology_engine.astronomy import PLANETS, ZODIAC_SIGNS
+from astrology_engine.doshas import mangal_dosha_mask
+
+PADAS = 108
+PADA_SPAN = 360.0 / PADAS
+MAX_GUNAS = 36
+
+KOOTAS = ("varna", "vashya", "tara", "yoni", "graha_maitri", "gana", "bhakoot", "nadi")
+KOOTA_MAX_POINTS = {"varna": 1, "vashya": 2, "tara": 3, "yoni": 4, "graha_maitri": 5, "gana": 6, "bhakoot": 7,
+                    "nadi": 8}
+
+GENDER_CODES = {"male": 0, "female": 1}
+_UNKNOWN_GENDER = -1
+
+# --- Koota definitions (signs indexed from Aries, nakshatras from Ashwini) ---
+
+# Varna by sign: 3 Brahmin (water), 2 Kshatriya (fire), 1 Vaishya (earth), 0 Shudra (air).
+_SIGN_VARNA = (2, 1, 0, 3, 2, 1, 0, 3, 2, 1, 0, 3)
+
+# Vashya group by sign: 0 Chatushpada, 1 Manava, 2 Jalachara, 3 Vanachara, 4 Keeta.
+# Sagittarius and Capricorn, which the texts split mid-sign, take their first half's group.
+_SIGN_VASHYA = (0, 0, 1, 2, 3, 1, 1, 4, 1, 0, 1, 2)
+_VASHYA_POINTS = (
+    (2.0, 1.0, 1.0, 0.5, 1.0),
+    (1.0, 2.0, 0.5, 0.0, 1.0),
+    (1.0, 0.5, 2.0, 1.0, 1.0),
+    (0.5, 0.0, 1.0, 2.0, 0.0),
+    (1.0, 1.0, 1.0, 0.0, 2.0),
+)
+
+# Yoni animal by nakshatra: 0 Horse, 1 Elephant, 2 Sheep, 3 Serpent, 4 Dog, 5 Cat, 6 Rat,
+# 7 Cow, 8 Buffalo, 9 Tiger, 10 Deer, 11 Monkey, 12 Mongoose, 13 Lion.
+_NAKSHATRA_YONI = (0, 1, 2, 3, 3, 4, 5, 2, 5, 6, 6, 7, 8, 9, 8, 9, 10, 10, 4, 11, 12, 11, 13, 0, 13, 7, 1)
+_YONI_POINTS = (
+    (4, 2, 2, 3, 2, 2, 2, 1, 0, 1, 3, 3, 2, 1),
+    (2, 4, 3, 3, 2, 2, 2, 2, 3, 1, 2, 3, 2, 0),
+    (2, 3, 4, 2, 1, 2, 1, 3, 3, 1, 2, 0, 3, 1),
+    (3, 3, 2, 4, 2, 1, 1, 1, 1, 2, 2, 2, 0, 2),
+    (2, 2, 1, 2, 4, 2, 1, 2, 2, 1, 0, 2, 1, 1),
+    (2, 2, 2, 1, 2, 4, 0, 2, 2, 1, 3, 3, 2, 1),
+    (2, 2, 1, 1, 1, 0, 4, 2, 2, 2, 2, 2, 1, 2),
+    (1, 2, 3, 1, 2, 2, 2, 4, 3, 0, 3, 2, 2, 1),
+    (0, 3, 3, 1, 2, 2, 2, 3, 4, 1, 2, 2, 2, 1),
+    (1, 1, 1, 2, 1, 1, 2, 0, 1, 4, 1, 1, 2, 1),
+    (3, 2, 2, 2, 0, 3, 2, 3, 2, 1, 4, 2, 2, 1),
+    (3, 3, 0, 2, 2, 3, 2, 2, 2, 1, 2, 4, 3, 2),
+    (2, 2, 3, 0, 1, 2, 1, 2, 2, 2, 2, 3, 4, 2),
+    (1, 0, 1, 2, 1, 1, 2, 1, 1, 1, 1, 2, 2, 4),
+)
+
+# Graha Maitri: sign lords and their natural friendships.
+_SIGN_LORD = ("Mars", "Venus", "Mercury", "Moon", "Sun", "Mercury", "Venus", "Mars", "Jupiter", "Saturn",
+              "Saturn", "Jupiter")
+_FRIENDS = {
+    "Sun": {"Moon", "Mars", "Jupiter"},
+    "Moon": {"Sun", "Mercury"},
+    "Mars": {"Sun", "Moon", "Jupiter"},
+    "Mercury": {"Sun", "Venus"},
+    "Jupiter": {"Sun", "Moon", "Mars"},
+    "Venus": {"Mercury", "Saturn"},
+    "Saturn": {"Mercury", "Venus"},
+}
+_ENEMIES = {
+    "Sun": {"Venus", "Saturn"},
+    "Moon": set(),
+    "Mars": {"Mercury"},
+    "Mercury": {"Moon"},
+    "Jupiter": {"Mercury", "Venus"},
+    "Venus": {"Sun", "Moon"},
+    "Saturn": {"Sun", "Moon", "Mars"},
+}
+# Points by the two lords' attitudes to each other (2 friend, 1 neutral, 0 enemy), unordered.
+_MAITRI_POINTS = {(2, 2): 5.0, (1, 2): 4.0, (1, 1): 3.0, (0, 2): 1.0, (0, 1): 0.5, (0, 0): 0.0}
+
+# Gana by nakshatra: 0 Deva, 1 Manushya, 2 Rakshasa. Points indexed [boy][girl].
+_NAKSHATRA_GANA = (0, 1, 2, 1, 0, 1, 0, 0, 2, 2, 1, 1, 0, 2, 0, 2, 0, 2, 2, 1, 1, 0, 2, 2, 1, 1, 0)
+_GANA_POINTS = (
+    (6.0, 6.0, 0.0),
+    (5.0, 6.0, 0.0),
+    (1.0, 0.0, 6.0),
+)
+
+# Bhakoot: Moon sign distances (counted from the boy's sign, 1 = same sign) that score nothing.
+_BHAKOOT_DOSHA_DISTANCES = {2, 12, 5, 9, 6, 8}
+
+# Nadi by nakshatra: 0 Aadi, 1 Madhya, 2 Antya, in the repeating order A M An An M A.
+_NAKSHATRA_NADI = tuple((0, 1, 2, 2, 1, 0)[n % 6] for n in range(27))
+
+
+def _attitude(lord: str, other: str) -> int:
+    if lord == other or other in _FRIENDS[lord]:
+        return 2
+    return 0 if other in _ENEMIES[lord] else 1
+
+
+def _koota_points(boy_pada: int, girl_pada: int) -> tuple:
+    """Points of every koota for one boy/girl pada pair, in KOOTAS order."""
+    boy_nakshatra, girl_nakshatra = boy_pada // 4, girl_pada // 4
+    boy_sign, girl_sign = boy_pada // 9, girl_pada // 9
+
+    varna = 1.0 if _SIGN_VARNA[boy_sign] >= _SIGN_VARNA[girl_sign] else 0.0
+    vashya = _VASHYA_POINTS[_SIGN_VASHYA[boy_sign]][_SIGN_VASHYA[girl_sign]]
+    # Tara: the count from one nakshatra to the other, taken mod 9, is inauspicious at 3, 5 and 7.
+    tara = sum(1.5 for count in ((boy_nakshatra - girl_nakshatra) % 27, (girl_nakshatra - boy_nakshatra) % 27)
+               if (count + 1) % 9 not in (3, 5, 7))
+    yoni = float(_YONI_POINTS[_NAKSHATRA_YONI[boy_nakshatra]][_NAKSHATRA_YONI[girl_nakshatra]])
+    boy_lord, girl_lord = _SIGN_LORD[boy_sign], _SIGN_LORD[girl_sign]
+    maitri = _MAITRI_POINTS[tuple(sorted((_attitude(boy_lord, girl_lord), _attitude(girl_lord, boy_lord))))]
+    gana = _GANA_POINTS[_NAKSHATRA_GANA[boy_nakshatra]][_NAKSHATRA_GANA[girl_nakshatra]]
+    bhakoot = 0.0 if (girl_sign - boy_sign) % 12 + 1 in _BHAKOOT_DOSHA_DISTANCES else 7.0
+    # Nadi Dosha is cancelled when both Moons share a nakshatra but not its pada.
+    same_nadi = _NAKSHATRA_NADI[boy_nakshatra] == _NAKSHATRA_NADI[girl_nakshatra]
+    nadi = 0.0 if same_nadi and not (boy_nakshatra == girl_nakshatra and boy_pada != girl_pada) else 8.0
+    return varna, vashya, tara, yoni, maitri, gana, bhakoot, nadi
+
+
+def _build_tables():
+    kootas = np.zeros((len(KOOTAS), PADAS, PADAS), dtype=np.uint8)
+    for boy in range(PADAS):
+        for girl in range(PADAS):
+            kootas[:, boy, girl] = [int(points * 2) for points in _koota_points(boy, girl)]
+    return kootas
+
+
+# Half-points, indexed [koota, boy pada, girl pada]; TOTAL_TABLE sums the kootas.
+KOOTA_TABLES = _build_tables()
+TOTAL_TABLE = KOOTA_TABLES.sum(axis=0, dtype=np.uint8)
+# Girl-major copy, so a female profile's scores are also read from one contiguous row.
+_TOTAL_TABLE_BY_GIRL = np.ascontiguousarray(TOTAL_TABLE.T)
+
+
+def moon_pada(moon_longitude):
+    """Pada index (0-107) of sidereal Moon longitudes; accepts scalars or arrays."""
+    padas = (np.asarray(moon_longitude, dtype=np.float64) % 360.0) // PADA_SPAN
+    return np.minimum(padas, PADAS - 1).astype(np.uint8)
+
+
+def gender_code(gender: str) -> int:
+    """0 for male, 1 for female, -1 for anything else."""
+    return GENDER_CODES.get(str(gender).strip().lower(), _UNKNOWN_GENDER)
+
+
+def chart_profile(chart_data: dict) -> dict:
+    """
+    The values guna milan needs from a chart (calculator.py output).
+
+    Returns:
+        dict: {"pada", "gender" (code), "mangal" (bool)}.
+    """
+    positions = chart_data["planet_positions"]
+    signs = {point: ZODIAC_SIGNS.index(positions[point]["sign"]) for point in ("Mars", "Moon", "Ascendant")}
+    return {
+        "pada": int(moon_pada(positions["Moon"]["longitude"])),
+        "gender": gender_code(chart_data["birth_details"].get("gender", "")),
+        "mangal": bool(mangal_dosha_mask(signs["Mars"], signs["Ascendant"], signs["Moon"])),
+    }
+
+
+def guna_milan(boy: dict, girl: dict) -> dict:
+    """
+    Ashtakoota score of one couple.
+
+    Args:
+        boy (dict): The man's chart (calculator.py output) or chart_profile().
+        girl (dict): The woman's chart or chart_profile().
+
+    Returns:
+        dict: {"total": gunas out of 36, "kootas": {koota: points}}.
+    """
+    boy_pada = (boy if "pada" in boy else chart_profile(boy))["pada"]
+    girl_pada = (girl if "pada" in girl else chart_profile(girl))["pada"]
+    points = KOOTA_TABLES[:, boy_pada, girl_pada] / 2.0
+    return {"total": float(points.sum()), "kootas": dict(zip(KOOTAS, points.tolist()))}
+
+
+class CandidatePool:
+    """
+    A searchable pool of profiles stored as compact arrays.
+
+    Args:
+        ids (array-like): Candidate identifiers, shape (n,).
+        padas (array-like): Moon pada indices (0-107), shape (n,).
+        genders (array-like): Gender codes (see gender_code), shape (n,).
+        mangal (array-like): Mangal Dosha flags, shape (n,).
+    """
+
+    def __init__(self, ids, padas, genders, mangal):
+        self.ids = np.asarray(ids)
+        self.padas = np.asarray(padas, dtype=np.uint8)
+        self.genders = np.asarray(genders, dtype=np.int8)
+        self.mangal = np.asarray(mangal, dtype=bool)
+        if not (len(self.ids) == len(self.padas) == len(self.genders) == len(self.mangal)):
+            raise ValueError("ids, padas, genders and mangal must have the same length")
+
+    def __len__(self):
+        return len(self.padas)
+
+    @classmethod
+    def from_charts(cls, charts: list, ids: list = None) -> "CandidatePool":
+        """Pool of calculator.py charts; ids default to the chart positions."""
+        profiles = [chart_profile(chart_data) for chart_data in charts]
+        return cls(ids if ids is not None else np.arange(len(profiles)),
+                   [p["pada"] for p in profiles], [p["gender"] for p in profiles], [p["mangal"] for p in profiles])
+
+    @classmethod
+    def from_batch(cls, batch: dict, ids, genders) -> "CandidatePool":
+        """
+        Pool built straight from a calculate_chart_batch() result, without per-chart dicts.
+
+        Args:
+            batch (dict): calculate_chart_batch() output for the candidates.
+            ids (array-like): Candidate identifiers.
+            genders (array-like): Gender codes or gender strings.
+        """
+        genders = np.asarray(genders)
+        if genders.dtype.kind in "UO":
+            genders = np.array([gender_code(g) for g in genders], dtype=np.int8)
+        signs = batch["signs"]
+        mangal = mangal_dosha_mask(signs[:, PLANETS.index("Mars")], batch["ascendant_sign"],
+                                   signs[:, PLANETS.index("Moon")])
+        return cls(ids, moon_pada(batch["longitudes"][:, PLANETS.index("Moon")]), genders, mangal)
+
+    def save(self, path):
+        """Writes the pool to a .npz file."""
+        np.savez(path, ids=self.ids, padas=self.padas, genders=self.genders, mangal=self.mangal)
+
+    @classmethod
+    def load(cls, path) -> "CandidatePool":
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["ids"], data["padas"], data["genders"], data["mangal"])
+
+    def scores(self, profile: dict):
+        """
+        Half-point Ashtakoota scores (uint8, 0-72) of every candidate with `profile`, who is
+        read as the boy of each couple if male and as the girl if female.
+        """
+        if profile["gender"] == GENDER_CODES["male"]:
+            return TOTAL_TABLE[profile["pada"]][self.padas]
+        if profile["gender"] == GENDER_CODES["female"]:
+            return _TOTAL_TABLE_BY_GIRL[profile["pada"]][self.padas]
+        raise ValueError("Guna milan needs the profile's gender to be Male or Female")
+
+    def top_matches(self, profile: dict, k: int = 10, min_gunas: float = 18.0, mangal_filter: bool = False) -> list:
+        """
+        The best-scoring candidates of the opposite gender.
+
+        Args:
+            profile (dict): chart_profile() of the person searching (or their chart).
+            k (int): Maximum number of matches.
+            min_gunas (float): Minimum total out of 36 (18 is the customary threshold).
+            mangal_filter (bool): Keep only candidates whose Mangal Dosha status equals the profile's.
+
+        Returns:
+            list[dict]: {"id", "gunas", "kootas": {koota: points}, "mangal"}, best first;
+                        equal scores keep pool order.
+        """
+        if "pada" not in profile:
+            profile = chart_profile(profile)
+        scores = self.scores(profile)
+        eligible = self.genders == 1 - profile["gender"]
+        if mangal_filter:
+            eligible &= self.mangal == profile["mangal"]
+        eligible &= scores >= min_gunas * 2
+
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > k:
+            # Score first, pool position second, so ties at the cut are resolved deterministically.
+            keys = scores[candidates].astype(np.int64) * len(self) - candidates
+            candidates = candidates[np.argpartition(-keys, k - 1)[:k]]
+        best = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+
+        male = profile["gender"] == GENDER_CODES["male"]
+        boys = np.full(len(best), profile["pada"]) if male else self.padas[best]
+        girls = self.padas[best] if male else np.full(len(best), profile["pada"])
+        kootas = KOOTA_TABLES[:, boys, girls] / 2.0
+        return [
+            {
+                "id": self.ids[i].item(),
+                "gunas": float(scores[i]) / 2.0,
+                "kootas": dict(zip(KOOTAS, kootas[:, j].tolist())),
+                "mangal": bool(self.mangal[i]),
+            }
+            for j, i in enumerate(best)
+        ]
+
+
+if __name__ == "__main__":
+    import datetime
+
+    from astrology_engine.calculator import calculate_chart
+
+    boy = calculate_chart("Test Groom", "Male", datetime.date(1990, 5, 15), datetime.time(10, 30), "New Delhi, India",
+                          "Asia/Kolkata", latitude=28.6139, longitude=77.2090)
+    girl = calculate_chart("Test Bride", "Female", datetime.date(1992, 8, 3), datetime.time(6, 45), "Mumbai, India",
+                           "Asia/Kolkata", latitude=19.0760, longitude=72.8777)
+    print(f"Guna milan: {guna_milan(boy, girl)}")
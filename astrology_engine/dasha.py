@@ -0,0 +1,196 @@
+# astrology_engine/dasha.py
+# This module computes Vimshottari dasha periods: Mahadasha -> Antardasha -> Pratyantar.
+#
+# Periods are generated lazily. A chart holds only the nine Mahadasha boundaries;
+# Antardashas are created when a Mahadasha is expanded, Pratyantars when an
+# Antardasha is expanded. Finding the periods active at an instant never creates
+# the full tree: it bisects the Mahadasha boundaries and then the precomputed
+# cumulative sub-period fractions of the active lord, three bisects in total.
+
+import bisect
+import datetime
+
+from astrology_engine.astronomy import datetime_to_jd, jd_to_datetime
+
+# Vimshottari sequence and Mahadasha lengths in years (120 in total).
+DASHA_SEQUENCE = ("Ketu", "Venus", "Sun", "Moon", "Mars", "Rahu", "Jupiter", "Saturn", "Mercury")
+DASHA_YEARS = {"Ketu": 7, "Venus": 20, "Sun": 6, "Moon": 10, "Mars": 7,
+               "Rahu": 18, "Jupiter": 16, "Saturn": 19, "Mercury": 17}
+TOTAL_YEARS = 120
+# Length of a dasha year in days.
+DASHA_YEAR_DAYS = 365.25
+
+LEVEL_NAMES = ("Mahadasha", "Antardasha", "Pratyantar")
+
+_NAKSHATRA_SPAN = 360.0 / 27.0
+
+
+def _sequence_from(lord: str):
+    start = DASHA_SEQUENCE.index(lord)
+    return DASHA_SEQUENCE[start:] + DASHA_SEQUENCE[:start]
+
+
+# For each lord: the sub-period lords in order and their cumulative share of the parent
+# period (10 values from 0.0 to 1.0). Sub-periods of any level follow the same proportions.
+_SUB_LORDS = {lord: _sequence_from(lord) for lord in DASHA_SEQUENCE}
+_SUB_FRACTIONS = {}
+for _lord, _order in _SUB_LORDS.items():
+    _cumulative = [0.0]
+    for _sub in _order:
+        _cumulative.append(_cumulative[-1] + DASHA_YEARS[_sub] / TOTAL_YEARS)
+    _cumulative[-1] = 1.0
+    _SUB_FRACTIONS[_lord] = tuple(_cumulative)
+
+
+def _to_jd(moment) -> float:
+    if isinstance(moment, (datetime.date, datetime.datetime)):
+        return datetime_to_jd(moment)
+    return float(moment)
+
+
+class DashaPeriod:
+    """
+    One dasha period. Sub-periods are created on first access of `children`.
+    """
+
+    __slots__ = ("lord", "level", "start_jd", "end_jd", "_children")
+
+    def __init__(self, lord: str, level: int, start_jd: float, end_jd: float):
+        self.lord = lord
+        self.level = level
+        self.start_jd = start_jd
+        self.end_jd = end_jd
+        self._children = None
+
+    @property
+    def level_name(self) -> str:
+        return LEVEL_NAMES[self.level]
+
+    @property
+    def start(self) -> datetime.datetime:
+        return jd_to_datetime(self.start_jd)
+
+    @property
+    def end(self) -> datetime.datetime:
+        return jd_to_datetime(self.end_jd)
+
+    @property
+    def years(self) -> float:
+        return (self.end_jd - self.start_jd) / DASHA_YEAR_DAYS
+
+    def _boundary(self, i: int) -> float:
+        return self.start_jd + (self.end_jd - self.start_jd) * _SUB_FRACTIONS[self.lord][i]
+
+    def _child(self, i: int) -> "DashaPeriod":
+        return DashaPeriod(_SUB_LORDS[self.lord][i], self.level + 1, self._boundary(i), self._boundary(i + 1))
+
+    @property
+    def children(self) -> list:
+        """The nine sub-periods (empty below Pratyantar), built once on first access."""
+        if self._children is None:
+            if self.level + 1 >= len(LEVEL_NAMES):
+                self._children = []
+            else:
+                self._children = [self._child(i) for i in range(len(DASHA_SEQUENCE))]
+        return self._children
+
+    def sub_period_at(self, jd_ut: float) -> "DashaPeriod":
+        """The sub-period containing `jd_ut`, found by bisection without expanding siblings."""
+        fraction = (jd_ut - self.start_jd) / (self.end_jd - self.start_jd)
+        i = min(bisect.bisect_right(_SUB_FRACTIONS[self.lord], fraction) - 1, len(DASHA_SEQUENCE) - 1)
+        if self._children is not None:
+            return self._children[i]
+        return self._child(i)
+
+    def to_dict(self) -> dict:
+        start, end = self.start, self.end
+        return {
+            "planet": self.lord,
+            "level": self.level_name,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "start_year": start.year,
+            "end_year": end.year,
+        }
+
+    def __repr__(self):
+        return f"DashaPeriod({self.lord} {self.level_name}, {self.start.date()} - {self.end.date()})"
+
+
+class VimshottariDasha:
+    """
+    Vimshottari dasha timeline for one birth.
+
+    Args:
+        moon_longitude (float): Sidereal longitude of the Moon at birth, in degrees.
+        birth_jd (float | datetime.datetime): Birth instant as a Julian Day (UT) or naive UTC datetime.
+    """
+
+    def __init__(self, moon_longitude: float, birth_jd):
+        self.birth_jd = _to_jd(birth_jd)
+        position = (moon_longitude % 360.0) / _NAKSHATRA_SPAN
+        nakshatra = int(position)
+        self.nakshatra_index = nakshatra
+        self.first_lord = DASHA_SEQUENCE[nakshatra % len(DASHA_SEQUENCE)]
+        elapsed_fraction = position - nakshatra
+
+        # The first Mahadasha began before birth by the elapsed share of its length.
+        order = _sequence_from(self.first_lord)
+        start = self.birth_jd - elapsed_fraction * DASHA_YEARS[self.first_lord] * DASHA_YEAR_DAYS
+        self._boundaries = [start]
+        for lord in order:
+            self._boundaries.append(self._boundaries[-1] + DASHA_YEARS[lord] * DASHA_YEAR_DAYS)
+        self._lords = order
+        self._mahadashas = [None] * len(order)
+
+    @property
+    def balance_years(self) -> float:
+        """Years of the first Mahadasha remaining at birth."""
+        return (self._boundaries[1] - self.birth_jd) / DASHA_YEAR_DAYS
+
+    def _mahadasha(self, i: int) -> DashaPeriod:
+        if self._mahadashas[i] is None:
+            self._mahadashas[i] = DashaPeriod(self._lords[i], 0, self._boundaries[i], self._boundaries[i + 1])
+        return self._mahadashas[i]
+
+    def mahadashas(self) -> list:
+        """The nine Mahadashas of the 120-year cycle, the first one starting before birth."""
+        return [self._mahadasha(i) for i in range(len(self._lords))]
+
+    def active(self, moment, depth: int = 3) -> tuple:
+        """
+        The periods active at an instant.
+
+        Args:
+            moment (float | datetime.datetime | datetime.date): Julian Day (UT) or naive UTC datetime.
+            depth (int): 1 for Mahadasha only, 2 to add the Antardasha, 3 to add the Pratyantar.
+
+        Returns:
+            tuple[DashaPeriod, ...]: (Mahadasha, Antardasha, Pratyantar), truncated to `depth`.
+
+        Raises:
+            ValueError: If the instant lies outside the 120-year cycle.
+        """
+        jd = _to_jd(moment)
+        if not self._boundaries[0] <= jd < self._boundaries[-1]:
+            raise ValueError(f"{jd_to_datetime(jd).isoformat()} is outside the Vimshottari cycle of this chart")
+        period = self._mahadasha(bisect.bisect_right(self._boundaries, jd) - 1)
+        periods = [period]
+        for _ in range(1, depth):
+            period = period.sub_period_at(jd)
+            periods.append(period)
+        return tuple(periods)
+
+
+def dasha_from_chart(chart_data: dict):
+    """
+    Builds the dasha timeline from a chart produced by calculator.py.
+
+    Returns:
+        VimshottariDasha | None: None if the chart lacks the Moon longitude or UTC birth instant.
+    """
+    moon = chart_data.get("planet_positions", {}).get("Moon", {})
+    birth_utc = chart_data.get("birth_details", {}).get("utc")
+    if "longitude" not in moon or not birth_utc:
+        return None
+    return VimshottariDasha(moon["longitude"], datetime.datetime.fromisoformat(birth_utc))
@@ -0,0 +1,133 @@
+# astrology_engine/divisional.py
+# This module derives the Parashari divisional charts (vargas) from D1 longitudes.
+#
+# Every varga is described by a lookup table mapping (D1 sign, division index) to
+# the varga sign. All tables are padded into one (vargas, 12, 60) array, so the
+# signs of every varga for every point of every chart come out of a single NumPy
+# gather instead of per-varga Python loops.
+
+import numpy as np
+
+from astrology_engine.astronomy import ZODIAC_SIGNS
+
+# Vargas computed for every chart, in output order.
+VARGAS = (1, 2, 3, 4, 7, 9, 10, 12, 16, 20, 24, 27, 30, 40, 45, 60)
+
+VARGA_NAMES = {
+    1: "Rasi", 2: "Hora", 3: "Drekkana", 4: "Chaturthamsa", 7: "Saptamsa", 9: "Navamsa",
+    10: "Dasamsa", 12: "Dwadasamsa", 16: "Shodasamsa", 20: "Vimsamsa", 24: "Chaturvimsamsa",
+    27: "Bhamsa", 30: "Trimsamsa", 40: "Khavedamsa", 45: "Akshavedamsa", 60: "Shashtiamsa",
+}
+
+_MAX_DIVISIONS = 60
+
+# Sign indices used as starting points below.
+_ARIES, _TAURUS, _GEMINI, _CANCER, _LEO, _VIRGO = 0, 1, 2, 3, 4, 5
+_LIBRA, _SCORPIO, _SAGITTARIUS, _CAPRICORN, _AQUARIUS, _PISCES = 6, 7, 8, 9, 10, 11
+
+
+def _is_odd(sign: int) -> bool:
+    return sign % 2 == 0  # Aries (index 0) is the first, odd, sign.
+
+
+def _by_modality(sign: int, movable: int, fixed: int, dual: int) -> int:
+    return (movable, fixed, dual)[sign % 3]
+
+
+def _by_element(sign: int, fire: int, earth: int, air: int, water: int) -> int:
+    return (fire, earth, air, water)[sign % 4]
+
+
+# Trimsamsa boundaries in whole degrees and their signs.
+_TRIMSAMSA_ODD = ((5, _ARIES), (10, _AQUARIUS), (18, _SAGITTARIUS), (25, _GEMINI), (30, _LIBRA))
+_TRIMSAMSA_EVEN = ((5, _TAURUS), (12, _VIRGO), (20, _PISCES), (25, _CAPRICORN), (30, _SCORPIO))
+
+
+def _varga_sign(varga: int, sign: int, part: int) -> int:
+    """Varga sign for the `part`-th equal division of `sign` (Parashara's rules)."""
+    if varga == 1:
+        return sign
+    if varga == 2:
+        first, second = (_LEO, _CANCER) if _is_odd(sign) else (_CANCER, _LEO)
+        return first if part == 0 else second
+    if varga == 30:
+        # `part` is a whole degree here; the divisions are unequal.
+        for limit, target in (_TRIMSAMSA_ODD if _is_odd(sign) else _TRIMSAMSA_EVEN):
+            if part < limit:
+                return target
+    if varga == 3:
+        return (sign + 4 * part) % 12
+    if varga == 4:
+        return (sign + 3 * part) % 12
+    if varga == 9:
+        start = _by_element(sign, _ARIES, _CAPRICORN, _LIBRA, _CANCER)
+    elif varga == 27:
+        start = _by_element(sign, _ARIES, _CANCER, _LIBRA, _CAPRICORN)
+    elif varga == 7:
+        start = sign if _is_odd(sign) else sign + 6
+    elif varga == 10:
+        start = sign if _is_odd(sign) else sign + 8
+    elif varga == 16 or varga == 45:
+        start = _by_modality(sign, _ARIES, _LEO, _SAGITTARIUS)
+    elif varga == 20:
+        start = _by_modality(sign, _ARIES, _SAGITTARIUS, _LEO)
+    elif varga == 24:
+        start = _LEO if _is_odd(sign) else _CANCER
+    elif varga == 40:
+        start = _ARIES if _is_odd(sign) else _LIBRA
+    elif varga in (12, 60):
+        start = sign
+    else:
+        raise ValueError(f"Unsupported varga D{varga}")
+    return (start + part) % 12
+
+
+def _build_tables():
+    tables = np.zeros((len(VARGAS), 12, _MAX_DIVISIONS), dtype=np.int8)
+    for v, varga in enumerate(VARGAS):
+        for sign in range(12):
+            for part in range(varga):
+                tables[v, sign, part] = _varga_sign(varga, sign, part)
+    return tables
+
+
+_TABLES = _build_tables()
+# Trimsamsa is tabulated per whole degree, every other varga per equal division.
+_DIVISIONS = np.array(VARGAS, dtype=np.float64)
+_VARGA_AXIS = np.arange(len(VARGAS))
+
+
+def divisional_signs(longitudes):
+    """
+    Signs of every varga for an array of sidereal longitudes, in one gather.
+
+    Args:
+        longitudes (array-like): Sidereal longitudes in degrees, any shape, e.g. (n, points).
+
+    Returns:
+        np.ndarray: int8 sign indices (0 = Aries), shape `longitudes.shape + (len(VARGAS),)`,
+                    last axis ordered as VARGAS.
+    """
+    lon = np.mod(np.asarray(longitudes, dtype=np.float64), 360.0)
+    sign = (lon // 30.0).astype(np.intp)
+    # D30 has 30 one-degree slots, so dividing by 30 parts is exact for it too.
+    part = ((lon % 30.0)[..., None] * _DIVISIONS / 30.0).astype(np.intp)
+    part = np.minimum(part, _DIVISIONS.astype(np.intp) - 1)  # guards float rounding at 30°
+    return _TABLES[_VARGA_AXIS, sign[..., None], part]
+
+
+def varga_chart(chart_data: dict, varga: int) -> dict:
+    """
+    Sign names of every point in one varga, read from `chart_data["divisional_charts"]`
+    ({"vargas": [1, 2, ...], "points": [...], "signs": [[sign index per varga] per point]}).
+
+    Args:
+        chart_data (dict): Data from calculator.py.
+        varga (int): Division number, e.g. 9 for the Navamsa.
+
+    Returns:
+        dict: Point name -> sign name.
+    """
+    block = chart_data["divisional_charts"]
+    column = block["vargas"].index(varga)
+    return {point: ZODIAC_SIGNS[signs[column]] for point, signs in zip(block["points"], block["signs"])}
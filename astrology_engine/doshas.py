@@ -0,0 +1,380 @@
+# astrology_engine/doshas.py
+# This module detects doshas and yogas from sign placements with bitboards.
+#
+# Every point of a chart is encoded as a 12-bit integer with one bit set: its sign
+# (bit 0 = Aries), or its whole-sign house counted from a reference point (bit 0 =
+# 1st house). A condition is then a couple of integer operations: "Mars in the 1st,
+# 2nd, 4th, 7th, 8th or 12th house from the Ascendant" is `mars_house & 0b100011001011`,
+# "Sun and Mercury together" is a one-bit test on `sun_sign | mercury_sign`, and
+# Kalsarpa is "the OR of the seven grahas fits inside the 7-sign arc from Rahu".
+#
+# The same compiled conditions run on plain Python ints for a single chart (a few
+# microseconds) and on NumPy arrays for a whole batch or for every divisional chart
+# at once. Mangal and Kalsarpa Dosha are built in; further items are declared in
+# rules/dosha_rules.json with a "detect" entry next to the rule's "when":
+#
+#     "gaja_kesari_yoga": {
+#         "detect": {"kind": "yoga", "all": [{"planets": ["Jupiter"], "houses": [1, 4, 7, 10], "from": "Moon"}]},
+#         "when": {"dosha": "Gaja Kesari Yoga"}, "effect": "..."}
+#
+# The item is named after its "when" dosha (or "detect"."name"). "all" conditions must
+# hold together, "any" needs one of them. Supported conditions:
+#     {"planets": [...], "houses": [...], "from": point}  every planet in one of the houses
+#                                                        ("from" defaults to the Ascendant)
+#     {"planets": [...], "signs": [...]}                 every planet in one of the signs
+#     {"planets": [...], "together": true}               all planets in the same sign
+#     {"planets": [...], "houses": [...], "from": point, "empty": true}
+#                                                        none of the planets in those houses
+#     {"planets": [...], "between": [point, point]}      all planets within the 7-sign arc
+#                                                        from one point to the other (either way)
+
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from astrology_engine.astronomy import PLANETS, ZODIAC_SIGNS
+from astrology_engine.rule_index import _ordinal
+
+# Set to use a different catalogue file than rules/dosha_rules.json.
+CATALOGUE_PATH_ENV = "JYOTISH_DOSHA_RULES"
+DEFAULT_CATALOGUE_PATH = Path(__file__).parent.parent / "rules" / "dosha_rules.json"
+
+# Columns of the point-sign arrays: the nine grahas plus the Ascendant (calculator.CHART_POINTS).
+POINTS = PLANETS + ("Ascendant",)
+SEVEN_GRAHAS = ("Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn")
+# Houses (counted from the Ascendant or the Moon) in which Mars causes Mangal Dosha.
+MANGAL_HOUSES = (1, 2, 4, 7, 8, 12)
+
+BUILTIN_DETECTORS = {
+    "Mangal Dosha": {"kind": "dosha", "any": [
+        {"planets": ["Mars"], "houses": list(MANGAL_HOUSES), "from": "Ascendant"},
+        {"planets": ["Mars"], "houses": list(MANGAL_HOUSES), "from": "Moon"},
+    ]},
+    "Kalsarpa Dosha": {"kind": "dosha", "all": [
+        {"planets": list(SEVEN_GRAHAS), "between": ["Rahu", "Ketu"]},
+    ]},
+}
+
+_POINT_COLUMN = {point: i for i, point in enumerate(POINTS)}
+_SIGN_INDEX = {sign: i for i, sign in enumerate(ZODIAC_SIGNS)}
+_ALL_SIGNS = 0xFFF
+_ARC = 0x7F  # seven consecutive signs, both ends included
+
+
+def _bits(indices) -> int:
+    mask = 0
+    for index in indices:
+        mask |= 1 << index
+    return mask
+
+
+MANGAL_MASK = _bits(house - 1 for house in MANGAL_HOUSES)
+
+
+def _house_bit(sign, reference_sign):
+    return 1 << ((sign - reference_sign) % 12)
+
+
+def _arc_from(sign):
+    """Bitboard of the seven signs starting at `sign` (the arc to the opposite sign)."""
+    return ((_ARC << sign) | (_ARC >> (12 - sign))) & _ALL_SIGNS
+
+
+def _single_bit(board):
+    return (board != 0) & ((board & (board - 1)) == 0)
+
+
+def mangal_dosha_mask(mars_signs, ascendant_signs, moon_signs):
+    """
+    Mangal Dosha for arrays of sign indices (0 = Aries): Mars in the 1st, 2nd, 4th, 7th,
+    8th or 12th house from the Ascendant or from the Moon (whole-sign houses).
+    """
+    mars_signs = np.asarray(mars_signs, dtype=np.int64)
+    from_lagna = _house_bit(mars_signs, np.asarray(ascendant_signs, dtype=np.int64)) & MANGAL_MASK
+    from_moon = _house_bit(mars_signs, np.asarray(moon_signs, dtype=np.int64)) & MANGAL_MASK
+    return (from_lagna | from_moon) != 0
+
+
+def _point(name) -> int:
+    point = str(name).strip().title()
+    if point == "Lagna":
+        point = "Ascendant"
+    if point not in _POINT_COLUMN:
+        raise ValueError(f"unknown point {name!r}")
+    return _POINT_COLUMN[point]
+
+
+def _reference_name(column: int) -> str:
+    return "Lagna" if POINTS[column] == "Ascendant" else POINTS[column]
+
+
+def _compile_condition(condition: dict) -> tuple:
+    """(operation, columns, reference column, mask) of one declarative condition."""
+    if not isinstance(condition, dict):
+        raise ValueError(f"condition must be an object, got {condition!r}")
+    planets = condition.get("planets", [condition["planet"]] if "planet" in condition else None)
+    if not planets:
+        raise ValueError(f"condition needs 'planets': {condition!r}")
+    columns = tuple(_point(planet) for planet in planets)
+
+    if "houses" in condition:
+        houses = [int(house) for house in condition["houses"]]
+        if not houses or not all(1 <= house <= 12 for house in houses):
+            raise ValueError(f"houses must be between 1 and 12, got {condition['houses']!r}")
+        reference = _point(condition.get("from", "Ascendant"))
+        operation = "empty" if condition.get("empty") is True else "houses"
+        if operation == "empty":
+            columns = tuple(column for column in columns if column != reference)
+        return operation, columns, reference, _bits(house - 1 for house in houses)
+    if "signs" in condition:
+        signs = [str(sign).strip().title() for sign in condition["signs"]]
+        unknown = [sign for sign in signs if sign not in _SIGN_INDEX]
+        if unknown or not signs:
+            raise ValueError(f"unknown signs {unknown or condition['signs']!r}")
+        return "signs", columns, None, _bits(_SIGN_INDEX[sign] for sign in signs)
+    if condition.get("together") is True:
+        if len(columns) < 2:
+            raise ValueError(f"'together' needs at least two planets: {condition!r}")
+        return "together", columns, None, 0
+    if "between" in condition:
+        ends = condition["between"]
+        if not isinstance(ends, list) or len(ends) != 2:
+            raise ValueError(f"'between' needs two points, got {ends!r}")
+        return "between", columns, (_point(ends[0]), _point(ends[1])), 0
+    raise ValueError(f"unsupported condition {condition!r}")
+
+
+def _evaluate(condition: tuple, signs: list, houses: dict):
+    """
+    One condition on bitboards. `signs` holds a sign index per point column and
+    `houses[reference]` a house bitboard per point column; the values are Python ints
+    for one chart or NumPy arrays for many, and so is the result.
+    """
+    operation, columns, reference, mask = condition
+    if operation == "houses":
+        held = True
+        for column in columns:
+            held = held & ((houses[reference][column] & mask) != 0)
+        return held
+    if operation == "empty":
+        occupied = 0
+        for column in columns:
+            occupied = occupied | houses[reference][column]
+        return (occupied & mask) == 0
+    occupied = 0
+    for column in columns:
+        occupied = occupied | (1 << signs[column])
+    if operation == "signs":
+        return (occupied & ~mask & _ALL_SIGNS) == 0
+    if operation == "together":
+        return _single_bit(occupied)
+    first, second = reference
+    return (((occupied & ~_arc_from(signs[first]) & _ALL_SIGNS) == 0)
+            | ((occupied & ~_arc_from(signs[second]) & _ALL_SIGNS) == 0))
+
+
+def _describe(condition: tuple, signs: list) -> str:
+    """Why a condition that holds for one chart (Python ints) holds."""
+    operation, columns, reference, mask = condition
+    names = [POINTS[column] for column in columns]
+    if operation == "houses":
+        placed = [f"{POINTS[column]} in {_ordinal((signs[column] - signs[reference]) % 12 + 1)}" for column in columns]
+        return f"{', '.join(placed)} house from {_reference_name(reference)}"
+    if operation == "empty":
+        houses = [_ordinal(bit + 1) for bit in range(12) if mask >> bit & 1]
+        return f"none of {', '.join(names)} in the {'/'.join(houses)} house from {_reference_name(reference)}"
+    if operation == "signs":
+        return ", ".join(f"{POINTS[column]} in {ZODIAC_SIGNS[signs[column]]}" for column in columns)
+    if operation == "together":
+        return f"{' and '.join(names)} together in {ZODIAC_SIGNS[signs[columns[0]]]}"
+    first, second = reference
+    if set(names) == set(SEVEN_GRAHAS):
+        names = ["all seven grahas"]
+    return (f"{', '.join(names)} between {POINTS[first]} in {ZODIAC_SIGNS[signs[first]]} "
+            f"and {POINTS[second]} in {ZODIAC_SIGNS[signs[second]]}")
+
+
+class DoshaCatalogue:
+    """
+    Compiled detectors: the built-in Mangal and Kalsarpa Dosha plus every entry with a
+    "detect" object in a dosha_rules.json-style mapping. Entries that fail to compile are
+    skipped and described in `errors`; an entry whose name matches a built-in replaces it.
+    """
+
+    def __init__(self, entries: dict = None):
+        self.errors = []
+        detectors = dict(BUILTIN_DETECTORS)
+        for rule_id, entry in (entries or {}).items():
+            if not isinstance(entry, dict) or "detect" not in entry:
+                continue
+            detect = entry["detect"]
+            when = entry.get("when")
+            name = detect.get("name") if isinstance(detect, dict) else None
+            if name is None and isinstance(when, dict):
+                name = when.get("dosha")
+            if not name:
+                self.errors.append(f"dosha_rules.{rule_id}: 'detect' needs a name or a 'when' dosha")
+                continue
+            detectors[str(name).strip()] = detect
+
+        self.names, self.kinds, self._detectors = [], [], []
+        for name, detect in detectors.items():
+            try:
+                if not isinstance(detect, dict) or ("all" in detect) == ("any" in detect):
+                    raise ValueError("'detect' needs exactly one of 'all' or 'any'")
+                conditions = detect["all"] if "all" in detect else detect["any"]
+                if not isinstance(conditions, list) or not conditions:
+                    raise ValueError("'detect' has no conditions")
+                compiled = tuple(_compile_condition(condition) for condition in conditions)
+            except (TypeError, ValueError, KeyError) as e:
+                self.errors.append(f"{name}: {e}")
+                continue
+            self.names.append(name)
+            self.kinds.append(str(detect.get("kind", "dosha")))
+            self._detectors.append(("all" in detect, compiled))
+
+        canonical = json.dumps(detectors, sort_keys=True, ensure_ascii=False, default=str)
+        self.fingerprint = hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+        self._references = sorted({c[2] for _, conditions in self._detectors for c in conditions
+                                   if c[0] in ("houses", "empty")})
+
+    def __len__(self):
+        return len(self.names)
+
+    def _boards(self, signs: list) -> dict:
+        return {reference: [_house_bit(sign, signs[reference]) for sign in signs] for reference in self._references}
+
+    def _holds(self, detector: tuple, signs: list, houses: dict):
+        require_all, conditions = detector
+        result = require_all
+        for condition in conditions:
+            held = _evaluate(condition, signs, houses)
+            result = (result & held) if require_all else (result | held)
+        return result
+
+    def detect(self, point_signs) -> np.ndarray:
+        """
+        Evaluates every detector on any number of charts at once.
+
+        Args:
+            point_signs (array-like): Sign indices (0 = Aries) of shape (..., 10), columns
+                                      ordered as POINTS, e.g. one row per varga of a chart.
+
+        Returns:
+            np.ndarray: Boolean array of shape (..., len(self)), items ordered as `names`.
+        """
+        # int32 holds every board (the widest intermediate is the 7-sign arc shifted by 11).
+        point_signs = np.asarray(point_signs, dtype=np.int32)
+        signs = [point_signs[..., column] for column in range(len(POINTS))]
+        houses = self._boards(signs)
+        flags = [np.broadcast_to(self._holds(detector, signs, houses), signs[0].shape)
+                 for detector in self._detectors]
+        return np.stack(flags, axis=-1) if flags else np.zeros(point_signs.shape[:-1] + (0,), dtype=bool)
+
+    def explain(self, point_signs) -> list:
+        """
+        Detected items of one chart with their reasons.
+
+        Args:
+            point_signs (Sequence[int]): Sign index of each of the 10 POINTS.
+
+        Returns:
+            list[dict]: {"type", "kind", "present": True, "details"} for every detected item,
+                        in catalogue order. "details" lists the conditions that hold.
+        """
+        signs = [int(sign) for sign in point_signs]
+        houses = self._boards(signs)
+        found = []
+        for name, kind, detector in zip(self.names, self.kinds, self._detectors):
+            if not self._holds(detector, signs, houses):
+                continue
+            reasons = [_describe(condition, signs) for condition in detector[1] if _evaluate(condition, signs, houses)]
+            found.append({"type": name, "kind": kind, "present": True, "details": "; ".join(reasons)})
+        return found
+
+
+@functools.lru_cache(maxsize=4)
+def _load_catalogue(path: str, mtime_ns: int, size: int) -> DoshaCatalogue:
+    try:
+        text = Path(path).read_text(encoding="utf-8")
+        entries = json.loads(text) if text.strip() else {}
+    except (OSError, ValueError) as e:
+        catalogue = DoshaCatalogue()
+        catalogue.errors.append(f"{path}: {e}")
+        return catalogue
+    return DoshaCatalogue(entries if isinstance(entries, dict) else {})
+
+
+def default_catalogue() -> DoshaCatalogue:
+    """
+    The catalogue compiled from rules/dosha_rules.json (or $JYOTISH_DOSHA_RULES).
+    It is recompiled only when the file's mtime or size changes; without the file only
+    the built-in detectors are used.
+    """
+    path = os.environ.get(CATALOGUE_PATH_ENV, str(DEFAULT_CATALOGUE_PATH))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return _load_catalogue(path, -1, -1)
+    return _load_catalogue(path, stat.st_mtime_ns, stat.st_size)
+
+
+def detect_doshas(point_signs, catalogue: DoshaCatalogue = None) -> list:
+    """
+    Doshas and yogas of one chart.
+
+    Args:
+        point_signs (Sequence[int]): Sign index (0 = Aries) of each point, ordered as POINTS.
+        catalogue (DoshaCatalogue, optional): Defaults to default_catalogue().
+
+    Returns:
+        list[dict]: {"type", "kind", "present": True, "details"} for every detected item.
+    """
+    return (catalogue or default_catalogue()).explain(point_signs)
+
+
+def divisional_doshas(chart_data: dict, catalogue: DoshaCatalogue = None) -> dict:
+    """
+    Names of the items detected in every divisional chart of a chart (calculator.py output).
+
+    Returns:
+        dict: varga number -> list of detected names, e.g. {1: ["Mangal Dosha"], 9: [], ...}.
+    """
+    catalogue = catalogue or default_catalogue()
+    divisional = chart_data["divisional_charts"]
+    columns = [divisional["points"].index(point) for point in POINTS]
+    # "signs" is (points, vargas); one row per varga.
+    flags = catalogue.detect(np.asarray(divisional["signs"])[columns].T)
+    return {varga: [name for name, hit in zip(catalogue.names, row) if hit]
+            for varga, row in zip(divisional["vargas"], flags)}
+
+
+def detect_batch(batch: dict, catalogue: DoshaCatalogue = None) -> np.ndarray:
+    """
+    Detection for a whole calculate_chart_batch() result, in every varga.
+
+    Returns:
+        np.ndarray: Boolean array of shape (n, len(divisional.VARGAS), len(catalogue)).
+    """
+    catalogue = catalogue or default_catalogue()
+    return catalogue.detect(np.moveaxis(batch["divisional_signs"], -1, -2))
+
+
+if __name__ == '__main__':
+    # Example usage for direct testing of this module
+    import datetime
+
+    from astrology_engine.calculator import calculate_chart
+
+    chart = calculate_chart("Test User", "Female", datetime.date(1990, 5, 15), datetime.time(10, 30),
+                            "New Delhi, India", "Asia/Kolkata", latitude=28.6139, longitude=77.2090)
+    for item in chart["doshas"]:
+        print(f"{item['type']} ({item['kind']}): {item['details']}")
+    for varga, names in divisional_doshas(chart).items():
+        print(f"D{varga}: {', '.join(names) or '-'}")
+    for error in default_catalogue().errors:
+        print(f"Invalid detector skipped: {error}")
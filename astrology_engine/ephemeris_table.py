@@ -0,0 +1,217 @@
+# astrology_engine/ephemeris_table.py
+# This module builds and reads a precomputed, memory-mapped ephemeris table.
+# The table stores sidereal longitudes and daily speeds of Sun through Ketu at a
+# fixed time step, so a position lookup is a couple of array reads plus a cubic
+# Hermite interpolation instead of a full ephemeris computation.
+#
+# Build it once per deployment (about 5 MB for 1900-2100 at a one-day step):
+#     python -m astrology_engine.ephemeris_table build
+#
+# The file is opened with np.memmap, so there is no parse cost at startup and all
+# worker processes on a host share the same page-cache pages.
+
+import argparse
+import datetime
+import functools
+import os
+import struct
+import time
+from pathlib import Path
+
+import numpy as np
+
+from astrology_engine import astronomy
+
+DEFAULT_TABLE_PATH = Path(__file__).parent.parent / "data" / "ephemeris_1900_2100.bin"
+# Overrides DEFAULT_TABLE_PATH, e.g. to point all replicas at a shared volume.
+TABLE_PATH_ENV = "JYOTISH_EPHEMERIS_TABLE"
+
+_MAGIC = b"JYEPH001"
+# magic, start JD, step (days), number of rows, number of planets; padded to 64 bytes.
+_HEADER = struct.Struct("<8sddqq")
+_HEADER_SIZE = 64
+
+
+def _jd_for_year(year: int) -> float:
+    return float(astronomy.datetime64_to_jd(np.datetime64(f"{year:04d}-01-01T00:00:00")))
+
+
+def build_table(path=DEFAULT_TABLE_PATH, start_year: int = 1900, end_year: int = 2100,
+                step_days: float = 1.0, chunk_rows: int = 16384):
+    """
+    Computes the ephemeris table and writes it to disk.
+
+    Args:
+        path (str | Path): Output file.
+        start_year (int): First year covered (from 1 January, 0h UT).
+        end_year (int): Last year covered (through 1 January of end_year + 1).
+        step_days (float): Spacing of the table rows in days.
+        chunk_rows (int): Rows computed per vectorized pass, bounds peak memory.
+
+    Returns:
+        Path: The written file.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    start_jd = _jd_for_year(start_year)
+    end_jd = _jd_for_year(end_year + 1)
+    n_rows = int(np.ceil((end_jd - start_jd) / step_days)) + 1
+    n_planets = len(astronomy.PLANETS)
+
+    # Write to a temporary file and rename, so readers never see a half-written table.
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, start_jd, step_days, n_rows, n_planets).ljust(_HEADER_SIZE, b"\0"))
+    data = np.memmap(tmp_path, dtype="<f4", mode="r+", offset=_HEADER_SIZE, shape=(n_rows, n_planets, 2))
+    for first in range(0, n_rows, chunk_rows):
+        rows = np.arange(first, min(first + chunk_rows, n_rows))
+        jd = start_jd + rows * step_days
+        data[rows, :, 0] = astronomy.sidereal_longitudes(jd)
+        data[rows, :, 1] = astronomy.sidereal_speeds(jd)
+    data.flush()
+    del data
+    os.replace(tmp_path, path)
+    return path
+
+
+class EphemerisTable:
+    """
+    Read-only view of a table written by `build_table`.
+
+    Positions between rows are interpolated with a cubic Hermite spline using the
+    stored speeds as derivatives, which keeps the Moon within a fraction of an
+    arc-second of the direct computation at a one-day step.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            header = f.read(_HEADER.size)
+        magic, self.start_jd, self.step_days, n_rows, n_planets = _HEADER.unpack(header)
+        if magic != _MAGIC:
+            raise ValueError(f"Not an ephemeris table: {self.path}")
+        if n_planets != len(astronomy.PLANETS):
+            raise ValueError(f"Ephemeris table {self.path} has {n_planets} planets, expected {len(astronomy.PLANETS)}")
+        self._data = np.memmap(self.path, dtype="<f4", mode="r", offset=_HEADER_SIZE, shape=(n_rows, n_planets, 2))
+        self.end_jd = self.start_jd + (n_rows - 1) * self.step_days
+
+    def covers(self, jd_ut) -> bool:
+        """True if every Julian Day in `jd_ut` lies inside the table."""
+        jd = np.asarray(jd_ut, dtype=np.float64)
+        return bool(jd.size) and bool(np.all((jd >= self.start_jd) & (jd < self.end_jd)))
+
+    def positions(self, jd_ut):
+        """
+        Interpolated sidereal longitudes and speeds.
+
+        Args:
+            jd_ut (array-like): Julian Days (UT), shape (n,).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Longitudes in degrees [0, 360) and speeds in
+                                           degrees/day, each of shape (n, 9).
+
+        Raises:
+            ValueError: If any instant falls outside the table.
+        """
+        jd = np.atleast_1d(np.asarray(jd_ut, dtype=np.float64))
+        if not self.covers(jd):
+            raise ValueError(
+                f"Julian Day outside ephemeris table range [{self.start_jd}, {self.end_jd}): {self.path}"
+            )
+        x = (jd - self.start_jd) / self.step_days
+        row = x.astype(np.int64)
+        t = (x - row)[:, None]
+        h = self.step_days
+
+        p0 = self._data[row, :, 0].astype(np.float64)
+        v0 = self._data[row, :, 1].astype(np.float64)
+        p1 = self._data[row + 1, :, 0].astype(np.float64)
+        v1 = self._data[row + 1, :, 1].astype(np.float64)
+        # Unwrap across the 360° -> 0° boundary before interpolating.
+        dp = np.mod(p1 - p0 + 180.0, 360.0) - 180.0
+
+        t2, t3 = t * t, t * t * t
+        h10 = t3 - 2 * t2 + t
+        h01 = -2 * t3 + 3 * t2
+        h11 = t3 - t2
+        longitudes = p0 + h10 * h * v0 + h01 * dp + h11 * h * v1
+
+        dh00 = 6 * t2 - 6 * t
+        dh10 = 3 * t2 - 4 * t + 1
+        dh11 = 3 * t2 - 2 * t
+        speeds = dh10 * v0 - dh00 * dp / h + dh11 * v1
+
+        return np.mod(longitudes, 360.0), speeds
+
+
+@functools.lru_cache(maxsize=1)
+def load_default_table():
+    """
+    Opens the deployment's ephemeris table once per process.
+
+    Returns:
+        EphemerisTable | None: The table, or None if it has not been built. Callers
+                               then fall back to the direct computation in astronomy.py.
+    """
+    path = Path(os.environ.get(TABLE_PATH_ENV, DEFAULT_TABLE_PATH))
+    if not path.is_file():
+        return None
+    return EphemerisTable(path)
+
+
+def sidereal_positions(jd_ut):
+    """
+    Sidereal longitudes and speeds from the default table when it covers `jd_ut`,
+    otherwise from the direct computation.
+
+    Args:
+        jd_ut (array-like): Julian Days (UT), shape (n,).
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Longitudes and speeds, each of shape (n, 9).
+    """
+    table = load_default_table()
+    if table is not None and table.covers(jd_ut):
+        return table.positions(jd_ut)
+    return astronomy.sidereal_longitudes(jd_ut), astronomy.sidereal_speeds(jd_ut)
+
+
+def sidereal_longitudes(jd_ut):
+    """
+    Like sidereal_positions(), but skips the speeds when they have to be computed directly.
+
+    Returns:
+        np.ndarray: Longitudes of shape (n, 9).
+    """
+    table = load_default_table()
+    if table is not None and table.covers(jd_ut):
+        return table.positions(jd_ut)[0]
+    return astronomy.sidereal_longitudes(jd_ut)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the precomputed ephemeris table.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Write the ephemeris table.")
+    build.add_argument("--out", default=os.environ.get(TABLE_PATH_ENV, str(DEFAULT_TABLE_PATH)))
+    build.add_argument("--start-year", type=int, default=1900)
+    build.add_argument("--end-year", type=int, default=2100)
+    build.add_argument("--step-days", type=float, default=1.0)
+    info = subparsers.add_parser("info", help="Print the header of an existing table.")
+    info.add_argument("path", nargs="?", default=os.environ.get(TABLE_PATH_ENV, str(DEFAULT_TABLE_PATH)))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        path = build_table(args.out, args.start_year, args.end_year, args.step_days)
+        print(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+    else:
+        table = EphemerisTable(args.path)
+        start = datetime.datetime(1970, 1, 1) + datetime.timedelta(days=table.start_jd - astronomy.UNIX_EPOCH_JD)
+        end = datetime.datetime(1970, 1, 1) + datetime.timedelta(days=table.end_jd - astronomy.UNIX_EPOCH_JD)
+        print(f"{table.path}: {start.isoformat()} .. {end.isoformat()} UT, step {table.step_days} days")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,362 @@
+# astrology_engine/gazetteer.py
+# This module resolves free-text places of birth to coordinates and IANA timezones
+# from an offline place index, with no network dependency.
+#
+# The index is built once from a GeoNames-format gazetteer dump (e.g. cities15000.txt
+# from https://download.geonames.org/export/dump/, tab-separated, one place per line):
+#     python -m astrology_engine.gazetteer build data/cities15000.txt --countries data/countryInfo.txt
+#
+# It is written as a directory of .npy arrays that are memory-mapped on load:
+#   - sorted, fixed-width normalized names (binary search for exact and prefix lookups),
+#   - a CSR mapping from each name to its places,
+#   - per-place latitude, longitude, population, country and timezone codes,
+#   - a sorted table of 64-bit hashes of every one-character deletion of every name
+#     (a symmetric-delete index), which finds names within one typo of the query
+#     with a handful of binary searches instead of scanning all names.
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+DEFAULT_GAZETTEER_DIR = Path(__file__).parent.parent / "data" / "gazetteer"
+# Overrides DEFAULT_GAZETTEER_DIR.
+GAZETTEER_DIR_ENV = "JYOTISH_GAZETTEER_DIR"
+
+# Normalized names longer than this are truncated in the key table (and re-checked on lookup).
+_KEY_BYTES = 48
+
+# GeoNames "geoname" table columns used here.
+_COL_NAME, _COL_ASCII, _COL_ALTERNATES, _COL_LAT, _COL_LON = 1, 2, 3, 4, 5
+_COL_COUNTRY, _COL_POPULATION, _COL_TIMEZONE = 8, 14, 17
+
+
+def normalize_place(text: str) -> str:
+    """Case-folded, accent-free, punctuation-free form of a place name used as index key."""
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    cleaned = "".join(ch if ch.isalnum() else " " for ch in stripped.casefold())
+    return " ".join(cleaned.split())
+
+
+def _key(text: str) -> bytes:
+    return normalize_place(text).encode("utf-8")[:_KEY_BYTES]
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def _deletes(key: bytes):
+    """The key itself and every variant with one character removed (distinct values)."""
+    text = key.decode("utf-8", "ignore")
+    variants = {text}
+    variants.update(text[:i] + text[i + 1:] for i in range(len(text)))
+    return [v.encode("utf-8") for v in variants]
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if a and b differ by at most one insertion, deletion, substitution or transposition."""
+    if a == b:
+        return True
+    if abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        if a[i + 1:] == b[i + 1:]:
+            return True
+        return a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:]
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return longer[i + 1:] == shorter[i:]
+
+
+def build_gazetteer(source, out_dir=DEFAULT_GAZETTEER_DIR, countries=None, alternate_names: bool = False):
+    """
+    Builds the memory-mappable place index from a GeoNames-format dump.
+
+    Args:
+        source (str | Path): GeoNames "geoname" table (e.g. cities15000.txt).
+        out_dir (str | Path): Output directory.
+        countries (str | Path, optional): GeoNames countryInfo.txt, so queries such as
+                                          "Kolkata, India" can filter by country name.
+        alternate_names (bool): Also index the alternate names column (much larger index).
+
+    Returns:
+        Path: The output directory.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    names, latitudes, longitudes, populations, country_codes, timezone_codes = [], [], [], [], [], []
+    timezones, country_index = {}, {}
+    key_to_places = {}
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            cols = line.rstrip("\n").split("\t")
+            if len(cols) <= _COL_TIMEZONE or not cols[_COL_TIMEZONE]:
+                continue
+            place = len(names)
+            names.append(cols[_COL_NAME])
+            latitudes.append(float(cols[_COL_LAT]))
+            longitudes.append(float(cols[_COL_LON]))
+            populations.append(int(cols[_COL_POPULATION] or 0))
+            country_codes.append(country_index.setdefault(cols[_COL_COUNTRY], len(country_index)))
+            timezone_codes.append(timezones.setdefault(cols[_COL_TIMEZONE], len(timezones)))
+            spellings = {cols[_COL_NAME], cols[_COL_ASCII]}
+            if alternate_names and cols[_COL_ALTERNATES]:
+                spellings.update(cols[_COL_ALTERNATES].split(","))
+            for spelling in spellings:
+                key = _key(spelling)
+                if key:
+                    key_to_places.setdefault(key, set()).add(place)
+
+    keys = sorted(key_to_places)
+    populations = np.array(populations, dtype=np.int64)
+    key_offsets = [0]
+    key_places = []
+    for key in keys:
+        # Most populous place first, so exact lookups can take the first entry.
+        places = sorted(key_to_places[key], key=lambda p: -populations[p])
+        key_places.extend(places)
+        key_offsets.append(len(key_places))
+
+    delete_hashes, delete_keys = [], []
+    for i, key in enumerate(keys):
+        for variant in _deletes(key):
+            delete_hashes.append(_hash64(variant))
+            delete_keys.append(i)
+    delete_hashes = np.array(delete_hashes, dtype=np.uint64)
+    order = np.argsort(delete_hashes, kind="stable")
+
+    name_blob = "\0".join(names).encode("utf-8")
+    name_offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    position = 0
+    for i, name in enumerate(names):
+        position += len(name.encode("utf-8"))
+        name_offsets[i + 1] = position + i + 1  # +1 per separator
+    # name i spans name_blob[name_offsets[i]:name_offsets[i + 1] - 1]
+
+    arrays = {
+        "keys": np.array(keys, dtype=f"S{_KEY_BYTES}"),
+        "key_offsets": np.array(key_offsets, dtype=np.int64),
+        "key_places": np.array(key_places, dtype=np.int32),
+        "delete_hashes": delete_hashes[order],
+        "delete_keys": np.array(delete_keys, dtype=np.int32)[order],
+        "latitude": np.array(latitudes, dtype=np.float32),
+        "longitude": np.array(longitudes, dtype=np.float32),
+        "population": populations,
+        "country": np.array(country_codes, dtype=np.uint16),
+        "timezone": np.array(timezone_codes, dtype=np.uint16),
+        "name_blob": np.frombuffer(name_blob, dtype=np.uint8),
+        "name_offsets": name_offsets,
+    }
+    for array_name, array in arrays.items():
+        np.save(out_dir / f"{array_name}.npy", array)
+
+    country_names = {}
+    if countries:
+        with open(countries, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) > 4 and cols[0] in country_index:
+                    country_names[normalize_place(cols[4])] = cols[0]
+    meta = {
+        "version": 1,
+        "source": str(source),
+        "countries": sorted(country_index, key=country_index.get),
+        "country_names": country_names,
+        "timezones": sorted(timezones, key=timezones.get),
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+    return out_dir
+
+
+class Gazetteer:
+    """
+    Memory-mapped place index written by `build_gazetteer`.
+
+    Lookups return place dicts:
+        {"name", "country", "latitude", "longitude", "timezone", "population"}.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text(encoding="utf-8"))
+        self._countries = meta["countries"]
+        self._country_names = meta["country_names"]
+        self._timezones = meta["timezones"]
+        for array_name in ("keys", "key_offsets", "key_places", "delete_hashes", "delete_keys", "latitude",
+                           "longitude", "population", "country", "timezone", "name_blob", "name_offsets"):
+            setattr(self, f"_{array_name}", np.load(self.path / f"{array_name}.npy", mmap_mode="r"))
+
+    def __len__(self):
+        return len(self._latitude)
+
+    def _place(self, i: int) -> dict:
+        start, end = self._name_offsets[i], self._name_offsets[i + 1] - 1
+        return {
+            "name": bytes(self._name_blob[start:end]).decode("utf-8"),
+            "country": self._countries[self._country[i]],
+            "latitude": float(self._latitude[i]),
+            "longitude": float(self._longitude[i]),
+            "timezone": self._timezones[self._timezone[i]],
+            "population": int(self._population[i]),
+        }
+
+    def _places_for_keys(self, key_ids):
+        places = []
+        for k in key_ids:
+            places.extend(self._key_places[self._key_offsets[k]:self._key_offsets[k + 1]].tolist())
+        return places
+
+    def _rank(self, places, country: str = None, limit: int = 10) -> list:
+        unique = list(dict.fromkeys(places))
+        if country is not None:
+            unique = [p for p in unique if self._countries[self._country[p]] == country]
+        unique.sort(key=lambda p: -int(self._population[p]))
+        return [self._place(p) for p in unique[:limit]]
+
+    def _split_query(self, text: str):
+        """Splits "City, Region, Country" into the city key and an optional country code."""
+        parts = [part.strip() for part in str(text).split(",") if part.strip()]
+        if not parts:
+            return b"", None
+        country = None
+        if len(parts) > 1:
+            last = normalize_place(parts[-1])
+            country = self._country_names.get(last)
+            if country is None and last.upper() in self._countries:
+                country = last.upper()
+        return _key(parts[0]), country
+
+    def exact(self, text: str, limit: int = 10) -> list:
+        """Places whose normalized name equals the query (city part before the first comma)."""
+        key, country = self._split_query(text)
+        i = int(np.searchsorted(self._keys, key))
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._rank(self._places_for_keys([i]), country, limit)
+        return []
+
+    def prefix(self, text: str, limit: int = 10) -> list:
+        """Autocomplete: most populous places whose normalized name starts with the query."""
+        key, country = self._split_query(text)
+        if not key:
+            return []
+        lo = int(np.searchsorted(self._keys, key, side="left"))
+        hi = int(np.searchsorted(self._keys, key + b"\xff", side="left"))
+        candidates = self._key_places[self._key_offsets[lo]:self._key_offsets[hi]]
+        if len(candidates) > limit * 50:
+            # Very short prefixes match many places; keep only the most populous ones.
+            top = np.argpartition(-self._population[candidates], limit * 50)[:limit * 50]
+            candidates = candidates[top]
+        return self._rank(candidates.tolist(), country, limit)
+
+    def fuzzy(self, text: str, limit: int = 10) -> list:
+        """Places whose name is within one typo (insert/delete/substitute/transpose) of the query."""
+        key, country = self._split_query(text)
+        if not key:
+            return []
+        hashes = np.array([_hash64(v) for v in _deletes(key)], dtype=np.uint64)
+        lo = np.searchsorted(self._delete_hashes, hashes, side="left")
+        hi = np.searchsorted(self._delete_hashes, hashes, side="right")
+        query = key.decode("utf-8", "ignore")
+        key_ids = set()
+        for a, b in zip(lo, hi):
+            for k in self._delete_keys[a:b].tolist():
+                if k not in key_ids and _within_one_edit(query, self._keys[k].decode("utf-8", "ignore")):
+                    key_ids.add(k)
+        return self._rank(self._places_for_keys(sorted(key_ids)), country, limit)
+
+    def lookup(self, text: str):
+        """
+        Best single match for a free-text place of birth: exact name first, then one-typo matches.
+
+        Returns:
+            dict | None: The most populous matching place, or None.
+        """
+        matches = self.exact(text, limit=1) or self.fuzzy(text, limit=1)
+        return matches[0] if matches else None
+
+    def suggest(self, text: str, limit: int = 10) -> list:
+        """Autocomplete suggestions: prefix matches, topped up with one-typo matches."""
+        matches = self.prefix(text, limit)
+        if len(matches) < limit:
+            seen = {(m["name"], m["country"], m["latitude"]) for m in matches}
+            for match in self.fuzzy(text, limit):
+                if (match["name"], match["country"], match["latitude"]) not in seen:
+                    matches.append(match)
+        return matches[:limit]
+
+
+@functools.lru_cache(maxsize=1)
+def load_default_gazetteer():
+    """
+    Opens the deployment's place index once per process.
+
+    Returns:
+        Gazetteer | None: The index, or None if it has not been built.
+    """
+    path = Path(os.environ.get(GAZETTEER_DIR_ENV, DEFAULT_GAZETTEER_DIR))
+    if not (path / "meta.json").is_file():
+        return None
+    return Gazetteer(path)
+
+
+def resolve_birth_place(place: str, timezone_str: str = "UTC") -> dict:
+    """
+    Coordinates and timezone of a place of birth from the default index.
+
+    Args:
+        place (str): Place as typed by the user.
+        timezone_str (str): Timezone to use if the place is not found.
+
+    Returns:
+        dict: {"latitude", "longitude", "timezone", "place"}; "place" is the matched
+              record (see Gazetteer.lookup) or None, in which case the coordinates are
+              None too and the caller has to ask for them.
+    """
+    gazetteer = load_default_gazetteer()
+    match = gazetteer.lookup(place) if gazetteer is not None and place else None
+    if match is None:
+        return {"latitude": None, "longitude": None, "timezone": timezone_str, "place": None}
+    return {"latitude": match["latitude"], "longitude": match["longitude"], "timezone": match["timezone"],
+            "place": match}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the offline place index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="Build the index from a GeoNames dump.")
+    build.add_argument("source")
+    build.add_argument("--out", default=os.environ.get(GAZETTEER_DIR_ENV, str(DEFAULT_GAZETTEER_DIR)))
+    build.add_argument("--countries", help="GeoNames countryInfo.txt for country-name filtering.")
+    build.add_argument("--alternate-names", action="store_true", help="Also index alternate names.")
+    query = subparsers.add_parser("query", help="Look a place up.")
+    query.add_argument("text")
+    query.add_argument("--path", default=os.environ.get(GAZETTEER_DIR_ENV, str(DEFAULT_GAZETTEER_DIR)))
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        started = time.perf_counter()
+        out_dir = build_gazetteer(args.source, args.out, args.countries, args.alternate_names)
+        print(f"Wrote {out_dir} ({len(Gazetteer(out_dir))} places) in {time.perf_counter() - started:.1f}s")
+    else:
+        gazetteer = Gazetteer(args.path)
+        print(json.dumps({"lookup": gazetteer.lookup(args.text), "suggest": gazetteer.suggest(args.text)},
+                         indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
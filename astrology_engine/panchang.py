@@ -0,0 +1,265 @@
+# astrology_engine/panchang.py
+# This module computes the panchang (tithi, nakshatra, yoga, karana) for a birth
+# moment and streams day-by-day panchang calendars for a place.
+#
+# Every element is a monotonic angle divided into equal spans:
+#     tithi     = (Moon - Sun) / 12°      (30 per lunar month)
+#     karana    = (Moon - Sun) / 6°       (60 per lunar month)
+#     nakshatra = Moon / 13°20'           (27)
+#     yoga      = (Sun + Moon) / 13°20'   (27)
+# Transition instants are found for all elements of a chunk of days at once: the
+# angles are sampled on a coarse grid, every span boundary crossed between two grid
+# points is bracketed, and all brackets are refined together with a few vectorized
+# Newton steps that use the planets' daily speeds as derivatives.
+
+import datetime
+
+import numpy as np
+import pytz
+
+from astrology_engine import astronomy, ephemeris_table
+
+NAKSHATRA_NAMES = (
+    "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashira", "Ardra", "Punarvasu", "Pushya", "Ashlesha",
+    "Magha", "Purva Phalguni", "Uttara Phalguni", "Hasta", "Chitra", "Swati", "Vishakha", "Anuradha",
+    "Jyeshtha", "Mula", "Purva Ashadha", "Uttara Ashadha", "Shravana", "Dhanishta", "Shatabhisha",
+    "Purva Bhadrapada", "Uttara Bhadrapada", "Revati",
+)
+
+YOGA_NAMES = (
+    "Vishkambha", "Priti", "Ayushman", "Saubhagya", "Shobhana", "Atiganda", "Sukarma", "Dhriti", "Shula",
+    "Ganda", "Vriddhi", "Dhruva", "Vyaghata", "Harshana", "Vajra", "Siddhi", "Vyatipata", "Variyana",
+    "Parigha", "Shiva", "Siddha", "Sadhya", "Shubha", "Shukla", "Brahma", "Indra", "Vaidhriti",
+)
+
+_TITHI_DAYS = (
+    "Pratipada", "Dwitiya", "Tritiya", "Chaturthi", "Panchami", "Shashthi", "Saptami", "Ashtami",
+    "Navami", "Dashami", "Ekadashi", "Dwadashi", "Trayodashi", "Chaturdashi",
+)
+TITHI_NAMES = tuple(
+    [f"Shukla Paksha {day}" for day in _TITHI_DAYS] + ["Purnima"]
+    + [f"Krishna Paksha {day}" for day in _TITHI_DAYS] + ["Amavasya"]
+)
+
+_MOVABLE_KARANAS = ("Bava", "Balava", "Kaulava", "Taitila", "Garija", "Vanija", "Vishti")
+KARANA_NAMES = tuple(
+    ["Kimstughna"] + [_MOVABLE_KARANAS[i % 7] for i in range(56)] + ["Shakuni", "Chatushpada", "Naga"]
+)
+
+# element -> (span in degrees, names)
+ELEMENTS = {
+    "tithi": (12.0, TITHI_NAMES),
+    "nakshatra": (360.0 / 27.0, NAKSHATRA_NAMES),
+    "yoga": (360.0 / 27.0, YOGA_NAMES),
+    "karana": (6.0, KARANA_NAMES),
+}
+
+# Grid spacing for bracketing transitions. The fastest element (karana) needs at least
+# ~9.3 hours per span, so a 6-hour grid never hides two transitions of one element.
+_GRID_DAYS = 0.25
+_NEWTON_STEPS = 4
+# Sun's altitude at sunrise/sunset: refraction plus semi-diameter.
+_SUNRISE_ALTITUDE = -0.833
+
+
+def _element_angles(longitudes, speeds):
+    """Angles and their rates (degrees, degrees/day) for each element, from Sun/Moon columns."""
+    sun, moon = longitudes[:, 0], longitudes[:, 1]
+    v_sun, v_moon = speeds[:, 0], speeds[:, 1]
+    elongation = np.mod(moon - sun, 360.0)
+    return {
+        "tithi": (elongation, v_moon - v_sun),
+        "nakshatra": (moon, v_moon),
+        "yoga": (np.mod(sun + moon, 360.0), v_moon + v_sun),
+        "karana": (elongation, v_moon - v_sun),
+    }
+
+
+def panchang_at(sun_longitude: float, moon_longitude: float) -> dict:
+    """
+    Panchang elements for one instant.
+
+    Args:
+        sun_longitude (float): Sidereal Sun longitude in degrees.
+        moon_longitude (float): Sidereal Moon longitude in degrees.
+
+    Returns:
+        dict: {"tithi": ..., "nakshatra": ..., "yoga": ..., "karana": ...} names.
+    """
+    elongation = (moon_longitude - sun_longitude) % 360.0
+    angles = {
+        "tithi": elongation,
+        "nakshatra": moon_longitude % 360.0,
+        "yoga": (sun_longitude + moon_longitude) % 360.0,
+        "karana": elongation,
+    }
+    return {element: names[int(angles[element] // span) % len(names)]
+            for element, (span, names) in ELEMENTS.items()}
+
+
+def find_transitions(start_jd: float, end_jd: float) -> dict:
+    """
+    Instants at which each panchang element changes, between two Julian Days.
+
+    Args:
+        start_jd (float): Start of the search window (UT).
+        end_jd (float): End of the search window (UT).
+
+    Returns:
+        dict: element -> (jd array of transitions, int array of the element index that starts there),
+              both sorted by time.
+    """
+    grid = np.arange(start_jd, end_jd + _GRID_DAYS, _GRID_DAYS)
+    longitudes, speeds = ephemeris_table.sidereal_positions(grid)
+    angles = _element_angles(longitudes, speeds)
+
+    # Collect every bracketed boundary of every element, then refine them in one batch.
+    kinds, guesses, targets, starting = [], [], [], []
+    for element, (span, names) in ELEMENTS.items():
+        unwrapped = np.unwrap(angles[element][0], period=360.0)
+        index = np.floor(unwrapped / span).astype(np.int64)
+        crossed = np.diff(index)
+        # Grid interval of every crossed boundary (repeated if one interval crosses several).
+        interval = np.repeat(np.arange(len(crossed)), crossed)
+        nth = np.arange(len(interval)) - np.repeat(np.cumsum(crossed) - crossed, crossed)
+        boundary = index[interval] + 1 + nth
+        target = boundary * span
+        # Linear first guess inside the grid interval.
+        frac = (target - unwrapped[interval]) / (unwrapped[interval + 1] - unwrapped[interval])
+        kinds.append(np.full(len(interval), element))
+        guesses.append(grid[interval] + frac * _GRID_DAYS)
+        targets.append(np.mod(target, 360.0))
+        starting.append(np.mod(boundary, len(names)))
+
+    kinds = np.concatenate(kinds)
+    t = np.concatenate(guesses)
+    targets = np.concatenate(targets)
+    starting = np.concatenate(starting)
+    if not len(t):
+        return {element: (np.empty(0), np.empty(0, dtype=np.int64)) for element in ELEMENTS}
+
+    for _ in range(_NEWTON_STEPS):
+        longitudes, speeds = ephemeris_table.sidereal_positions(t)
+        angles = _element_angles(longitudes, speeds)
+        value = np.empty_like(t)
+        rate = np.empty_like(t)
+        for element in ELEMENTS:
+            mask = kinds == element
+            value[mask] = angles[element][0][mask]
+            rate[mask] = angles[element][1][mask]
+        error = np.mod(value - targets + 180.0, 360.0) - 180.0
+        t = t - error / rate
+
+    result = {}
+    for element in ELEMENTS:
+        mask = kinds == element
+        order = np.argsort(t[mask])
+        result[element] = (t[mask][order], starting[mask][order])
+    return result
+
+
+def _sun_equatorial(jd_ut):
+    """Right ascension and declination of the Sun (radians)."""
+    lam = np.radians(astronomy.tropical_longitudes(jd_ut)[:, 0])
+    eps = np.radians(astronomy.obliquity(jd_ut))
+    ra = np.arctan2(np.cos(eps) * np.sin(lam), np.cos(lam))
+    dec = np.arcsin(np.sin(eps) * np.sin(lam))
+    return ra, dec
+
+
+def sun_rise_set(local_noon_jd, latitude: float, longitude: float):
+    """
+    Sunrise and sunset around each local noon, solved for all days at once.
+
+    Args:
+        local_noon_jd (array-like): Julian Days (UT) near local noon of each day.
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees, east positive.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Sunrise and sunset Julian Days; NaN where the Sun
+                                       does not rise or set (polar day/night).
+    """
+    phi = np.radians(latitude)
+    h0 = np.radians(_SUNRISE_ALTITUDE)
+    events = []
+    for sign in (-1.0, 1.0):  # -1: rising (hour angle -H0), +1: setting (+H0)
+        t = np.array(local_noon_jd, dtype=np.float64)
+        for _ in range(3):
+            ra, dec = _sun_equatorial(t)
+            cos_h = (np.sin(h0) - np.sin(phi) * np.sin(dec)) / (np.cos(phi) * np.cos(dec))
+            with np.errstate(invalid="ignore"):
+                semi_arc = np.degrees(np.arccos(cos_h))  # NaN when |cos_h| > 1
+            hour_angle = astronomy.local_sidereal_time(t, longitude) - np.degrees(ra)
+            delta = np.mod(hour_angle - sign * semi_arc + 180.0, 360.0) - 180.0
+            t = t - delta / 360.98564736629
+        events.append(t)
+    return events[0], events[1]
+
+
+def _spans(element_transitions, names, day_start, day_end, to_local):
+    """Element spans overlapping [day_start, day_end)."""
+    times, starting = element_transitions
+    first = max(np.searchsorted(times, day_start, side="right") - 1, 0)
+    last = np.searchsorted(times, day_end, side="left")
+    spans = []
+    for i in range(first, last):
+        spans.append({
+            "name": names[starting[i]],
+            "start": to_local(times[i]),
+            "end": to_local(times[i + 1]) if i + 1 < len(times) else None,
+        })
+    return spans
+
+
+def panchang_calendar(start_date: datetime.date, end_date: datetime.date, latitude: float, longitude: float,
+                      timezone_str: str = "UTC", chunk_days: int = 32):
+    """
+    Streams day-by-day panchang records for a place.
+
+    Args:
+        start_date (datetime.date): First day (inclusive).
+        end_date (datetime.date): Last day (inclusive).
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees, east positive.
+        timezone_str (str): IANA timezone for day boundaries and the reported times.
+        chunk_days (int): Days solved per vectorized batch.
+
+    Yields:
+        dict: {"date", "sunrise", "sunset", "at_sunrise": {element: name},
+               "tithi"/"nakshatra"/"yoga"/"karana": [{"name", "start", "end"}, ...]}
+              with local ISO timestamps; spans cover every element active during the day.
+    """
+    tz = pytz.timezone(timezone_str)
+
+    def to_jd(moment):
+        return astronomy.datetime_to_jd(moment.astimezone(pytz.utc).replace(tzinfo=None))
+
+    def to_local(jd):
+        if np.isnan(jd):
+            return None
+        return pytz.utc.localize(astronomy.jd_to_datetime(jd)).astimezone(tz).isoformat()
+
+    day = start_date
+    while day <= end_date:
+        count = min(chunk_days, (end_date - day).days + 1)
+        days = [day + datetime.timedelta(days=i) for i in range(count + 1)]
+        # Local midnights of every day in the chunk plus the following one.
+        bounds = np.array([to_jd(tz.localize(datetime.datetime.combine(d, datetime.time()))) for d in days])
+        # Pad the window so the element active at the first midnight has a known start
+        # and the one active at the last midnight a known end (each lasts < 1.5 days).
+        transitions = find_transitions(bounds[0] - 1.5, bounds[-1] + 1.5)
+        sunrise, sunset = sun_rise_set((bounds[:-1] + bounds[1:]) / 2.0, latitude, longitude)
+        sunrise_longitudes, _ = ephemeris_table.sidereal_positions(np.nan_to_num(sunrise, nan=bounds[0]))
+
+        for i, d in enumerate(days[:-1]):
+            record = {
+                "date": d.isoformat(),
+                "sunrise": to_local(sunrise[i]),
+                "sunset": to_local(sunset[i]),
+                "at_sunrise": None if np.isnan(sunrise[i]) else panchang_at(*sunrise_longitudes[i, :2]),
+            }
+            for element, (_, names) in ELEMENTS.items():
+                record[element] = _spans(transitions[element], names, bounds[i], bounds[i + 1], to_local)
+            yield record
+        day = days[-1]
@@ -0,0 +1,174 @@
+# astrology_engine/result_cache.py
+# This module contains the two-tier result cache shared by the chart cache
+# (chart_cache.py) and the AI response cache (response_cache.py): a bounded
+# in-process LRU, optionally backed by a SQLite file that survives restarts and is
+# shared by all workers on a host. Entries may carry a time-to-live.
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class TwoTierCache:
+    """
+    Bounded in-process LRU with an optional SQLite backing store.
+
+    Values must be JSON-serializable. `get` returns a deep copy, so callers may
+    mutate results without corrupting the cache.
+
+    Args:
+        namespace (str): Name of this cache; several caches may share one SQLite file.
+        maxsize (int): Maximum number of entries kept in memory.
+        disk_path (str, optional): SQLite file for the on-disk tier. None keeps the cache in memory only.
+        ttl_seconds (float, optional): Default lifetime of an entry. None means entries never expire.
+    """
+
+    def __init__(self, namespace: str, maxsize: int = 1024, disk_path: str = None, ttl_seconds: float = None):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.disk_path = disk_path
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()  # key -> (value, expires_at or None)
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, expires REAL, "
+                             "PRIMARY KEY (namespace, key))")
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(cache)")]
+            if "expires" not in columns:  # files written before entries could expire
+                self._db.execute("ALTER TABLE cache ADD COLUMN expires REAL")
+
+    def _remember(self, key, value, expires):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, key, now):
+        """(value, tier, expired) for `key` without touching the counters; call with the lock held."""
+        expired = False
+        if key in self._memory:
+            value, expires = self._memory[key]
+            if expires is None or expires > now:
+                self._memory.move_to_end(key)
+                return value, "memory", False
+            del self._memory[key]
+            expired = True
+        if self._db is not None:
+            row = self._db.execute("SELECT value, expires FROM cache WHERE namespace = ? AND key = ?",
+                                   (self.namespace, key)).fetchone()
+            if row is not None:
+                if row[1] is None or row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    return value, "disk", False
+                self._db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                expired = True
+        return None, None, expired
+
+    def _store(self, key, value, ttl_seconds):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        expires = time.time() + ttl_seconds if ttl_seconds is not None else None
+        self._remember(key, value, expires)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO cache (namespace, key, value, expires) VALUES (?, ?, ?, ?)",
+                             (self.namespace, key, json.dumps(value), expires))
+
+    def get(self, key: str):
+        """
+        Looks a key up in memory, then on disk. Expired entries count as misses and are dropped.
+
+        Returns:
+            The cached value (a copy), or None on a miss.
+        """
+        with self._lock:
+            value, tier, expired = self._lookup(key, time.time())
+            if tier == "memory":
+                self.memory_hits += 1
+            elif tier == "disk":
+                self.disk_hits += 1
+            else:
+                self.expired += expired
+                self.misses += 1
+                return None
+            return copy.deepcopy(value)
+
+    def put(self, key: str, value, ttl_seconds: float = None):
+        """
+        Stores a value in memory and, if enabled, on disk.
+
+        Args:
+            key (str): Cache key.
+            value: JSON-serializable value.
+            ttl_seconds (float, optional): Lifetime of this entry; defaults to the cache's `ttl_seconds`.
+        """
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._store(key, value, ttl_seconds)
+
+    def update(self, key: str, fn, ttl_seconds: float = None):
+        """
+        Atomically replaces the value of `key` with `fn(current)`.
+
+        The read does not count as a hit or miss, and no other `put` or `update` in this
+        process can interleave with it.
+
+        Args:
+            key (str): Cache key.
+            fn (callable): Called with a copy of the current value (None if absent or expired);
+                           returns the new JSON-serializable value.
+            ttl_seconds (float, optional): Lifetime of the new entry; defaults to the cache's `ttl_seconds`.
+
+        Returns:
+            The stored value (a copy).
+        """
+        with self._lock:
+            current, _, _ = self._lookup(key, time.time())
+            value = copy.deepcopy(fn(copy.deepcopy(current)))
+            self._store(key, value, ttl_seconds)
+            return copy.deepcopy(value)
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries from both tiers. Returns the number of on-disk rows removed."""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (_, expires) in self._memory.items() if expires is not None and expires <= now]:
+                del self._memory[key]
+            if self._db is None:
+                return 0
+            return self._db.execute("DELETE FROM cache WHERE namespace = ? AND expires IS NOT NULL AND expires <= ?",
+                                    (self.namespace, now)).rowcount
+
+    def clear(self):
+        """Drops every entry of this namespace from both tiers and resets the counters."""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+            self.memory_hits = self.disk_hits = self.misses = self.expired = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for sizing the cache."""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "namespace": self.namespace,
+            "size": len(self._memory),
+            "maxsize": self.maxsize,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
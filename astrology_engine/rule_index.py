@@ -0,0 +1,283 @@
+# astrology_engine/rule_index.py
+# This module compiles the declarative conditions in rules/*.json into an inverted
+# index keyed on chart facts, so matching a chart only touches the rules whose
+# conditions mention a fact that actually occurs in that chart.
+#
+# A rule opts into indexed matching with a "when" entry, either one condition or a
+# list of conditions that must all hold:
+#
+#     "moon_in_cancer": {"when": {"planet": "Moon", "sign": "Cancer"}, "effect": "..."}
+#     "sun_in_7th":     {"when": {"planet": "Sun", "house": 7}, "effect": "..."}
+#     "mangal_dosha":   {"when": {"dosha": "Mangal Dosha"}, "effect": "..."}
+#     "saturn_dasha":   {"when": {"dasha": "Saturn"}, "effect": "..."}
+#     "vakri_shani":    {"when": [{"planet": "Saturn", "retrograde": true},
+#                                 {"planet": "Saturn", "house": 10}], "effect": "..."}
+#
+# Supported conditions: planet in sign, planet in house (whole-sign houses from the
+# Ascendant), planet retrograde, dosha present, and active Mahadasha ("dasha") or
+# Antardasha ("antardasha") lord. For transit timelines (transits.py) the planet
+# conditions describe the transiting planet, and {"planet": "Jupiter", "over": "Moon"}
+# matches a transit over a natal point.
+# Rules without "when" (e.g. general_predictions) are kept but never indexed.
+
+import datetime
+import hashlib
+import json
+from collections import namedtuple
+
+from astrology_engine.astronomy import ZODIAC_SIGNS
+from astrology_engine.dasha import dasha_from_chart
+
+# One compiled rule. `ordinal` preserves file/entry order so output is deterministic.
+CompiledRule = namedtuple("CompiledRule", ["ordinal", "category", "rule_id", "label", "entry"])
+
+_SIGN_INDEX = {sign: i for i, sign in enumerate(ZODIAC_SIGNS)}
+
+_ORDINALS = {1: "1st", 2: "2nd", 3: "3rd"}
+
+
+def _ordinal(n: int) -> str:
+    return _ORDINALS.get(n, f"{n}th")
+
+
+def _normalize(text) -> str:
+    return " ".join(str(text).split()).casefold()
+
+
+def compile_condition(condition: dict):
+    """
+    Turns one declarative condition into its fact key and a readable label.
+
+    Args:
+        condition (dict): A condition such as {"planet": "Sun", "house": 7}.
+
+    Returns:
+        tuple: (fact key, label), e.g. (("planet_house", "Sun", 7), "Sun in 7th house").
+
+    Raises:
+        ValueError: If the condition does not match any supported form.
+    """
+    if not isinstance(condition, dict):
+        raise ValueError(f"condition must be an object, got {condition!r}")
+    if "planet" in condition:
+        planet = str(condition["planet"]).strip().title()
+        if "sign" in condition:
+            sign = str(condition["sign"]).strip().title()
+            if sign not in _SIGN_INDEX:
+                raise ValueError(f"unknown sign {condition['sign']!r}")
+            return ("planet_sign", planet, sign), f"{planet} in {sign}"
+        if "house" in condition:
+            house = int(condition["house"])
+            if not 1 <= house <= 12:
+                raise ValueError(f"house must be between 1 and 12, got {condition['house']!r}")
+            return ("planet_house", planet, house), f"{planet} in {_ordinal(house)} house"
+        if condition.get("retrograde") is True:
+            return ("retrograde", planet), f"{planet} retrograde"
+        if "over" in condition:
+            point = str(condition["over"]).strip().title()
+            return ("transit_over", planet, point), f"{planet} over natal {point}"
+    elif "dosha" in condition:
+        return ("dosha", _normalize(condition["dosha"])), str(condition["dosha"]).strip()
+    elif "dasha" in condition:
+        planet = str(condition["dasha"]).strip().title()
+        return ("dasha", planet), f"{planet} Mahadasha"
+    elif "antardasha" in condition:
+        planet = str(condition["antardasha"]).strip().title()
+        return ("antardasha", planet), f"{planet} Antardasha"
+    raise ValueError(f"unsupported condition {condition!r}")
+
+
+def _active_dasha_facts(chart_data: dict, on_date: datetime.date):
+    timeline = dasha_from_chart(chart_data)
+    if timeline is not None:
+        try:
+            mahadasha, antardasha = timeline.active(on_date, depth=2)
+        except ValueError:  # on_date outside the chart's 120-year cycle
+            return
+        yield ("dasha", mahadasha.lord)
+        yield ("antardasha", antardasha.lord)
+        return
+    # Charts without a Moon longitude (e.g. hand-written test charts) only list Mahadasha years.
+    for period in chart_data.get("dasha_periods") or []:
+        if "start_year" in period and period["start_year"] <= on_date.year < period["end_year"]:
+            yield ("dasha", period["planet"])
+
+
+def chart_facts(chart_data: dict, on_date: datetime.date = None) -> set:
+    """
+    Extracts the indexable facts of a chart.
+
+    Args:
+        chart_data (dict): Data from calculator.py.
+        on_date (datetime.date, optional): Date used for the active dasha. Defaults to today.
+
+    Returns:
+        set: Fact keys in the same form produced by `compile_condition`.
+    """
+    facts = set()
+    positions = chart_data.get("planet_positions", {})
+    ascendant = positions.get("Ascendant")
+    ascendant_index = _SIGN_INDEX.get(ascendant["sign"]) if ascendant else None
+
+    for planet, position in positions.items():
+        sign = position.get("sign")
+        if sign not in _SIGN_INDEX:
+            continue
+        facts.add(("planet_sign", planet, sign))
+        if ascendant_index is not None:
+            house = (_SIGN_INDEX[sign] - ascendant_index) % 12 + 1
+            facts.add(("planet_house", planet, house))
+        if position.get("retrograde"):
+            facts.add(("retrograde", planet))
+
+    for dosha in chart_data.get("doshas") or []:
+        if dosha.get("present"):
+            facts.add(("dosha", _normalize(dosha["type"])))
+
+    facts.update(_active_dasha_facts(chart_data, on_date or datetime.date.today()))
+
+    return facts
+
+
+class _CategoryIndex:
+    """Inverted index for the rules of one category (one rules/*.json file)."""
+
+    def __init__(self, category: str, entries: dict):
+        self.entries = entries
+        self.errors = []
+        self._fingerprint = None
+        self._compiled = []
+        self._required = []
+        self._index = {}
+
+        for rule_id, entry in entries.items():
+            if not isinstance(entry, dict) or "when" not in entry:
+                continue
+            conditions = entry["when"] if isinstance(entry["when"], list) else [entry["when"]]
+            try:
+                compiled = [compile_condition(c) for c in conditions]
+            except (TypeError, ValueError) as e:
+                self.errors.append(f"{category}.{rule_id}: {e}")
+                continue
+            if not compiled:
+                self.errors.append(f"{category}.{rule_id}: empty 'when'")
+                continue
+            keys = dict(compiled)  # de-duplicates repeated conditions
+            ordinal = len(self._compiled)
+            label = " and ".join(keys.values())
+            self._compiled.append(CompiledRule(ordinal, category, rule_id, label, entry))
+            self._required.append(len(keys))
+            for key in keys:
+                self._index.setdefault(key, []).append(ordinal)
+
+    def __len__(self):
+        return len(self._compiled)
+
+    @property
+    def fingerprint(self) -> str:
+        if self._fingerprint is None:
+            canonical = json.dumps(self.entries, sort_keys=True, ensure_ascii=False, default=str)
+            self._fingerprint = hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+        return self._fingerprint
+
+    def match(self, facts: set, trigger: set = None) -> list:
+        hits = {}
+        for fact in facts:
+            for ordinal in self._index.get(fact, ()):
+                hits[ordinal] = hits.get(ordinal, 0) + 1
+        required = self._required
+        matched = (o for o, n in hits.items() if n == required[o])
+        if trigger is not None:
+            triggered = {o for fact in trigger for o in self._index.get(fact, ())}
+            matched = (o for o in matched if o in triggered)
+        return [self._compiled[o] for o in sorted(matched)]
+
+
+class RuleIndex:
+    """
+    All rule files compiled into inverted indexes from fact key to rules.
+
+    Matching counts, for every fact in the chart, how many conditions of each
+    candidate rule are satisfied; a rule fires when all of its conditions are.
+    The work done is proportional to the number of rules that mention the chart's
+    facts, not to the total number of rules.
+
+    Each category is compiled separately, so a new index can reuse the compiled
+    categories of a previous one whose entries did not change (see `compile_rules`).
+    """
+
+    def __init__(self, rules: dict, previous: "RuleIndex" = None):
+        self.rules = rules
+        self._categories = {}
+        reusable = previous._categories if previous is not None else {}
+
+        for category, entries in rules.items():
+            if not isinstance(entries, dict):
+                continue
+            compiled = reusable.get(category)
+            if compiled is None or compiled.entries is not entries:
+                compiled = _CategoryIndex(category, entries)
+            self._categories[category] = compiled
+
+    @property
+    def errors(self) -> list:
+        return [error for compiled in self._categories.values() for error in compiled.errors]
+
+    def __len__(self):
+        return sum(len(compiled) for compiled in self._categories.values())
+
+    @property
+    def fingerprint(self) -> str:
+        """Content hash of all rule files; stable across processes, cheap after the first call."""
+        digest = hashlib.sha1()
+        for category, compiled in sorted(self._categories.items()):
+            digest.update(f"{category}={compiled.fingerprint};".encode("utf-8"))
+        return digest.hexdigest()
+
+    def match(self, chart_data: dict, on_date: datetime.date = None) -> list:
+        """
+        Finds every compiled rule whose conditions all hold for the chart.
+
+        Args:
+            chart_data (dict): Data from calculator.py.
+            on_date (datetime.date, optional): Date used for the active dasha. Defaults to today.
+
+        Returns:
+            list[CompiledRule]: Matching rules in rule-file order.
+        """
+        return self.match_facts(chart_facts(chart_data, on_date))
+
+    def match_facts(self, facts: set, trigger: set = None, categories=None) -> list:
+        """
+        Finds every compiled rule whose conditions all hold for a set of facts.
+
+        Args:
+            facts (set): Fact keys as produced by `chart_facts` or `compile_condition`.
+            trigger (set, optional): Only rules with at least one condition among these facts
+                                     are returned, e.g. the facts a transit event just made true.
+            categories (Iterable[str], optional): Restrict matching to these rule categories.
+
+        Returns:
+            list[CompiledRule]: Matching rules in rule-file order.
+        """
+        matched = []
+        for category, compiled in self._categories.items():
+            if categories is None or category in categories:
+                matched.extend(compiled.match(facts, trigger))
+        return matched
+
+
+def compile_rules(rules: dict, previous: RuleIndex = None) -> RuleIndex:
+    """
+    Compiles the rule categories returned by `_load_all_rules_cached()`.
+
+    Args:
+        rules (dict): Mapping of rule category (file stem) to its rule entries.
+        previous (RuleIndex, optional): An earlier index. Categories whose entries are the
+                                        very same objects are reused instead of recompiled.
+
+    Returns:
+        RuleIndex: The compiled index. Rules with invalid conditions are skipped and
+                   described in `RuleIndex.errors`.
+    """
+    return RuleIndex(rules, previous)
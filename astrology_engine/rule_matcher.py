@@ -2,75 +2,118 @@
 # This module loads custom astrological rules from JSON files and matches them
 # against the calculated chart data.
 
-import json
+import datetime
+import functools
 from pathlib import Path
-import streamlit as st # Used for @st.cache_resource
 
-@st.cache_resource
-def _load_all_rules_cached():
+from astrology_engine.rule_index import RuleIndex, compile_rules
+from astrology_engine.rule_store import RuleStore
+
+@functools.lru_cache(maxsize=None)
+def _get_rule_store():
     """
-    Loads all astrological rules from the 'rules/' directory.
-    This function is cached by Streamlit to run only once.
+    Creates the process-wide rule store once and starts watching the 'rules/' directory.
+    Edited files are re-parsed in the background, so no restart is needed after a rule change.
     """
-    rules_data = {}
     # Navigate from current file (rule_matcher.py) up one level to 'astrology_engine',
     # then up another level to the project root, then into the 'rules' folder.
-    rules_dir = Path(__file__).parent.parent / "rules"
-    
-    if not rules_dir.is_dir():
-        st.error(f"Rules directory not found: {rules_dir}")
-        return {}
-
-    for rule_file in rules_dir.glob("*.json"):
-        try:
-            with open(rule_file, 'r', encoding='utf-8') as f:
-                rules_data[rule_file.stem] = json.load(f)
-            # st.write(f"Loaded rule file: {rule_file.name}") # For debugging deployment
-        except json.JSONDecodeError as e:
-            st.error(f"Error decoding JSON from {rule_file}: {e}")
-        except FileNotFoundError: # Should not happen with glob, but good practice
-            st.error(f"Rule file not found: {rule_file}")
-    return rules_data
-
-def match_rules(chart_data: dict, rules: dict):
+    store = RuleStore(Path(__file__).parent.parent / "rules")
+    store.watch(interval=2.0)
+    return store
+
+
+def _load_all_rules_cached():
+    """
+    Returns all astrological rules from the 'rules/' directory.
+    Rules come from the hot-reloading rule store, so this never touches the disk;
+    files that currently fail to load are listed by rule_load_errors().
+    """
+    global _compiled_rules
+    snapshot = _get_rule_store().snapshot
+    # The store compiles incrementally; hand its index to match_rules directly.
+    _compiled_rules = (snapshot.rules, snapshot.index)
+    return snapshot.rules
+
+
+def rule_load_errors() -> list:
+    """
+    Error messages of rule files that currently fail to load (their last good rules stay in use).
+
+    Returns:
+        list[str]: One message per broken file; empty when all files load.
+    """
+    return [entry["error"] for entry in _get_rule_store().snapshot.report if entry["status"] == "error"]
+
+
+# Sentence templates for matched rules, by rule category (file stem).
+_PREDICTION_TEMPLATES = {
+    "dosha_rules": "{label} present in the chart. {effect}",
+    "dasha_rules": "Dasha: {label} is active. {effect}",
+}
+_DEFAULT_TEMPLATE = "Rule: {label} suggests '{effect}'."
+
+# The compiled index for the most recently seen rules object. `_load_all_rules_cached`
+# returns the same dict until a rule file changes, so rules are compiled once per load, not per chart.
+_compiled_rules = (None, None)
+
+
+def get_rule_index(rules) -> RuleIndex:
+    """
+    Returns the compiled index for `rules`, compiling only when a new rules object is seen.
+
+    Args:
+        rules (dict | RuleIndex): Loaded rules from _load_all_rules_cached(), or an already compiled index.
+
+    Returns:
+        RuleIndex: The compiled rule index.
+    """
+    global _compiled_rules
+    if isinstance(rules, RuleIndex):
+        return rules
+    cached_rules, cached_index = _compiled_rules
+    if cached_rules is not rules:
+        cached_index = compile_rules(rules, previous=cached_index)
+        _compiled_rules = (rules, cached_index)
+    return cached_index
+
+
+def _effect_text(entry: dict) -> str:
+    return str(entry.get("effect") or entry.get("summary") or entry.get("outlook") or "").strip()
+
+
+def match_rules(chart_data: dict, rules, on_date: datetime.date = None):
     """
-    MOCK FUNCTION: Replace with your actual rule matching logic.
     Matches astrological chart data against loaded rules to generate raw predictions.
+    Rules declare their conditions with a "when" entry (see rule_index.py) and are
+    looked up through a compiled index, so adding rules never requires code changes.
 
     Args:
         chart_data (dict): Data from calculator.py.
-        rules (dict): Loaded rules from _load_all_rules_cached().
+        rules (dict | RuleIndex): Loaded rules from _load_all_rules_cached(), or an already compiled index.
+        on_date (datetime.date, optional): Date used for time-dependent rules (active dasha). Defaults to today.
 
     Returns:
         list: A list of strings, each representing a raw astrological prediction.
               These will be fed into the AI for humanization.
     """
     raw_predictions = []
+    rule_index = get_rule_index(rules)
 
     name = chart_data['birth_details']['name']
     moon_sign = chart_data['planet_positions']['Moon']['sign']
     ascendant_sign = chart_data['planet_positions']['Ascendant']['sign']
-    mars_dosha = chart_data['doshas'][0]['present'] if chart_data['doshas'] else False
 
     raw_predictions.append(f"Analyzing {name}'s chart...")
     raw_predictions.append(f"Moon is strongly placed in the sign of {moon_sign}.")
     raw_predictions.append(f"Ascendant is in {ascendant_sign}.")
-    
-    # --- Example of using loaded rules ---
-    # Access rules using dictionary keys
-    if "house_rules" in rules:
-        house_rules = rules["house_rules"]
-        if moon_sign == "Cancer" and "moon_in_cancer" in house_rules:
-            raw_predictions.append(f"Rule: Moon in Cancer suggests '{house_rules['moon_in_cancer']['effect']}'.")
-        # Add more specific rules here (e.g., Sun in 7th, Jupiter in 10th etc.)
-        # Based on your chart_data structure, check for relevant conditions.
 
-    if "dosha_rules" in rules and mars_dosha:
-        if "mangal_dosha" in rules["dosha_rules"]:
-            raw_predictions.append(f"Dosha: Mangal Dosha present. {rules['dosha_rules']['mangal_dosha']['effect']}.")
+    for rule in rule_index.match(chart_data, on_date):
+        template = _PREDICTION_TEMPLATES.get(rule.category, _DEFAULT_TEMPLATE)
+        raw_predictions.append(template.format(label=rule.label, effect=_effect_text(rule.entry)))
 
-    if "general_predictions" in rules:
-        raw_predictions.append(f"General outlook: {rules['general_predictions']['life_path_summary']['summary']}")
+    general_predictions = rule_index.rules.get("general_predictions", {})
+    if "life_path_summary" in general_predictions:
+        raw_predictions.append(f"General outlook: {general_predictions['life_path_summary']['summary']}")
 
 
     raw_predictions.append("Planetary periods (Dashas) indicate dynamic shifts ahead.")
@@ -80,9 +123,11 @@ def match_rules(chart_data: dict, rules: dict):
 
 if __name__ == '__main__':
     # Example usage for direct testing of this module
-    st.write("Running rule_matcher.py directly (for testing purposes).")
+    print("Running rule_matcher.py directly (for testing purposes).")
     loaded_rules = _load_all_rules_cached()
-    st.write(f"Loaded {len(loaded_rules)} rule categories: {list(loaded_rules.keys())}")
+    print(f"Loaded {len(loaded_rules)} rule categories: {list(loaded_rules.keys())}")
+    for error in get_rule_index(loaded_rules).errors:
+        print(f"Invalid rule skipped: {error}")
 
     mock_chart_test = {
         "birth_details": {"name": "Demo User", "gender": "Female", "dob": "1990-05-15", "tob": "10:30", "pob": "New Delhi, India"},
@@ -90,14 +135,14 @@ if __name__ == '__main__':
             "Sun": {"sign": "Taurus", "degree": 25},
             "Moon": {"sign": "Cancer", "degree": 12}, # Will trigger moon_in_cancer rule
             "Ascendant": {"sign": "Leo", "degree": 5},
-            "Mars": {"sign": "Scorpio", "degree": 18} # Example to trigger mangal dosha if logic exists
+            "Mars": {"sign": "Scorpio", "degree": 18}
         },
         "dasha_periods": [],
         "basic_panchang": {},
         "doshas": [{"type": "Mangal Dosha", "present": True, "details": "Mars in 7th"}] # Mock dosha presence
     }
     predictions = match_rules(mock_chart_test, loaded_rules)
-    st.write("\nGenerated Raw Predictions:")
+    print("\nGenerated Raw Predictions:")
     for p in predictions:
-        st.write(f"- {p}")
+        print(f"- {p}")
 
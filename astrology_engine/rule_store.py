@@ -0,0 +1,171 @@
+# astrology_engine/rule_store.py
+# This module keeps the rules in rules/*.json loaded and compiled, and picks up
+# edits without a process restart. Only files whose mtime or size changed are
+# re-parsed, and only their categories are recompiled (see rule_index.py).
+#
+# Readers always get a complete, immutable RuleSnapshot. A refresh builds the next
+# snapshot on the side and publishes it with a single attribute assignment, so
+# in-flight matches keep using the snapshot they started with and never wait.
+
+import json
+import logging
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+from astrology_engine.rule_index import RuleIndex, compile_rules
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULES_DIR = Path(__file__).parent.parent / "rules"
+
+# rules: category -> entries, index: compiled RuleIndex, report: per-file load results
+# of the refresh that produced this snapshot, version: increases whenever the rules change.
+RuleSnapshot = namedtuple("RuleSnapshot", ["rules", "index", "report", "version"])
+
+# Fingerprint, parsed contents and parse error (if any) of one rule file.
+_LoadedFile = namedtuple("_LoadedFile", ["mtime_ns", "size", "entries", "error"])
+
+
+def _errors(report: list) -> dict:
+    return {entry["file"]: entry["error"] for entry in report if entry["status"] == "error"}
+
+
+class RuleStore:
+    """
+    Hot-reloadable, incrementally compiled view of a rules directory.
+
+    Per-file report entries are dicts with:
+        "file": file name, "status": "loaded" | "reloaded" | "unchanged" | "removed" | "error",
+        "seconds": parse time, "rules": number of entries, "error": message or None.
+    A file that fails to parse keeps its last good contents, so a half-saved edit
+    never drops rules that were working a moment ago; it is reported as "error"
+    until it is fixed, but only re-parsed when it changes again.
+    """
+
+    def __init__(self, rules_dir=DEFAULT_RULES_DIR):
+        self.rules_dir = Path(rules_dir)
+        self._files = {}
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.snapshot = RuleSnapshot({}, compile_rules({}), [], 0)
+        self.last_report = []
+        self.refresh()
+
+    def _load_file(self, path: Path):
+        text = path.read_text(encoding="utf-8")
+        # Placeholder rule files are empty; treat them as empty categories.
+        return json.loads(text) if text.strip() else {}
+
+    def refresh(self) -> RuleSnapshot:
+        """
+        Re-parses changed files and publishes a new snapshot if anything changed. If only
+        the set of load errors changed (e.g. a good file was saved half-written), the new
+        snapshot keeps the rules, index and version and only carries the new report.
+
+        Returns:
+            RuleSnapshot: The current snapshot (new or unchanged). The per-file results of
+                          this refresh are in `last_report`.
+        """
+        with self._refresh_lock:
+            previous = self.snapshot
+            report = []
+            changed = False
+            files = {}
+
+            if not self.rules_dir.is_dir():
+                report.append({"file": str(self.rules_dir), "status": "error", "seconds": 0.0, "rules": 0,
+                               "error": f"Rules directory not found: {self.rules_dir}"})
+                paths = []
+            else:
+                paths = sorted(self.rules_dir.glob("*.json"))
+
+            for path in paths:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue  # Deleted between glob and stat; reported as removed below.
+                known = self._files.get(path.name)
+                if known is not None and (known.mtime_ns, known.size) == (stat.st_mtime_ns, stat.st_size):
+                    files[path.name] = known
+                    report.append({"file": path.name, "status": "error" if known.error else "unchanged",
+                                   "seconds": 0.0, "rules": len(known.entries), "error": known.error})
+                    continue
+
+                started = time.perf_counter()
+                try:
+                    entries = self._load_file(path)
+                    if not isinstance(entries, dict):
+                        raise ValueError("top level must be a JSON object")
+                except (OSError, UnicodeDecodeError, ValueError) as e:  # json.JSONDecodeError is a ValueError
+                    # Remember the fingerprint so a broken file is parsed once per edit,
+                    # and keep serving the last good contents.
+                    error = f"Error decoding JSON from {path}: {e}"
+                    entries = known.entries if known is not None else {}
+                    files[path.name] = _LoadedFile(stat.st_mtime_ns, stat.st_size, entries, error)
+                    changed = changed or known is None
+                    report.append({"file": path.name, "status": "error",
+                                   "seconds": time.perf_counter() - started,
+                                   "rules": len(entries), "error": error})
+                    continue
+
+                files[path.name] = _LoadedFile(stat.st_mtime_ns, stat.st_size, entries, None)
+                changed = True
+                report.append({"file": path.name, "status": "reloaded" if known is not None else "loaded",
+                               "seconds": time.perf_counter() - started, "rules": len(entries), "error": None})
+
+            for name in self._files.keys() - files.keys():
+                changed = True
+                report.append({"file": name, "status": "removed", "seconds": 0.0, "rules": 0, "error": None})
+
+            self._files = files
+            self.last_report = report
+            if not changed and previous.version > 0:
+                if _errors(report) != _errors(previous.report):
+                    self.snapshot = previous._replace(report=report)
+                return self.snapshot
+
+            rules = {Path(name).stem: loaded.entries for name, loaded in files.items()}
+            index = compile_rules(rules, previous=previous.index)
+            self.snapshot = RuleSnapshot(rules, index, report, previous.version + 1)
+            return self.snapshot
+
+    def watch(self, interval: float = 2.0):
+        """
+        Starts a daemon thread that calls `refresh()` every `interval` seconds,
+        so requests never pay for re-parsing. Calling it again is a no-op.
+        """
+        if self._watcher is not None:
+            return
+        self._stop.clear()
+
+        def _run():
+            last_error = None
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                    last_error = None
+                except Exception as e:  # Keep watching, but say why the rules are not updating.
+                    if repr(e) != last_error:  # once per distinct failure, not every interval
+                        logger.exception("Refreshing rules from %s failed", self.rules_dir)
+                    last_error = repr(e)
+
+        self._watcher = threading.Thread(target=_run, name="rule-store-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop(self):
+        """Stops the watcher thread started by `watch()`."""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    @property
+    def rules(self) -> dict:
+        return self.snapshot.rules
+
+    @property
+    def index(self) -> RuleIndex:
+        return self.snapshot.index
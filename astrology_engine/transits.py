@@ -0,0 +1,336 @@
+# astrology_engine/transits.py
+# This module streams the transit (gochar) timeline of a natal chart: sign ingresses,
+# retrograde and direct stations, transits over natal points, and the starts of
+# Mahadashas and Antardashas.
+#
+# Time is processed in chunks. For each chunk the planets are sampled on a coarse
+# grid (one day by default), every event is bracketed by the grid interval in which
+# its quantity changes sign (longitude minus a sign boundary or natal point, or the
+# planet's speed for stations), and all brackets of the chunk are refined together by
+# vectorized bisection. Ingresses and stations do not depend on the chart, so chunks
+# are aligned to a fixed grid and cached: a batch run over many charts samples and
+# solves the sky once per chunk and only computes the natal transits per chart.
+#
+# timeline_predictions() matches the events against the rule index (dasha_rules and
+# house_rules by default) and yields time-stamped predictions. Planet conditions of
+# those rules are read as conditions on the transiting planets (see rule_index.py).
+
+import bisect
+import datetime
+import functools
+
+import numpy as np
+import pytz
+
+from astrology_engine import ephemeris_table
+from astrology_engine.astronomy import PLANETS, ZODIAC_SIGNS, datetime_to_jd, jd_to_datetime
+from astrology_engine.dasha import dasha_from_chart
+from astrology_engine.rule_index import _ordinal
+
+# Planets whose ingresses are reported; the Moon changes sign every 2-3 days.
+INGRESS_PLANETS = ("Sun", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu")
+# Planets that station; the nodes move backwards steadily and the luminaries never do.
+STATION_PLANETS = ("Mars", "Mercury", "Jupiter", "Venus", "Saturn")
+# Slow planets whose passage over a natal point is significant.
+TRANSITING_PLANETS = ("Jupiter", "Saturn", "Rahu", "Ketu")
+NATAL_POINTS = PLANETS + ("Ascendant",)
+# Rule categories matched against transit events by default.
+TIMELINE_RULE_CATEGORIES = ("dasha_rules", "house_rules")
+
+# Grid spacing and chunk length in days. No graha crosses two sign boundaries or stations
+# twice within a day, so a one-day grid never hides an event. Chunks are aligned to
+# multiples of _CHUNK_DAYS from JD 0 so that every chart reuses the same cached chunks.
+_GRID_DAYS = 1.0
+_CHUNK_DAYS = 64
+# Halvings of a one-day bracket: 2**-17 days is under a second.
+_BISECTION_STEPS = 17
+
+_SIGN_INDEX = {sign: i for i, sign in enumerate(ZODIAC_SIGNS)}
+_PLANET_COLUMN = {planet: i for i, planet in enumerate(PLANETS)}
+
+
+def _wrap(angle):
+    """Angles folded into [-180, 180)."""
+    return np.mod(angle + 180.0, 360.0) - 180.0
+
+
+def _bisect(columns, targets, is_speed, lo, hi):
+    """
+    Refines many brackets at once. Event i is where the longitude of planet `columns[i]`
+    passes `targets[i]`, or where its speed passes zero if `is_speed[i]`.
+
+    Returns:
+        np.ndarray: Julian Days of the events.
+    """
+    rows = np.arange(len(lo))
+
+    def residual(t):
+        if not is_speed.any():
+            # Without a table the speeds cost two extra evaluations, so skip them if unused.
+            return _wrap(ephemeris_table.sidereal_longitudes(t)[rows, columns] - targets)
+        longitudes, speeds = ephemeris_table.sidereal_positions(t)
+        return np.where(is_speed, speeds[rows, columns], _wrap(longitudes[rows, columns] - targets))
+
+    negative_at_lo = residual(lo) < 0
+    for _ in range(_BISECTION_STEPS):
+        mid = (lo + hi) / 2.0
+        keep_lo = (residual(mid) < 0) == negative_at_lo
+        lo = np.where(keep_lo, mid, lo)
+        hi = np.where(keep_lo, hi, mid)
+    return (lo + hi) / 2.0
+
+
+@functools.lru_cache(maxsize=128)
+def _sky_chunk(start_jd: float):
+    """
+    Grid positions, ingresses and stations of one aligned chunk, shared by all charts.
+
+    Returns:
+        dict: "grid", "longitudes" (grid x 9), and "ingresses"/"stations" as tuples of
+              arrays (jd, planet column, ...) for events in [start_jd, start_jd + _CHUNK_DAYS).
+    """
+    grid = start_jd + np.arange(0.0, _CHUNK_DAYS + _GRID_DAYS / 2.0, _GRID_DAYS)
+    longitudes, speeds = ephemeris_table.sidereal_positions(grid)
+
+    # Ingresses: the sign of the unwrapped longitude changes between two grid points.
+    signs = np.floor(np.unwrap(longitudes, period=360.0, axis=0) / 30.0).astype(np.int64)
+    step = np.diff(signs, axis=0)
+    rows, cols = np.nonzero(step)
+    forward = step[rows, cols] > 0
+    boundaries = np.mod(np.where(forward, signs[rows + 1, cols], signs[rows, cols]) * 30.0, 360.0)
+    ingress_jd = _bisect(cols, boundaries, np.zeros(len(rows), dtype=bool), grid[rows], grid[rows + 1])
+    ingresses = (ingress_jd, cols, np.mod(signs[rows + 1, cols], 12), ~forward)
+
+    # Stations: the speed changes sign. The new direction is retrograde if it is now negative.
+    retrograde = speeds < 0
+    rows, cols = np.nonzero(retrograde[1:] != retrograde[:-1])
+    station_jd = _bisect(cols, np.zeros(len(rows)), np.ones(len(rows), dtype=bool), grid[rows], grid[rows + 1])
+    stations = (station_jd, cols, retrograde[rows + 1, cols])
+
+    for array in (grid, longitudes, *ingresses, *stations):
+        array.setflags(write=False)  # shared by every caller through the cache
+    return {"grid": grid, "longitudes": longitudes, "ingresses": ingresses, "stations": stations}
+
+
+def _natal_transits(chunk: dict, transiting: list, natal: dict) -> tuple:
+    """Transits of the `transiting` planet columns over the `natal` point longitudes within one chunk."""
+    if not transiting or not natal:
+        return np.empty(0), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    targets = np.array(list(natal.values()))
+    # Offset of every transiting planet from every natal point: (grid, planets, points).
+    offset = _wrap(chunk["longitudes"][:, transiting][:, :, None] - targets[None, None, :])
+    negative = offset < 0
+    # A sign change of the offset is a transit unless it is the jump at the opposite point.
+    crossed = (negative[1:] != negative[:-1]) & (np.abs(offset[1:] - offset[:-1]) < 180.0)
+    rows, planets, points = np.nonzero(crossed)
+    columns = np.asarray(transiting)[planets]
+    grid = chunk["grid"]
+    jd = _bisect(columns, targets[points], np.zeros(len(rows), dtype=bool), grid[rows], grid[rows + 1])
+    return jd, columns, points
+
+
+def _dasha_starts(timeline, start_jd: float, end_jd: float) -> list:
+    """(jd, level, lord, mahadasha lord) of every Mahadasha and Antardasha starting in the window."""
+    starts = []
+    for mahadasha in timeline.mahadashas():
+        if mahadasha.end_jd <= start_jd or mahadasha.start_jd >= end_jd:
+            continue
+        if start_jd <= mahadasha.start_jd < end_jd:
+            starts.append((mahadasha.start_jd, "Mahadasha", mahadasha.lord, mahadasha.lord))
+        for antardasha in mahadasha.children:
+            if start_jd <= antardasha.start_jd < end_jd:
+                starts.append((antardasha.start_jd, "Antardasha", antardasha.lord, mahadasha.lord))
+    return sorted(starts)
+
+
+def _to_jd(moment) -> float:
+    if isinstance(moment, (datetime.date, datetime.datetime)):
+        return datetime_to_jd(moment)
+    return float(moment)
+
+
+def transit_timeline(chart_data: dict, start, end, ingress_planets=INGRESS_PLANETS, station_planets=STATION_PLANETS,
+                     transiting_planets=TRANSITING_PLANETS, natal_points=NATAL_POINTS, include_dashas: bool = True,
+                     timezone_str: str = None):
+    """
+    Streams the timeline events of a natal chart in chronological order.
+
+    Args:
+        chart_data (dict): Data from calculator.py.
+        start (datetime.date | datetime.datetime | float): Window start (naive UTC or Julian Day), inclusive.
+        end (datetime.date | datetime.datetime | float): Window end, exclusive.
+        ingress_planets (Iterable[str]): Planets whose sign changes are reported.
+        station_planets (Iterable[str]): Planets whose retrograde/direct stations are reported.
+        transiting_planets (Iterable[str]): Planets whose passages over natal points are reported.
+        natal_points (Iterable[str]): Natal planets (and "Ascendant") transits are reported over.
+        include_dashas (bool): Also report the starts of Mahadashas and Antardashas.
+        timezone_str (str, optional): Timezone of the reported times; defaults to the chart's.
+
+    Yields:
+        dict: {"jd", "time" (local ISO), "type": "ingress" | "station" | "transit" | "dasha",
+               "planet", "label", "sky": {planet: {"sign", "house", "retrograde"}}, ...}
+              Ingresses add "sign", "house" (from the natal Ascendant) and "retrograde";
+              stations add "direction", "sign" and "house"; transits add "natal_point",
+              "sign", "house" and "retrograde"; dasha starts add "level" and "mahadasha".
+    """
+    start_jd, end_jd = _to_jd(start), _to_jd(end)
+    positions = chart_data["planet_positions"]
+    ascendant_sign = _SIGN_INDEX[positions["Ascendant"]["sign"]]
+    tz = pytz.timezone(timezone_str or chart_data.get("birth_details", {}).get("timezone") or "UTC")
+
+    ingress_columns = np.array([_PLANET_COLUMN[p] for p in ingress_planets], dtype=np.int64)
+    station_columns = np.array([_PLANET_COLUMN[p] for p in station_planets], dtype=np.int64)
+    transiting = [_PLANET_COLUMN[p] for p in transiting_planets]
+    natal = {point: positions[point]["longitude"] for point in natal_points if "longitude" in positions.get(point, {})}
+    natal_names = list(natal)
+    timeline = dasha_from_chart(chart_data) if include_dashas else None
+    dasha_starts = _dasha_starts(timeline, start_jd, end_jd) if timeline is not None else []
+    dasha_jds = [entry[0] for entry in dasha_starts]
+
+    def house(sign: int) -> int:
+        return (sign - ascendant_sign) % 12 + 1
+
+    def where(sign: int) -> str:
+        return f"{ZODIAC_SIGNS[sign]} ({_ordinal(house(sign))} house)"
+
+    for chunk_start in np.arange(np.floor(start_jd / _CHUNK_DAYS) * _CHUNK_DAYS, end_jd, _CHUNK_DAYS):
+        chunk = _sky_chunk(float(chunk_start))
+        events = []
+
+        jd, cols, entered, backwards = chunk["ingresses"]
+        for i in np.flatnonzero(np.isin(cols, ingress_columns)):
+            planet, sign = PLANETS[cols[i]], int(entered[i])
+            # The nodes always move backwards, so only other planets are flagged as retrograde.
+            retrograde = bool(backwards[i]) and planet not in ("Rahu", "Ketu")
+            events.append({"jd": float(jd[i]), "type": "ingress", "planet": planet, "sign": ZODIAC_SIGNS[sign],
+                           "house": house(sign), "retrograde": retrograde,
+                           "label": f"{planet} enters {where(sign)}" + (" while retrograde" if retrograde else "")})
+
+        jd, cols, turning_retrograde = chunk["stations"]
+        for i in np.flatnonzero(np.isin(cols, station_columns)):
+            direction = "retrograde" if turning_retrograde[i] else "direct"
+            events.append({"jd": float(jd[i]), "type": "station", "planet": PLANETS[cols[i]], "direction": direction,
+                           "label": f"{PLANETS[cols[i]]} turns {direction}"})
+
+        jd, cols, points = _natal_transits(chunk, transiting, natal)
+        for i in range(len(jd)):
+            point = natal_names[points[i]]
+            events.append({"jd": float(jd[i]), "type": "transit", "planet": PLANETS[cols[i]], "natal_point": point,
+                           "label": f"{PLANETS[cols[i]]} transits natal {point}"})
+
+        first = bisect.bisect_left(dasha_jds, chunk_start)
+        last = bisect.bisect_left(dasha_jds, chunk_start + _CHUNK_DAYS)
+        for jd_start, level, lord, mahadasha in dasha_starts[first:last]:
+            label = f"{lord} Mahadasha begins" if level == "Mahadasha" else f"{mahadasha}-{lord} Antardasha begins"
+            events.append({"jd": jd_start, "type": "dasha", "planet": lord, "level": level, "mahadasha": mahadasha,
+                           "label": label})
+
+        events = sorted((e for e in events if start_jd <= e["jd"] < end_jd), key=lambda e: e["jd"])
+        if not events:
+            continue
+
+        # The sky at every event, in one vectorized call.
+        longitudes, speeds = ephemeris_table.sidereal_positions(np.array([e["jd"] for e in events]))
+        sky_signs = (longitudes // 30.0).astype(np.int64)
+        for row, event in enumerate(events):
+            event["time"] = pytz.utc.localize(jd_to_datetime(event["jd"])).astimezone(tz).isoformat()
+            event["sky"] = {planet: {"sign": ZODIAC_SIGNS[sky_signs[row, col]], "house": house(sky_signs[row, col]),
+                                     "retrograde": bool(speeds[row, col] < 0)}
+                            for col, planet in enumerate(PLANETS)}
+            if event["type"] in ("station", "transit"):
+                col = _PLANET_COLUMN[event["planet"]]
+                sign = int(sky_signs[row, col])
+                event["sign"], event["house"] = ZODIAC_SIGNS[sign], house(sign)
+                if event["type"] == "station":
+                    event["label"] += f" in {where(sign)}"
+                else:
+                    event["retrograde"] = bool(speeds[row, col] < 0) and event["planet"] not in ("Rahu", "Ketu")
+                    event["label"] += f" in {where(sign)}"
+            yield event
+
+
+def event_facts(event: dict) -> set:
+    """The rule facts (see rule_index.py) an event makes true at its instant."""
+    planet = event["planet"]
+    if event["type"] == "ingress":
+        return {("planet_sign", planet, event["sign"]), ("planet_house", planet, event["house"])}
+    if event["type"] == "station":
+        return {("retrograde", planet)} if event["direction"] == "retrograde" else set()
+    if event["type"] == "transit":
+        return {("transit_over", planet, event["natal_point"])}
+    if event["type"] == "dasha":
+        return {("dasha" if event["level"] == "Mahadasha" else "antardasha", planet)}
+    return set()
+
+
+def _context_facts(event: dict, timeline) -> set:
+    """Facts that hold at the event's instant: the sky and the active dasha periods."""
+    facts = set()
+    for planet, position in event["sky"].items():
+        facts.add(("planet_sign", planet, position["sign"]))
+        facts.add(("planet_house", planet, position["house"]))
+        if position["retrograde"] and planet not in ("Rahu", "Ketu"):
+            facts.add(("retrograde", planet))
+    if timeline is not None:
+        try:
+            mahadasha, antardasha = timeline.active(event["jd"] + 1e-6, depth=2)
+        except ValueError:  # outside the chart's 120-year cycle
+            return facts
+        facts.add(("dasha", mahadasha.lord))
+        facts.add(("antardasha", antardasha.lord))
+    return facts
+
+
+def timeline_predictions(chart_data: dict, rules, start, end, categories=TIMELINE_RULE_CATEGORIES, **timeline_kwargs):
+    """
+    Time-stamped predictions: the transit timeline matched against the rules.
+    A rule fires at an event when the event makes one of its conditions true and all of
+    its other conditions hold at that instant (transiting positions, active dashas).
+
+    Args:
+        chart_data (dict): Data from calculator.py.
+        rules (dict | RuleIndex): Loaded rules from _load_all_rules_cached(), or a compiled index.
+        start, end: Window, as for `transit_timeline`.
+        categories (Iterable[str]): Rule categories to match.
+        **timeline_kwargs: Passed on to `transit_timeline`.
+
+    Yields:
+        dict: {"time", "date", "event" (the timeline event), "category", "rule_id", "prediction"}.
+    """
+    from astrology_engine.rule_matcher import _effect_text, get_rule_index
+
+    rule_index = get_rule_index(rules)
+    timeline = dasha_from_chart(chart_data)
+    for event in transit_timeline(chart_data, start, end, **timeline_kwargs):
+        trigger = event_facts(event)
+        if not trigger:
+            continue
+        for rule in rule_index.match_facts(_context_facts(event, timeline) | trigger, trigger, categories):
+            date = event["time"][:10]
+            yield {
+                "time": event["time"],
+                "date": date,
+                "event": event,
+                "category": rule.category,
+                "rule_id": rule.rule_id,
+                "prediction": f"From {date}: {event['label']}. {_effect_text(rule.entry)}",
+            }
+
+
+if __name__ == "__main__":
+    import time
+
+    from astrology_engine.calculator import calculate_chart
+    from astrology_engine.rule_matcher import _load_all_rules_cached
+
+    chart = calculate_chart("Test User", "Female", datetime.date(1990, 5, 15), datetime.time(10, 30),
+                            "New Delhi, India", "Asia/Kolkata", latitude=28.6139, longitude=77.2090)
+    today = datetime.date.today()
+    window_end = today.replace(year=today.year + 5)
+    started = time.perf_counter()
+    events = list(transit_timeline(chart, today, window_end))
+    print(f"{len(events)} events in the next 5 years ({time.perf_counter() - started:.3f}s)")
+    for event in events[:15]:
+        print(f"{event['time'][:16]}  {event['label']}")
+    for prediction in timeline_predictions(chart, _load_all_rules_cached(), today, window_end):
+        print(prediction["prediction"])
@@ -0,0 +1,160 @@
+# benchmarks/synthetic.py
+# This module generates the synthetic inputs used by the benchmark suite: birth
+# records and charts, rule directories of any size in the rules/*.json format,
+# chat histories, and a tiny randomly-initialized causal LM (with a word-level
+# tokenizer) that stands in for TinyLlama so generation can be measured offline.
+#
+# Everything is seeded, so two runs on the same machine see identical inputs.
+
+import datetime
+import json
+import random
+from pathlib import Path
+
+from astrology_engine.astronomy import PLANETS, ZODIAC_SIGNS
+from astrology_engine.dasha import DASHA_SEQUENCE
+
+_DOSHAS = ("Mangal Dosha", "Kalsarpa Dosha", "Pitra Dosha", "Shani Dosha")
+_CATEGORIES = ("house_rules", "dasha_rules", "dosha_rules", "career_rules", "love_marriage_rules",
+               "panchang_rules", "vastu_rules", "avakahada_rules")
+
+
+def birth_records(count: int, seed: int = 0) -> list:
+    """Birth records (see birth_record.py) spread over 1900-2050 and populated latitudes."""
+    rng = random.Random(seed)
+    start = datetime.datetime(1900, 1, 1)
+    records = []
+    for i in range(count):
+        moment = start + datetime.timedelta(minutes=rng.randrange(150 * 365 * 24 * 60))
+        records.append({
+            "name": f"Person {i}",
+            "gender": rng.choice(("Male", "Female")),
+            "dob": moment.date(),
+            "tob": moment.time(),
+            "pob": "Synthetic",
+            "timezone_str": "UTC",
+            "latitude": rng.uniform(-55.0, 65.0),
+            "longitude": rng.uniform(-180.0, 180.0),
+        })
+    return records
+
+
+def charts(count: int, seed: int = 0) -> list:
+    """Fully calculated charts for `count` synthetic births."""
+    from astrology_engine.calculator import calculate_chart
+
+    return [calculate_chart(**record) for record in birth_records(count, seed)]
+
+
+def _condition(rng: random.Random) -> dict:
+    kind = rng.random()
+    planet = rng.choice(PLANETS)
+    if kind < 0.4:
+        return {"planet": planet, "sign": rng.choice(ZODIAC_SIGNS)}
+    if kind < 0.8:
+        return {"planet": planet, "house": rng.randint(1, 12)}
+    if kind < 0.85:
+        return {"planet": planet, "retrograde": True}
+    if kind < 0.9:
+        return {"dosha": rng.choice(_DOSHAS)}
+    if kind < 0.95:
+        return {"dasha": rng.choice(DASHA_SEQUENCE)}
+    return {"antardasha": rng.choice(DASHA_SEQUENCE)}
+
+
+def rule_entries(count: int, seed: int = 0) -> dict:
+    """
+    `count` rules in the declarative "when" format, spread over the rule categories.
+    About a third of the rules combine two conditions.
+
+    Returns:
+        dict: category -> {rule_id: entry}.
+    """
+    rng = random.Random(seed)
+    rules = {category: {} for category in _CATEGORIES}
+    for i in range(count):
+        conditions = [_condition(rng) for _ in range(2 if rng.random() < 0.33 else 1)]
+        rules[_CATEGORIES[i % len(_CATEGORIES)]][f"rule_{i}"] = {
+            "when": conditions[0] if len(conditions) == 1 else conditions,
+            "effect": f"Synthetic effect number {i} for benchmarking.",
+            "remedy": f"Synthetic remedy number {i}.",
+        }
+    return rules
+
+
+def write_rules_dir(path, count: int, seed: int = 0) -> Path:
+    """Writes a rules directory with `count` synthetic rules (one JSON file per category)."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for category, entries in rule_entries(count, seed).items():
+        (path / f"{category}.json").write_text(json.dumps(entries), encoding="utf-8")
+    return path
+
+
+_CHAT_WORDS = ("career", "marriage", "health", "Saturn", "Jupiter", "transit", "remedy", "family",
+               "patience", "growth", "the", "and", "your", "will", "bring", "period", "energy")
+
+
+def chat_history(turns: int, seed: int = 0) -> list:
+    """Alternating user/assistant messages of realistic length."""
+    rng = random.Random(seed)
+    words = _CHAT_WORDS
+    history = []
+    for i in range(turns):
+        user = " ".join(rng.choice(words) for _ in range(rng.randint(6, 20))) + "?"
+        answer = ". ".join(" ".join(rng.choice(words) for _ in range(rng.randint(8, 16)))
+                           for _ in range(rng.randint(2, 6))) + "."
+        history.append({"role": "user", "content": user})
+        history.append({"role": "assistant", "content": answer})
+    return history
+
+
+def tiny_tokenizer(vocab_size: int = 2048):
+    """
+    A word-level fast tokenizer for tiny_causal_lm(): ids 0-2 are padding, BOS and EOS as
+    in TinyLlama, every word of the system prompt, the chat histories and the synthetic
+    insights has its own id, and the rest of the vocabulary is filler words, so anything
+    the stand-in model generates decodes to text. Requires transformers.
+    """
+    import re
+
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast
+
+    from ai_integrator import INTERPRETATION_MARKER, STOP_MARKERS, SYSTEM_PROMPT
+
+    specials = ["<unk>", "<s>", "</s>"]
+    text = " ".join((SYSTEM_PROMPT, INTERPRETATION_MARKER, " ".join(STOP_MARKERS), " ".join(_CHAT_WORDS),
+                     "Astrologer --- Previous Conversation Chart Insights Relevant to the Query Current",
+                     "Summary of earlier conversation Most recent messages Rule synthetic insight suggests",
+                     " ".join(str(i) for i in range(100)), "? ! . , ' ( ) -"))
+    words = list(dict.fromkeys(re.findall(r"\w+|[^\w\s]", text)))
+    words += [f"w{i}" for i in range(vocab_size - 1 - len(specials) - len(words))]
+    vocab = {"<pad>": 0, **{token: i + 1 for i, token in enumerate(specials[1:] + specials[:1] + words)}}
+
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.post_processor = processors.TemplateProcessing(single="<s> $A", special_tokens=[("<s>", 1)])
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, bos_token="<s>", eos_token="</s>",
+                                   unk_token="<unk>", pad_token="<pad>")
+
+
+def tiny_causal_lm(seed: int = 0):
+    """
+    A randomly-initialized two-layer Llama with TinyLlama's architecture at a fraction of
+    its size. Its output is noise, but generate() exercises the same code paths, so it
+    tracks regressions in the generation loop, caching and sampling without a download.
+
+    Returns:
+        tuple: (model, vocab_size). Requires torch and transformers.
+    """
+    import torch
+    from transformers import LlamaConfig, LlamaForCausalLM
+
+    torch.manual_seed(seed)
+    config = LlamaConfig(vocab_size=2048, hidden_size=128, intermediate_size=344, num_hidden_layers=2,
+                         num_attention_heads=4, num_key_value_heads=4, max_position_embeddings=2048,
+                         bos_token_id=1, eos_token_id=2, pad_token_id=0)
+    model = LlamaForCausalLM(config)
+    model.eval()
+    return model, config.vocab_size
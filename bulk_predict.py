@@ -0,0 +1,262 @@
+# bulk_predict.py
+# This module generates predictions for large lists of birth records from the command line.
+#
+# Records are streamed from a CSV (with a header row) or JSONL file and processed in
+# chunks on a process pool: every worker calculates the charts and matches the rules
+# of its chunk. Chunks are written to the JSONL output in input order as soon as they
+# are done, and at most `2 x workers` chunks are in flight, so memory stays flat however
+# long the input is. After every written chunk a checkpoint records the input offset and
+# the output size; `--resume` cuts the output back to that size (dropping lines written
+# after the last checkpoint, e.g. by a crash mid-chunk) and continues from the offset.
+#
+# With `--humanize`, the main process sends each chunk's raw predictions through the
+# batching inference scheduler (one model instance) and adds an "interpretation".
+# The run stops before writing anything if the model cannot be loaded.
+#
+# Usage:
+#     python bulk_predict.py customers.csv predictions.jsonl --workers 8
+#     python bulk_predict.py customers.jsonl predictions.jsonl --resume --humanize
+
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from astrology_engine.birth_record import parse_birth_record
+from astrology_engine.chart_cache import calculate_chart_cached, match_rules_cached
+from astrology_engine.rule_store import RuleStore
+
+RULES_DIR = Path(__file__).parent / "rules"
+
+# Rules of the current worker process, loaded once (no file watcher in batch workers).
+_worker_rules = None
+
+
+def read_records(path: str, start: int = 0):
+    """
+    Streams (offset, record) pairs from a CSV or JSONL file, skipping the first `start` records.
+    Blank JSONL lines are skipped without counting; malformed lines are yielded as errors.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (line for line in f if line.strip())
+        for offset, row in enumerate(itertools.islice(rows, start, None), start):
+            if isinstance(row, str):
+                try:
+                    row = json.loads(row)
+                except ValueError as e:
+                    row = {"_error": f"Invalid JSON: {e}"}
+            yield offset, row
+
+
+def _chunks(records, size: int):
+    iterator = iter(records)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _process_chunk(chunk: list, on_date: str, include_chart: bool) -> list:
+    """Worker: charts and raw predictions for one chunk of (offset, record) pairs."""
+    global _worker_rules
+    if _worker_rules is None:
+        _worker_rules = RuleStore(RULES_DIR).snapshot.index
+    day = datetime.date.fromisoformat(on_date)
+
+    results = []
+    for offset, record in chunk:
+        result = {"offset": offset, "id": record.get("id")}
+        try:
+            if "_error" in record:
+                raise ValueError(record["_error"])
+            chart_data = calculate_chart_cached(**parse_birth_record(record))
+            result["chart_key"] = chart_data["birth_details"]["cache_key"]
+            result["raw_predictions"] = match_rules_cached(chart_data, _worker_rules, day)
+            if include_chart:
+                result["chart"] = chart_data
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        results.append(result)
+    return results
+
+
+def _humanize_chunk(results: list):
+    """Adds an AI interpretation to every successful result; requests are batched across the chunk."""
+    from ai_integrator import humanize_response_async
+
+    futures = [(r, humanize_response_async(r["raw_predictions"])) for r in results if "raw_predictions" in r]
+    for result, future in futures:
+        try:
+            result["interpretation"] = future.result()
+        except Exception as e:
+            result["interpretation_error"] = f"{type(e).__name__}: {e}"
+
+
+def _checkpoint_path(output: str) -> str:
+    return output + ".checkpoint"
+
+
+def read_checkpoint(output: str):
+    """
+    The checkpoint of `output`.
+
+    Returns:
+        tuple | None: (offset of the first record not yet written, size of `output` in bytes
+                      at that point, or None for checkpoints that predate it); None without a
+                      readable checkpoint.
+    """
+    try:
+        with open(_checkpoint_path(output)) as f:
+            checkpoint = json.load(f)
+        size = checkpoint.get("bytes")
+        return int(checkpoint["offset"]), int(size) if size is not None else None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+def _write_checkpoint(output: str, offset: int, size: int):
+    path = _checkpoint_path(output)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"offset": offset, "bytes": size, "updated": datetime.datetime.now().isoformat()}, f)
+    os.replace(path + ".tmp", path)
+
+
+def _truncate_to_checkpoint(output: str, size: int):
+    """Drops whatever was written to `output` after the checkpoint that recorded `size` bytes."""
+    actual = os.path.getsize(output) if os.path.isfile(output) else 0
+    if actual < size:
+        raise ValueError(f"{output} is shorter ({actual} bytes) than its checkpoint ({size} bytes)")
+    if actual > size:
+        with open(output, "r+b") as f:
+            f.truncate(size)
+
+
+def run(input_path: str, output_path: str, workers: int = None, chunk_size: int = 256, resume: bool = False,
+        start: int = None, humanize: bool = False, include_chart: bool = False, on_date: datetime.date = None,
+        progress=sys.stderr) -> dict:
+    """
+    Processes every record of `input_path` and appends the results to `output_path`.
+
+    Args:
+        input_path (str): CSV (with header) or JSONL file of birth records (see birth_record.py).
+        output_path (str): JSONL file; one result per record, in input order.
+        workers (int, optional): Worker processes; defaults to the CPU count.
+        chunk_size (int): Records per task.
+        resume (bool): Continue from the checkpoint of `output_path`, first cutting the output
+                       back to its size at the checkpoint. Without a checkpoint the run starts
+                       over, unless `output_path` already holds results.
+        start (int, optional): Explicit input offset to start from (overrides the checkpoint).
+        humanize (bool): Add an AI interpretation to every result.
+        include_chart (bool): Include the full chart in every result.
+        on_date (datetime.date, optional): Date for active-dasha rules; defaults to today.
+        progress (file, optional): Stream for progress lines; None for silence.
+
+    Returns:
+        dict: {"start", "end", "records", "errors", "seconds", "records_per_second"}.
+
+    Raises:
+        ValueError: If resuming without a checkpoint into an output that is not empty, since
+                    the records already in it would be written again, or into an output
+                    shorter than its checkpoint says.
+        RuntimeError: If `humanize` is set and the AI model failed to load; otherwise every
+                      record would get the "unavailable" placeholder as its interpretation.
+    """
+    workers = workers or os.cpu_count()
+    if start is None and resume:
+        checkpoint = read_checkpoint(output_path)
+        if checkpoint is None:
+            if os.path.isfile(output_path) and os.path.getsize(output_path):
+                raise ValueError(f"No checkpoint for {output_path}; pass --start or remove the file to start over")
+        else:
+            start, size = checkpoint
+            if size is not None:
+                _truncate_to_checkpoint(output_path, size)
+    start = start or 0
+    if humanize:
+        from ai_integrator import start_model_loading
+
+        loader = start_model_loading()
+        loader.wait()
+        if loader.status != "ready":
+            raise RuntimeError(f"AI model failed to load ({loader.error}); run without --humanize or fix the model")
+    on_date = (on_date or datetime.date.today()).isoformat()
+    mode = "ab" if start else "wb"
+
+    started = time.perf_counter()
+    done = errors = 0
+    next_offset = start
+    with open(output_path, mode) as out, ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+
+        def write_oldest():
+            nonlocal done, errors, next_offset
+            results = in_flight.popleft().result()
+            if humanize:
+                _humanize_chunk(results)
+            # One write per chunk; the checkpoint only follows once it is all on disk.
+            out.write("".join(json.dumps(result, ensure_ascii=False, default=str) + "\n"
+                              for result in results).encode("utf-8"))
+            out.flush()
+            os.fsync(out.fileno())
+            done += len(results)
+            errors += sum("error" in r or "interpretation_error" in r for r in results)
+            next_offset = results[-1]["offset"] + 1
+            _write_checkpoint(output_path, next_offset, out.tell())
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                print(f"{done} records ({errors} errors), offset {next_offset}, "
+                      f"{done / elapsed:.1f} records/s", file=progress, flush=True)
+
+        for chunk in _chunks(read_records(input_path, start), chunk_size):
+            in_flight.append(pool.submit(_process_chunk, chunk, on_date, include_chart))
+            if len(in_flight) >= 2 * workers:
+                write_oldest()
+        while in_flight:
+            write_oldest()
+
+    seconds = time.perf_counter() - started
+    return {
+        "start": start,
+        "end": next_offset,
+        "records": done,
+        "errors": errors,
+        "seconds": round(seconds, 2),
+        "records_per_second": round(done / seconds, 1) if seconds else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate predictions for a file of birth records.")
+    parser.add_argument("input", help="CSV (with header) or JSONL file of birth records.")
+    parser.add_argument("output", help="JSONL file for the results.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--resume", action="store_true", help="Continue from the output's checkpoint.")
+    parser.add_argument("--start", type=int, default=None, help="Input offset to start from.")
+    parser.add_argument("--humanize", action="store_true", help="Add AI interpretations (batched).")
+    parser.add_argument("--include-chart", action="store_true", help="Include the full chart of every record.")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, default=None,
+                        help="Date for active-dasha rules (YYYY-MM-DD); defaults to today.")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run(args.input, args.output, args.workers, args.chunk_size, args.resume, args.start,
+                      args.humanize, args.include_chart, args.date)
+    except (RuntimeError, ValueError) as e:
+        parser.error(str(e))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
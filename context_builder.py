@@ -0,0 +1,171 @@
+# context_builder.py
+# This module keeps the conversation part of the AI prompt within a token budget
+# without re-processing the whole chat on every turn.
+#
+# Each session has a ConversationContext that absorbs only the messages appended
+# since its last use and counts their tokens once. The newest turns are kept
+# verbatim; when they no longer fit the budget, the oldest are compressed into a
+# rolling summary (their first sentence, a few dozen words), and summary lines
+# fall off the front once the summary has its own budget filled. Every message is
+# counted, compressed and dropped at most once, so a turn costs O(new message).
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+# Words kept from one turn when it moves into the summary.
+_SUMMARY_WORDS = 30
+
+
+def compress_turn(line: str, max_words: int = _SUMMARY_WORDS) -> str:
+    """
+    Short form of one formatted turn for the rolling summary: its first sentence,
+    capped at `max_words` words, with the "User:"/"Astrologer:" speaker prefix kept.
+    """
+    first = _SENTENCE_END.split(line.strip(), 1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        return " ".join(words[:max_words]) + " ..."
+    return " ".join(words)
+
+
+class ConversationContext:
+    """
+    Token-budgeted view of one session's conversation.
+
+    Args:
+        count_tokens (Callable[[str], int]): Token counter, e.g. built on the model's tokenizer.
+        budget_tokens (int): Tokens available for the whole prompt.
+        summary_tokens (int): Tokens the rolling summary may use at most.
+        min_recent_turns (int): Newest turns that are never compressed, even if over budget.
+    """
+
+    def __init__(self, count_tokens, budget_tokens: int = 1600, summary_tokens: int = 256, min_recent_turns: int = 2):
+        self.count_tokens = count_tokens
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.min_recent_turns = min_recent_turns
+        self.last_used = time.monotonic()
+        self._reset()
+
+    def _reset(self):
+        self._seen = 0  # messages of the history already absorbed
+        self._last_seen = None  # the last absorbed message, to detect a replaced history
+        self._recent = deque()  # (line, tokens), oldest first
+        self._recent_tokens = 0
+        self._summary = deque()  # (line, tokens), oldest first
+        self._summary_tokens = 0
+        self._fixed = {}  # text -> tokens for the prompt parts outside the history
+        self._rendered = None
+
+    def cached_count(self, text: str) -> int:
+        """Token count of a fixed prompt part (system prompt, insights), counted once per session."""
+        if text not in self._fixed:
+            if len(self._fixed) > 16:  # insights/queries change rarely; keep the memo small
+                self._fixed.clear()
+            self._fixed[text] = self.count_tokens(text)
+        return self._fixed[text]
+
+    def extend(self, history: list, format_message):
+        """
+        Absorbs the messages appended to `history` since the last call.
+
+        Args:
+            history (list): Chat messages {"role", "content"}, oldest first; only ever appended to.
+            format_message (Callable[[dict], str | None]): Turns a message into a prompt line (None skips it).
+        """
+        self.last_used = time.monotonic()
+        history = history or []
+        if len(history) < self._seen or (self._seen and history[self._seen - 1] != self._last_seen):
+            self._reset()  # the chat was cleared or rewritten; start over
+        for message in history[self._seen:]:
+            line = format_message(message)
+            if line:
+                tokens = self.count_tokens(line)
+                self._recent.append((line, tokens))
+                self._recent_tokens += tokens
+                self._rendered = None
+        if len(history) > self._seen:
+            self._seen = len(history)
+            self._last_seen = dict(history[-1])
+
+    def render(self, fixed_tokens: int) -> tuple:
+        """
+        Summary and verbatim turns that fit next to `fixed_tokens` of other prompt text.
+
+        Returns:
+            tuple[list[str], list[str]]: (summary lines, recent turn lines), oldest first.
+        """
+        available = max(self.budget_tokens - fixed_tokens, 0)
+        summary_budget = min(self.summary_tokens, available)
+
+        # Move the oldest verbatim turns into the summary until the history fits.
+        while (self._recent_tokens + self._summary_tokens > available
+               and len(self._recent) > self.min_recent_turns):
+            line, tokens = self._recent.popleft()
+            self._recent_tokens -= tokens
+            short = compress_turn(line)
+            short_tokens = self.count_tokens(short)
+            self._summary.append((short, short_tokens))
+            self._summary_tokens += short_tokens
+            self._rendered = None
+            while self._summary and self._summary_tokens > summary_budget:
+                _, dropped = self._summary.popleft()
+                self._summary_tokens -= dropped
+
+        # The summary yields to the newest turns if they alone fill the budget.
+        while self._summary and self._recent_tokens + self._summary_tokens > available:
+            _, dropped = self._summary.popleft()
+            self._summary_tokens -= dropped
+            self._rendered = None
+
+        if self._rendered is None:
+            self._rendered = ([line for line, _ in self._summary], [line for line, _ in self._recent])
+        return self._rendered
+
+    @property
+    def history_tokens(self) -> int:
+        return self._recent_tokens + self._summary_tokens
+
+
+class ContextStore:
+    """
+    ConversationContext per session, evicting the least recently used beyond `max_sessions`
+    and any idle for longer than `idle_seconds`. Any per-session object with a `last_used`
+    monotonic timestamp can be stored (insight_retrieval.py keeps its indexes here too).
+    """
+
+    def __init__(self, max_sessions: int = 256, idle_seconds: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, factory) -> ConversationContext:
+        """The session's context, created with `factory()` on first use."""
+        now = time.monotonic()
+        with self._lock:
+            for stale in [s for s, c in self._contexts.items() if now - c.last_used > self.idle_seconds]:
+                del self._contexts[stale]
+            context = self._contexts.get(session_id)
+            if context is None:
+                context = self._contexts[session_id] = factory()
+            self._contexts.move_to_end(session_id)
+            while len(self._contexts) > self.max_sessions:
+                self._contexts.popitem(last=False)
+            return context
+
+    def peek(self, session_id: str):
+        """The session's stored object, or None; never creates one."""
+        with self._lock:
+            return self._contexts.get(session_id)
+
+    def put(self, session_id: str, context):
+        """Stores (or replaces) the session's object."""
+        with self._lock:
+            self._contexts[session_id] = context
+            self._contexts.move_to_end(session_id)
+            while len(self._contexts) > self.max_sessions:
+                self._contexts.popitem(last=False)
@@ -0,0 +1,202 @@
+# inference_scheduler.py
+# This module batches text-generation requests from all sessions onto the one shared
+# model, so concurrent users share a forward pass instead of contending for the CPU.
+#
+# Callers `submit` a prompt and get a concurrent.futures.Future. A single worker
+# thread takes the first queued request, waits up to `max_wait_seconds` for more
+# (at most `max_batch_size`), left-pads the prompts to one tensor and runs one
+# `model.generate` for the batch. Every row stops on its own at EOS or at a turn
+# marker; finished rows are only carried as padding until the batch completes.
+#
+# torch and transformers are imported only once generation runs, so importing this
+# module keeps the app's startup fast (see model_loading.py).
+
+import functools
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from telemetry import record_generation, span
+
+
+@functools.lru_cache(maxsize=None)
+def _stop_on_marker_class():
+    import torch
+    from transformers import StoppingCriteria
+
+    class StopOnMarker(StoppingCriteria):
+        def __init__(self, tokenizer, prompt_length, markers, window, abort):
+            self.tokenizer = tokenizer
+            self.prompt_length = prompt_length
+            self.markers = markers
+            self.window = window
+            self.abort = abort
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.abort is not None and self.abort.is_set():
+                return torch.ones(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+            start = max(self.prompt_length, input_ids.shape[1] - self.window)
+            tails = self.tokenizer.batch_decode(input_ids[:, start:], skip_special_tokens=True)
+            done = [any(marker in tail for marker in self.markers) for tail in tails]
+            return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+    return StopOnMarker
+
+
+def stop_on_marker(tokenizer, prompt_length: int, markers=("User:",), window: int = 16, abort=None):
+    """
+    A StoppingCriteria that stops each sequence once its newly generated text contains a
+    turn marker, so the model does not spend tokens inventing the user's next message.
+    Only the last few tokens of every row are decoded per step, which keeps the check cheap.
+
+    Args:
+        tokenizer: The model's tokenizer.
+        prompt_length (int): Width of the (padded) prompt; generated tokens start here.
+        markers (tuple[str, ...]): Texts that end a sequence.
+        window (int): Number of trailing tokens decoded per check.
+        abort (threading.Event, optional): Once set, every sequence stops at the next step,
+                                           e.g. because nobody reads the output any more.
+
+    Returns:
+        transformers.StoppingCriteria: For a StoppingCriteriaList passed to `model.generate`.
+    """
+    return _stop_on_marker_class()(tokenizer, prompt_length, markers, window, abort)
+
+
+def cut_at_marker(text: str, markers=("User:",)) -> str:
+    """Generated text up to the first turn marker, stripped."""
+    for marker in markers:
+        text = text.split(marker, 1)[0]
+    return text.strip()
+
+
+class _Request:
+    __slots__ = ("prompt", "future", "enqueued")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+
+class InferenceScheduler:
+    """
+    Dynamic batching front end for one causal LM.
+
+    Args:
+        tokenizer: The model's tokenizer. Prompts are padded on the left per call; the
+                   tokenizer's own padding side is left alone for other users of it.
+        model: The causal LM.
+        generation_config (dict): Keyword arguments for `model.generate` (sampling settings, max_new_tokens).
+        max_batch_size (int): Maximum number of requests per `generate` call.
+        max_wait_seconds (float): How long the first request of a batch waits for company.
+        stop_markers (tuple[str, ...]): Texts that end a sequence early.
+    """
+
+    def __init__(self, tokenizer, model, generation_config: dict, max_batch_size: int = 4,
+                 max_wait_seconds: float = 0.05, stop_markers=("User:",)):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.generation_config = dict(generation_config)
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.stop_markers = stop_markers
+
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token = tokenizer.eos_token
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self.batch_sizes = Counter()
+        self.requests = 0
+        self.max_queue_depth = 0
+        self._total_wait = 0.0
+        self._worker = threading.Thread(target=self._run, name="inference-scheduler", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt: str) -> Future:
+        """
+        Queues a prompt for generation.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the generated text (without the prompt),
+                                       cut at the first stop marker; or to the generation error.
+        """
+        request = _Request(prompt)
+        self._queue.put(request)
+        with self._lock:
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        return request.future
+
+    def _next_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = batch[0].enqueued + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [r for r in self._next_batch() if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            started = time.monotonic()
+            with self._lock:
+                self.batch_sizes[len(batch)] += 1
+                self.requests += len(batch)
+                self._total_wait += sum(started - r.enqueued for r in batch)
+            try:
+                with span("llm.batch", size=len(batch)):
+                    texts = self._generate([r.prompt for r in batch])
+                for request, text in zip(batch, texts):
+                    request.future.set_result(text)
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+
+    def _generate(self, prompts: list) -> list:
+        import torch
+        from transformers import StoppingCriteriaList
+
+        device = next(self.model.parameters()).device
+        # Left padding keeps every prompt's last token in the final column, so generation
+        # starts at the same position for all rows.
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, padding_side="left")
+        inputs = {key: value.to(device) for key, value in inputs.items()}
+        width = inputs["input_ids"].shape[1]
+        stopping_criteria = StoppingCriteriaList([stop_on_marker(self.tokenizer, width, self.stop_markers)])
+        started = time.perf_counter()
+        with torch.no_grad():
+            output = self.model.generate(
+                **inputs,
+                **self.generation_config,
+                stopping_criteria=stopping_criteria,
+                pad_token_id=self.tokenizer.pad_token_id,
+                eos_token_id=self.tokenizer.eos_token_id,
+            )
+        # Rows that finished early are padded to the batch length, so only real tokens are counted.
+        generated_tokens = int((output[:, width:] != self.tokenizer.pad_token_id).sum())
+        record_generation(int(inputs["attention_mask"].sum()), generated_tokens, time.perf_counter() - started,
+                          mode="batch")
+        texts = self.tokenizer.batch_decode(output[:, width:], skip_special_tokens=True)
+        return [cut_at_marker(text, self.stop_markers) for text in texts]
+
+    def stats(self) -> dict:
+        """Queue depth and batch-size metrics."""
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "batches": batches,
+                "mean_batch_size": self.requests / batches if batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "mean_wait_ms": 1000.0 * self._total_wait / self.requests if self.requests else 0.0,
+            }
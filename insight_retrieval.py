@@ -0,0 +1,283 @@
+# insight_retrieval.py
+# This module picks the chart insights relevant to a follow-up question, so follow-up
+# prompts carry a few grounded facts instead of none (or all of them).
+#
+# Two BM25 indexes are searched. The session index holds what was found for this
+# chart: every matched rule's effect and remedy, plus the other raw predictions. It
+# is built once when the chart is submitted and kept per session. The rule-text index
+# holds every rule in rules/*.json as general knowledge; it is built once per rule
+# contents (keyed on the rule index fingerprint) and shared by all sessions. Rule
+# texts score at a discount and are labelled as general, since they may not apply to
+# this chart. A follow-up then costs one pass over the postings of the query's terms.
+
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+
+import numpy as np
+
+from context_builder import ContextStore
+from telemetry import span
+
+# Insights added to a follow-up prompt.
+TOP_K = int(os.environ.get("JYOTISH_RETRIEVAL_TOP_K", "5"))
+# Score multiplier for general rule texts relative to the session's own insights.
+GENERAL_RULE_WEIGHT = 0.5
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can chart do does for from has have how i in is it its me my of on or "
+    "so that the their there this to was what when where which who why will with you your".split()
+)
+_ORDINAL_WORDS = {"first": "1st", "second": "2nd", "third": "3rd", "fourth": "4th", "fifth": "5th",
+                  "sixth": "6th", "seventh": "7th", "eighth": "8th", "ninth": "9th", "tenth": "10th",
+                  "eleventh": "11th", "twelfth": "12th"}
+# Query words expanded with the terms rules use for the same life area.
+_QUERY_SYNONYMS = {
+    "job": ("career", "profession", "10th"), "work": ("career", "profession", "10th"),
+    "career": ("profession", "10th"), "money": ("wealth", "finance", "2nd", "11th"),
+    "marriage": ("spouse", "partner", "partnerships", "7th"), "wife": ("spouse", "marriage", "7th"),
+    "husband": ("spouse", "marriage", "7th"), "love": ("relationships", "partner", "romance", "5th"),
+    "health": ("disease", "6th", "1st"), "mother": ("maternal", "home", "4th"), "home": ("family", "4th"),
+    "children": ("child", "5th"), "remedy": ("remedies", "remedy"), "remedies": ("remedy",),
+}
+
+# One searchable insight: the prompt text and the (category, rule_id) it came from, if any.
+Insight = namedtuple("Insight", ["text", "source"])
+
+
+def tokenize(text: str) -> list:
+    """Lower-cased word tokens without stopwords; ordinal words become "7th" and so on."""
+    tokens = []
+    for token in _TOKEN.findall(str(text).lower()):
+        if token in _STOPWORDS:
+            continue
+        tokens.append(_ORDINAL_WORDS.get(token, token))
+    return tokens
+
+
+def _query_terms(query: str) -> list:
+    terms = tokenize(query)
+    return terms + [synonym for term in terms for synonym in _QUERY_SYNONYMS.get(term, ())]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents, with postings stored as NumPy arrays.
+
+    Args:
+        documents (list[str]): Texts to index.
+        k1 (float): Term-frequency saturation.
+        b (float): Length normalization.
+    """
+
+    def __init__(self, documents: list, k1: float = 1.2, b: float = 0.75):
+        self.k1, self.b = k1, b
+        postings = {}
+        lengths = np.zeros(len(documents))
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, ([], []))
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf)
+        n = len(documents)
+        self._norm = k1 * (1.0 - b + b * lengths / max(lengths.mean() if n else 0.0, 1.0))
+        # term -> (document ids, term frequencies, idf)
+        self._postings = {
+            term: (np.array(ids), np.array(tfs, dtype=np.float64),
+                   math.log(1.0 + (n - len(ids) + 0.5) / (len(ids) + 0.5)))
+            for term, (ids, tfs) in postings.items()
+        }
+        self._size = n
+
+    def __len__(self):
+        return self._size
+
+    def scores(self, terms: list) -> np.ndarray:
+        """BM25 score of every document for the query terms (repeated terms count once)."""
+        scores = np.zeros(self._size)
+        for term in set(terms):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            ids, tfs, idf = posting
+            scores[ids] += idf * tfs * (self.k1 + 1.0) / (tfs + self._norm[ids])
+        return scores
+
+
+def _rule_text(label: str, entry: dict) -> str:
+    effect = str(entry.get("effect") or entry.get("summary") or entry.get("outlook") or "").strip()
+    text = f"{label}: {effect}" if label else effect
+    if entry.get("remedy"):
+        text += f" Remedy: {str(entry['remedy']).strip()}"
+    return text
+
+
+def _rule_label(rule_id: str, entry: dict) -> str:
+    from astrology_engine.rule_index import compile_condition
+
+    when = entry.get("when")
+    if when is None:
+        return rule_id.replace("_", " ").capitalize()
+    try:
+        conditions = when if isinstance(when, list) else [when]
+        return " and ".join(dict(compile_condition(c) for c in conditions).values())
+    except (TypeError, ValueError):
+        return rule_id.replace("_", " ").capitalize()
+
+
+class _RuleTextIndex:
+    """BM25 over every rule in the rule files, as general knowledge."""
+
+    def __init__(self, rules: dict):
+        self.insights = []
+        for category, entries in rules.items():
+            if not isinstance(entries, dict):
+                continue
+            for rule_id, entry in entries.items():
+                if isinstance(entry, dict):
+                    text = _rule_text(_rule_label(rule_id, entry), entry)
+                    self.insights.append(Insight(f"General rule, {text}", (category, rule_id)))
+        self.index = BM25Index([insight.text for insight in self.insights])
+
+
+# The rule-text index for the most recently seen rule contents: (fingerprint, index).
+_rule_texts = (None, None)
+_rule_texts_lock = threading.Lock()
+
+
+def rule_text_index(rule_index) -> _RuleTextIndex:
+    """
+    The rule-text index for a compiled RuleIndex, rebuilt only when the rule contents change.
+    """
+    global _rule_texts
+    fingerprint = rule_index.fingerprint
+    with _rule_texts_lock:
+        cached_fingerprint, cached = _rule_texts
+        if cached_fingerprint != fingerprint:
+            with span("retrieval.index_rules", rules=len(rule_index)):
+                cached = _RuleTextIndex(rule_index.rules)
+            _rule_texts = (fingerprint, cached)
+        return cached
+
+
+class SessionInsights:
+    """
+    The retrievable insights of one chart session.
+
+    Args:
+        raw_predictions (list[str]): match_rules() output for the chart.
+        matched_rules (list[CompiledRule], optional): The rules that matched, for their remedies.
+        rule_texts (_RuleTextIndex, optional): General rule texts searched alongside.
+        reasons (dict, optional): Label -> why it holds in this chart, e.g. the chart's dosha details.
+    """
+
+    def __init__(self, raw_predictions: list, matched_rules: list = (), rule_texts: _RuleTextIndex = None,
+                 reasons: dict = None):
+        reasons = reasons or {}
+        self.insights = []
+        for rule in matched_rules:
+            # A dosha's reason ("Mars in 8th house from Lagna") makes it findable by planet and house.
+            reason = reasons.get(rule.label)
+            label = f"{rule.label} ({reason})" if reason else rule.label
+            self.insights.append(Insight(_rule_text(label, rule.entry), (rule.category, rule.rule_id)))
+        effects = [str(rule.entry.get("effect") or "").strip() for rule in matched_rules]
+        # Predictions already covered by a matched rule (with its remedy) are not repeated.
+        self.insights += [Insight(str(p), None) for p in raw_predictions
+                          if not any(effect and effect in p for effect in effects)]
+        self.index = BM25Index([insight.text for insight in self.insights])
+        self.rule_texts = rule_texts
+        self.predictions = list(raw_predictions)
+        self.last_used = time.monotonic()
+
+    def search(self, query: str, k: int = TOP_K) -> list:
+        """
+        The `k` insights most relevant to `query`, best first. Session insights outrank
+        general rule texts of equal score; rules already among the session's are skipped.
+        Without any matching term the session's first rule insights are returned, so a
+        vague follow-up ("tell me more") still gets chart facts.
+
+        Returns:
+            list[str]: Insight texts for the prompt.
+        """
+        self.last_used = time.monotonic()
+        with span("retrieval.search", candidates=len(self.insights)) as searching:
+            terms = _query_terms(query)
+            scores = self.index.scores(terms)
+            candidates = [(scores[i], i, self.insights[i]) for i in np.flatnonzero(scores > 0)]
+            if self.rule_texts is not None and len(self.rule_texts.index):
+                own = {insight.source for insight in self.insights}
+                general = self.rule_texts.index.scores(terms) * GENERAL_RULE_WEIGHT
+                # Enough of the best general rules to fill k after skipping the session's own.
+                top = np.flatnonzero(general > 0)
+                if len(top) > k + len(own):
+                    top = top[np.argpartition(-general[top], k + len(own))[:k + len(own)]]
+                candidates += [(general[i], len(self.insights) + int(i), self.rule_texts.insights[i])
+                               for i in top if self.rule_texts.insights[i].source not in own]
+            candidates.sort(key=lambda c: (-c[0], c[1]))
+            if candidates:
+                found = [insight.text for _, _, insight in candidates[:k]]
+            else:
+                found = [insight.text for insight in self.insights if insight.source is not None][:k]
+            searching.set(returned=len(found))
+        return found
+
+
+_session_store = ContextStore()
+
+
+def index_session(session_id: str, raw_predictions: list, rules=None, chart_data: dict = None,
+                  on_date=None) -> SessionInsights:
+    """
+    Builds the session's insight index, or returns the existing one for the same predictions.
+
+    Args:
+        session_id (str): Chat session identifier; None builds an index that is not kept.
+        raw_predictions (list[str]): match_rules() output for the session's chart.
+        rules (dict | RuleIndex, optional): The loaded rules, for remedies and general rule texts.
+        chart_data (dict, optional): The chart; with `rules` its matched rules' remedies are indexed.
+        on_date (datetime.date, optional): Date used for the active dasha when re-matching rules.
+
+    Returns:
+        SessionInsights: The session's index.
+    """
+    def factory():
+        with span("retrieval.index_session", predictions=len(raw_predictions)):
+            matched, rule_texts, reasons = [], None, {}
+            if chart_data is not None:
+                reasons = {item["type"]: item.get("details") for item in chart_data.get("doshas") or []}
+            if rules is not None:
+                from astrology_engine.rule_matcher import get_rule_index
+
+                rule_index = get_rule_index(rules)
+                rule_texts = rule_text_index(rule_index)
+                if chart_data is not None:
+                    matched = rule_index.match(chart_data, on_date)
+            return SessionInsights(raw_predictions, matched, rule_texts, reasons)
+
+    if session_id is None:
+        return factory()
+    insights = _session_store.get(session_id, factory)
+    if insights.predictions != list(raw_predictions):
+        # A new chart in the same session; replace its index.
+        insights = factory()
+        _session_store.put(session_id, insights)
+    return insights
+
+
+def relevant_insights(session_id: str, query: str, k: int = TOP_K) -> list:
+    """
+    The top-k insights of an indexed session for a follow-up question.
+
+    Returns:
+        list[str]: Insight texts, best first; empty if the session has not been indexed.
+    """
+    insights = _session_store.peek(session_id)
+    if insights is None or not query:
+        return []
+    return insights.search(query, k)
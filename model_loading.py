@@ -0,0 +1,217 @@
+# model_loading.py
+# This module loads the causal LM with a selectable CPU load profile and reports what
+# each profile costs: load time, resident memory and generation speed.
+#
+# Profiles:
+#     fp32  - full precision, the previous behavior (about 4.4 GB resident for TinyLlama).
+#     bf16  - bfloat16 weights, half the memory; only fast on CPUs with native bf16
+#             (AVX512-BF16 / AMX), so "auto" picks it only there.
+#     int8  - dynamic int8 quantization of every Linear layer, about a quarter of fp32.
+#             Quantized in place, so the peak stays near one fp32 copy. Uses
+#             torch.ao.quantization, which recent torch releases deprecate in favour of
+#             torchao (it warns on every load); torchao's quantize_ is used once it is
+#             gone. torchao's int8 tensors kept more memory resident in our measurements,
+#             so it is not preferred while both exist.
+#     auto  - bf16 where supported, otherwise int8.
+# All profiles load with low_cpu_mem_usage, so safetensors weights are memory-mapped
+# instead of copied through a second full-size buffer; a local model directory
+# (JYOTISH_MODEL_DIR) is read offline without touching the Hugging Face Hub.
+#
+# torch and transformers are imported inside the functions that need them, so importing
+# this module (e.g. for its settings) stays instant.
+#
+# Usage:
+#     python model_loading.py --profile int8 --threads 4
+#     python model_loading.py --profile all
+
+import argparse
+import json
+import os
+import resource
+import time
+
+LOAD_PROFILES = ("fp32", "bf16", "int8", "auto")
+MODEL_DIR_ENV = "JYOTISH_MODEL_DIR"
+MODEL_PROFILE_ENV = "JYOTISH_MODEL_PROFILE"
+MODEL_THREADS_ENV = "JYOTISH_MODEL_THREADS"
+
+_BENCHMARK_PROMPT = "The planets in a birth chart describe"
+
+
+def bf16_supported() -> bool:
+    """True if this CPU has native bfloat16 arithmetic (AVX512-BF16 or AMX)."""
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def resolve_profile(profile: str) -> str:
+    """Concrete profile for `profile`, resolving "auto"."""
+    if profile not in LOAD_PROFILES:
+        raise ValueError(f"Unknown load profile {profile!r}; expected one of {', '.join(LOAD_PROFILES)}")
+    if profile == "auto":
+        return "bf16" if bf16_supported() else "int8"
+    return profile
+
+
+def resident_memory_mb() -> float:
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def peak_resident_memory_mb() -> float:
+    """Peak resident set size of this process in MB since start (or since reset_peak_memory)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def reset_peak_memory():
+    """Restarts the peak RSS count at the current RSS (Linux only; elsewhere the peak is since start)."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of every Linear layer, in place: each layer's fp32 weights
+    are replaced as it is converted, so no second full copy of the model is made.
+
+    Returns:
+        tuple: (model, quantizer) with quantizer "torchao" or "torch.ao".
+    """
+    import torch
+
+    quantize_dynamic = getattr(getattr(torch.ao, "quantization", None), "quantize_dynamic", None)
+    if quantize_dynamic is not None:
+        # Without inplace=True this deep-copies the fp32 model first, doubling the peak.
+        quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model, "torch.ao"
+    from torchao.quantization import Int8DynamicActivationInt8WeightConfig, quantize_
+
+    quantize_(model, Int8DynamicActivationInt8WeightConfig())
+    return model, "torchao"
+
+
+def set_threads(num_threads: int = None):
+    """
+    Sets torch's intra-op thread count (and inter-op count, if torch has not started any work yet).
+    With several replicas per box, give each one its share of the cores instead of all of them.
+    """
+    if not num_threads:
+        return
+    import torch
+
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(max(1, num_threads // 2))
+    except RuntimeError:
+        pass  # can only be set once, before any parallel work
+
+
+def model_source(model_name: str) -> tuple:
+    """(name or path, from_pretrained kwargs): the local model directory if configured, else the Hub name."""
+    local_dir = os.environ.get(MODEL_DIR_ENV)
+    if local_dir:
+        return local_dir, {"local_files_only": True, "use_safetensors": True}
+    return model_name, {}
+
+
+def load_model(model_name: str, profile: str = "fp32", num_threads: int = None):
+    """
+    Loads tokenizer and model for CPU inference with a load profile.
+
+    Args:
+        model_name (str): Hugging Face model id (ignored when JYOTISH_MODEL_DIR is set).
+        profile (str): One of LOAD_PROFILES.
+        num_threads (int, optional): Intra-op threads for torch.
+
+    Returns:
+        tuple: (tokenizer, model, report) where report is
+               {"profile", "dtype", "threads", "load_seconds", "rss_mb", "peak_rss_mb"} (and
+               "quantizer" for int8); peak_rss_mb is the highest RSS reached while loading.
+    """
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    profile = resolve_profile(profile)
+    set_threads(num_threads)
+    source, kwargs = model_source(model_name)
+
+    reset_peak_memory()
+    started = time.perf_counter()
+    tokenizer = AutoTokenizer.from_pretrained(source, **kwargs)
+    dtype = torch.bfloat16 if profile == "bf16" else torch.float32
+    model = AutoModelForCausalLM.from_pretrained(source, torch_dtype=dtype, low_cpu_mem_usage=True, **kwargs)
+    quantizer = None
+    if profile == "int8":
+        model, quantizer = quantize_int8(model)
+    model.eval()
+    load_seconds = time.perf_counter() - started
+
+    report = {
+        "profile": profile,
+        "dtype": "int8" if profile == "int8" else str(dtype).replace("torch.", ""),
+        "threads": torch.get_num_threads(),
+        "load_seconds": round(load_seconds, 2),
+        "rss_mb": round(resident_memory_mb(), 1),
+        "peak_rss_mb": round(peak_resident_memory_mb(), 1),
+    }
+    if quantizer is not None:
+        report["quantizer"] = quantizer
+    return tokenizer, model, report
+
+
+def measure_tokens_per_second(tokenizer, model, new_tokens: int = 16, prompt: str = _BENCHMARK_PROMPT) -> float:
+    """
+    Greedy generation speed in new tokens per second. Also serves as a warm-up run.
+    """
+    import torch
+
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    started = time.perf_counter()
+    with torch.no_grad():
+        output = model.generate(**inputs, max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False,
+                                pad_token_id=tokenizer.eos_token_id)
+    generated = output.shape[1] - inputs["input_ids"].shape[1]
+    return generated / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model load profiles.")
+    parser.add_argument("--model", default="TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+    parser.add_argument("--profile", default="auto", choices=LOAD_PROFILES + ("all",))
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--new-tokens", type=int, default=32)
+    args = parser.parse_args()
+
+    # Resident memory only grows within one process, so "all" is only comparable for
+    # load time and speed; run one profile per process for memory figures.
+    profiles = ("fp32", "bf16", "int8") if args.profile == "all" else (args.profile,)
+    for profile in profiles:
+        tokenizer, model, report = load_model(args.model, profile, args.threads)
+        report["tokens_per_second"] = round(measure_tokens_per_second(tokenizer, model, args.new_tokens), 2)
+        print(json.dumps(report))
+        del model
+
+
+if __name__ == "__main__":
+    main()
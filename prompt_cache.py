@@ -0,0 +1,180 @@
+# prompt_cache.py
+# This module keeps the model's attention key/value state for prompts it has already
+# processed, so each chat turn only prefills the text appended since the last turn.
+#
+# Every session stores the token ids it has run through the model and the matching
+# DynamicCache. A new prompt is compared with those ids; the cache is cropped to the
+# longest common token prefix and `model.generate` only encodes the remainder. The
+# state of the fixed SYSTEM_PROMPT is computed once and shared by all sessions, so
+# even a session's first prompt skips re-encoding it. Sessions idle for too long, or
+# beyond the session/token limits, are evicted oldest first.
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+def _new_cache():
+    # Imported on first use; the model (and transformers) is loaded by then.
+    from transformers import DynamicCache
+
+    return DynamicCache()
+
+
+def _common_prefix_length(a, b) -> int:
+    """Number of leading token ids shared by two sequences."""
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+class _PromptState:
+    __slots__ = ("token_ids", "cache", "last_used")
+
+    def __init__(self, token_ids: list, cache):
+        self.token_ids = token_ids
+        self.cache = cache
+        self.last_used = time.monotonic()
+
+
+class PromptStateCache:
+    """
+    Per-session prefix key/value cache for `model.generate`.
+
+    Usage per turn:
+        cache, reused = prompt_cache.checkout(session_id, input_ids)
+        output = model.generate(input_ids=..., past_key_values=cache, ...)
+        prompt_cache.checkin(session_id, output[0], cache)
+
+    A checked-out state belongs to the caller until it is checked in, so two requests
+    of one session never write into the same cache.
+
+    Args:
+        max_sessions (int): Maximum number of sessions holding a cached state.
+        idle_seconds (float): Sessions unused for this long are evicted.
+        max_total_tokens (int): Upper bound on the tokens cached across all sessions;
+                                bounds memory at roughly tokens x layers x 2 x hidden size.
+    """
+
+    def __init__(self, max_sessions: int = 32, idle_seconds: float = 1800.0, max_total_tokens: int = 65536):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.max_total_tokens = max_total_tokens
+        self._sessions = OrderedDict()
+        self._shared = None  # _PromptState of the system prompt, never handed out uncopied
+        self._lock = threading.Lock()
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+        self.evictions = 0
+
+    @property
+    def has_shared_prefix(self) -> bool:
+        return self._shared is not None
+
+    def set_shared_prefix(self, model, prefix_ids: list):
+        """
+        Encodes the prefix common to every prompt (the system prompt) once and keeps its state.
+
+        Args:
+            model: The causal LM.
+            prefix_ids (list[int]): Token ids of the shared prefix, as produced by the tokenizer
+                                    for the start of every prompt.
+        """
+        import torch  # The model is loaded, so torch is already imported.
+
+        cache = _new_cache()
+        device = next(model.parameters()).device
+        with torch.no_grad():
+            model(input_ids=torch.tensor([prefix_ids], device=device), past_key_values=cache, use_cache=True)
+        with self._lock:
+            self._shared = _PromptState(list(prefix_ids), cache)
+
+    def checkout(self, session_id: str, input_ids: list):
+        """
+        The cache to pass to `model.generate` for a prompt, holding as much of it as possible.
+
+        Args:
+            session_id (str): Conversation identifier.
+            input_ids (list[int]): Token ids of the full prompt.
+
+        Returns:
+            tuple[DynamicCache, int]: The cache (owned by the caller until `checkin`) and the
+                                      number of prompt tokens it already covers.
+        """
+        with self._lock:
+            self._evict_idle()
+            state = self._sessions.pop(session_id, None) if session_id is not None else None
+            shared = self._shared
+
+        # At least the last prompt token must be fed to the model to get next-token logits.
+        limit = len(input_ids) - 1
+        session_reuse = min(_common_prefix_length(state.token_ids, input_ids), limit) if state else 0
+        shared_reuse = min(_common_prefix_length(shared.token_ids, input_ids), limit) if shared else 0
+
+        if state is not None and session_reuse >= shared_reuse and session_reuse > 0:
+            cache, reused = state.cache, session_reuse
+        elif shared_reuse > 0:
+            cache, reused = copy.deepcopy(shared.cache), shared_reuse
+        else:
+            cache, reused = _new_cache(), 0
+        if reused and cache.get_seq_length() > reused:
+            # A negative length drops that many tokens from the end; cropping to a positive
+            # length is deprecated in recent transformers releases.
+            cache.crop(reused - cache.get_seq_length())
+
+        with self._lock:
+            self.reused_tokens += reused
+            self.prefilled_tokens += len(input_ids) - reused
+        return cache, reused
+
+    def checkin(self, session_id: str, sequence_ids, cache):
+        """
+        Stores the state after generation for the session's next turn.
+
+        Args:
+            session_id (str): Conversation identifier; None discards the state.
+            sequence_ids: Prompt plus generated token ids (list or 1-D tensor).
+            cache (DynamicCache): The cache passed to `model.generate`.
+        """
+        if session_id is None:
+            return
+        length = cache.get_seq_length()
+        token_ids = [int(t) for t in sequence_ids[:length]]
+        with self._lock:
+            self._sessions[session_id] = _PromptState(token_ids, cache)
+            self._sessions.move_to_end(session_id)
+            self._evict_over_limits()
+
+    def drop(self, session_id: str):
+        """Forgets a session, e.g. when its chat is reset."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict_idle(self):
+        now = time.monotonic()
+        for session_id in [s for s, state in self._sessions.items() if now - state.last_used > self.idle_seconds]:
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def _evict_over_limits(self):
+        total = sum(len(state.token_ids) for state in self._sessions.values())
+        while self._sessions and (len(self._sessions) > self.max_sessions or total > self.max_total_tokens):
+            _, state = self._sessions.popitem(last=False)
+            total -= len(state.token_ids)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            processed = self.reused_tokens + self.prefilled_tokens
+            return {
+                "sessions": len(self._sessions),
+                "cached_tokens": sum(len(state.token_ids) for state in self._sessions.values()),
+                "shared_prefix_tokens": len(self._shared.token_ids) if self._shared else 0,
+                "reused_tokens": self.reused_tokens,
+                "prefilled_tokens": self.prefilled_tokens,
+                "reuse_rate": self.reused_tokens / processed if processed else 0.0,
+                "evictions": self.evictions,
+            }
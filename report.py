@@ -0,0 +1,418 @@
+# report.py
+# This module renders the downloadable PDF report (birth details, chart summary and
+# the chat) in a background worker pool, so a Streamlit run never blocks on fpdf2.
+#
+# Rendering is incremental. Fonts are parsed once per process into a template
+# document; each session copies the template and lays out its static pages (cover
+# and chart summary) on the copy. That open document is kept per session and only
+# the chat messages added since the last render are laid out onto it; the PDF is
+# produced from a copy, so the kept document stays open for the next append. If
+# earlier messages change, the static pages are laid out again on a fresh copy.
+# The finished bytes are cached per session and chat version (a digest of the
+# messages), so repeat downloads and reruns of an unchanged chat are instant.
+#
+# Open documents and cached bytes are bounded by an estimated memory budget
+# (JYOTISH_REPORT_CACHE_MB), not by a session count: a kept document costs about
+# the size of its font files (every copy carries its own parsed font tables), so
+# the least recently rendered sessions are dropped once the estimate exceeds it.
+#
+# Copying open documents and refreshing their fonts before output relies on fpdf2
+# internals, so requirements.txt pins fpdf2; check _output when upgrading it.
+#
+# Fonts: JYOTISH_REPORT_FONT / JYOTISH_REPORT_BOLD_FONT point at TrueType files;
+# DejaVu Sans is used if installed, otherwise the built-in Helvetica (Latin-1 only).
+
+import copy
+import datetime
+import functools
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telemetry import register_stats, span
+
+FONT_PATH_ENV = "JYOTISH_REPORT_FONT"
+BOLD_FONT_PATH_ENV = "JYOTISH_REPORT_BOLD_FONT"
+WORKERS_ENV = "JYOTISH_REPORT_WORKERS"
+CACHE_MB_ENV = "JYOTISH_REPORT_CACHE_MB"
+DEFAULT_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+DEFAULT_BOLD_FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+# Estimated memory for open documents and rendered bytes across all sessions; the least
+# recently rendered session is dropped first.
+DEFAULT_CACHE_MB = 64
+# Rendered versions kept per session (the current one and the one before it).
+_VERSIONS_PER_SESSION = 2
+# Estimated size of an open document besides its fonts, and per character laid out on it
+# (measured with tracemalloc on fpdf2 2.8.9).
+_DOCUMENT_BYTES = 32 * 1024
+_BYTES_PER_CHAR = 2
+
+_FONT = "report"
+_TITLE_COLOR = (106, 5, 127)  # the app's title purple
+_ROLE_LABELS = {"user": "You", "assistant": "JyotishAI"}
+
+
+def _font_files() -> tuple:
+    regular = os.environ.get(FONT_PATH_ENV, DEFAULT_FONT_PATH)
+    if not os.path.isfile(regular):
+        return None, None
+    bold = os.environ.get(BOLD_FONT_PATH_ENV, DEFAULT_BOLD_FONT_PATH)
+    return regular, bold if os.path.isfile(bold) else regular
+
+
+@functools.lru_cache(maxsize=None)
+def _report_class():
+    from fpdf import FPDF
+
+    class ReportPDF(FPDF):
+        """A4 document with a running title and page numbers on every page but the cover."""
+
+        report_title = ""
+
+        def header(self):
+            if self.page > 1:
+                self.set_font(self.report_font, size=8)
+                self.set_text_color(128)
+                self.cell(0, 6, self.report_title, align="R", new_x="LMARGIN", new_y="NEXT")
+                self.ln(2)
+                self.set_text_color(0)
+
+        def footer(self):
+            if self.page > 1:
+                self.set_y(-15)
+                self.set_font(self.report_font, size=8)
+                self.set_text_color(128)
+                self.cell(0, 10, f"Page {self.page_no()}", align="C")
+                self.set_text_color(0)
+
+    return ReportPDF
+
+
+@functools.lru_cache(maxsize=1)
+def _template():
+    """An empty document with the fonts loaded; copied for every new session."""
+    pdf = _report_class()(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=18)
+    regular, bold = _font_files()
+    if regular is not None:
+        pdf.add_font(_FONT, "", regular)
+        pdf.add_font(_FONT, "B", bold)
+        pdf.report_font = _FONT
+    else:
+        pdf.report_font = "Helvetica"
+    return pdf
+
+
+@functools.lru_cache(maxsize=1)
+def _document_bytes() -> int:
+    """Estimated memory of an open document before any text is laid out on it."""
+    regular, bold = _font_files()
+    fonts = {path for path in (regular, bold) if path is not None}
+    return _DOCUMENT_BYTES + sum(os.path.getsize(path) for path in fonts)
+
+
+def _printable(pdf, text) -> str:
+    """Drops characters the report font cannot draw (emoji) instead of printing blanks or failing."""
+    text = str(text).replace("**", "").replace("__", "")
+    font = pdf.fonts.get(_FONT)
+    if font is not None:
+        return "".join(ch for ch in text if ch in "\n\t" or ord(ch) in font.cmap)
+    return text.encode("latin-1", "ignore").decode("latin-1")
+
+
+def _heading(pdf, text: str, size: int = 14):
+    pdf.set_font(pdf.report_font, "B", size)
+    pdf.set_text_color(*_TITLE_COLOR)
+    pdf.multi_cell(0, size * 0.6, _printable(pdf, text), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_text_color(0)
+    pdf.ln(2)
+
+
+def _line(pdf, text: str, size: int = 11, bold: bool = False):
+    pdf.set_font(pdf.report_font, "B" if bold else "", size)
+    pdf.multi_cell(0, size * 0.55, _printable(pdf, text), new_x="LMARGIN", new_y="NEXT")
+
+
+def _static_pages(details: dict, chart_data: dict = None):
+    """The session's document with the cover and chart summary laid out, still open."""
+    pdf = copy.deepcopy(_template())
+    name = details.get("name", "")
+    pdf.report_title = _printable(pdf, f"Cosmic Report for {name}")
+    pdf.set_title(pdf.report_title)
+
+    pdf.add_page()
+    pdf.ln(50)
+    _heading(pdf, "JyotishAI Cosmic Report", size=24)
+    _line(pdf, name, size=16, bold=True)
+    pdf.ln(4)
+    for label, key in (("Date of birth", "dob"), ("Time of birth", "tob"), ("Place of birth", "pob"),
+                       ("Timezone", "timezone")):
+        if details.get(key) not in (None, ""):
+            _line(pdf, f"{label}: {details[key]}")
+    if details.get("latitude") is not None and details.get("longitude") is not None:
+        _line(pdf, f"Coordinates: {float(details['latitude']):.4f}, {float(details['longitude']):.4f}")
+    pdf.ln(6)
+    _line(pdf, f"Prepared on {datetime.date.today().isoformat()}", size=9)
+
+    if chart_data:
+        pdf.add_page()
+        _heading(pdf, "Planetary Positions")
+        for planet, position in chart_data.get("planet_positions", {}).items():
+            retrograde = " (retrograde)" if position.get("retrograde") else ""
+            _line(pdf, f"{planet}: {position['sign']} {position['degree']:.2f}°{retrograde}")
+        panchang = chart_data.get("basic_panchang") or {}
+        if panchang:
+            pdf.ln(4)
+            _heading(pdf, "Birth Panchang")
+            for key, value in panchang.items():
+                _line(pdf, f"{key.title()}: {value}")
+        doshas = chart_data.get("doshas") or []
+        if doshas:
+            pdf.ln(4)
+            _heading(pdf, "Doshas and Yogas")
+            for item in doshas:
+                _line(pdf, item["type"], bold=True)
+                if item.get("details"):
+                    _line(pdf, item["details"], size=10)
+        periods = chart_data.get("dasha_periods") or []
+        if periods:
+            pdf.ln(4)
+            _heading(pdf, "Vimshottari Mahadashas")
+            for period in periods:
+                _line(pdf, f"{period['planet']}: {period['start'][:10]} to {period['end'][:10]}")
+
+    pdf.add_page()
+    _heading(pdf, "Conversation")
+    return pdf
+
+
+def _append_message(pdf, message: dict):
+    role = message.get("role", "")
+    _line(pdf, _ROLE_LABELS.get(role, role.capitalize()), size=10, bold=True)
+    _line(pdf, message.get("content", ""))
+    pdf.ln(3)
+
+
+@functools.lru_cache(maxsize=None)
+def _font_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _output(pdf) -> bytes:
+    """
+    PDF bytes of a copy of `pdf`, leaving `pdf` open for more content. Copies share the
+    parsed fonts, but output() subsets the font it embeds in place, so the copy gets
+    fresh font tables of its own (parsed lazily from bytes read once per process).
+    The font attributes used here are fpdf2 internals, hence the pinned version.
+    """
+    from fontTools import ttLib
+
+    final = copy.deepcopy(pdf)
+    for font in final.fonts.values():
+        if getattr(font, "ttfont", None) is not None:
+            font.ttfont = ttLib.TTFont(io.BytesIO(_font_bytes(str(font.ttffile))), recalcTimestamp=False,
+                                       fontNumber=font.collection_font_number, lazy=True)
+    return bytes(final.output())
+
+
+def _digest(value) -> str:
+    canonical = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+
+def report_version(details: dict, history: list) -> str:
+    """Digest identifying the birth details and chat contents a report is rendered from."""
+    return _digest([details, [(m.get("role"), m.get("content")) for m in history]])
+
+
+class _SessionReport:
+    """The open documents and rendered versions of one session."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.static_key = None
+        self.pdf = None              # static pages + the messages in `rendered`
+        self.rendered = []           # digests of the messages laid out on `pdf`
+        self.laid_out_chars = 0      # characters of the messages in `rendered`
+        self.outputs = OrderedDict()  # version -> PDF bytes
+        self.size = 0                # estimated bytes, updated after every render
+
+    def estimate_size(self) -> int:
+        document = _document_bytes() + _BYTES_PER_CHAR * self.laid_out_chars if self.pdf is not None else 0
+        return document + sum(len(data) for data in self.outputs.values())
+
+
+class ReportRenderer:
+    """
+    Background PDF rendering with per-session incremental layout and a bytes cache.
+
+    Renders of one session run one at a time (they extend the same document); different
+    sessions render in parallel on the pool.
+
+    Args:
+        workers (int, optional): Render threads; defaults to JYOTISH_REPORT_WORKERS or 2.
+        max_bytes (int, optional): Estimated memory budget for all sessions; defaults to
+                                   JYOTISH_REPORT_CACHE_MB (or DEFAULT_CACHE_MB) megabytes.
+    """
+
+    def __init__(self, workers: int = None, max_bytes: int = None):
+        workers = workers or int(os.environ.get(WORKERS_ENV, "2"))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+        self._max_bytes = max_bytes or int(float(os.environ.get(CACHE_MB_ENV, DEFAULT_CACHE_MB)) * 1024 * 1024)
+        self._sessions = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._counters = {"renders": 0, "cache_hits": 0, "static_builds": 0, "messages_appended": 0,
+                          "full_relayouts": 0, "evictions": 0}
+
+    def _session(self, session_id: str) -> _SessionReport:
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or _SessionReport()
+            self._sessions[session_id] = session
+            return session
+
+    def _resize(self, session: _SessionReport):
+        """Records the session's new size and drops the least recently rendered others over the budget."""
+        size = session.estimate_size()
+        with self._lock:
+            session.size = size
+            total = sum(s.size for s in self._sessions.values())
+            # The session just rendered stays even if it alone exceeds the budget.
+            while total > self._max_bytes and len(self._sessions) > 1:
+                oldest_id = next(iter(self._sessions))
+                if self._sessions[oldest_id] is session:
+                    break
+                total -= self._sessions.pop(oldest_id).size
+                self._counters["evictions"] += 1
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self._counters[key] += n
+
+    def cached(self, session_id: str, details: dict, history: list):
+        """The finished report for this chat version, or None if it has not been rendered."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+        return session.outputs.get(report_version(details, history)) if session is not None else None
+
+    def render(self, session_id: str, details: dict, history: list, chart_data: dict = None) -> bytes:
+        """
+        Renders (or returns the cached) report synchronously. Runs on the pool via submit().
+
+        Args:
+            session_id (str): Identifies the chat whose document is extended.
+            details (dict): Birth details shown on the cover (app.py's session birth_details).
+            history (list[dict]): Chat messages {"role", "content"}, oldest first.
+            chart_data (dict, optional): calculator.py output for the chart summary page.
+
+        Returns:
+            bytes: The PDF.
+        """
+        version = report_version(details, history)
+        session = self._session(session_id)
+        with session.lock:
+            cached = session.outputs.get(version)
+            if cached is not None:
+                self._count("cache_hits")
+                return cached
+            with span("report.render", messages=len(history)) as rendering:
+                static_key = _digest([details, chart_data])
+                digests = [_digest([m.get("role"), m.get("content")]) for m in history]
+                if (session.pdf is None or session.static_key != static_key
+                        or digests[:len(session.rendered)] != session.rendered):
+                    # First render, new birth details, or earlier messages changed: start over.
+                    if session.pdf is not None and session.static_key == static_key:
+                        self._count("full_relayouts")
+                    session.pdf = _static_pages(details, chart_data)
+                    session.static_key, session.rendered, session.laid_out_chars = static_key, [], 0
+                    self._count("static_builds")
+                new_messages = history[len(session.rendered):]
+                for message in new_messages:
+                    _append_message(session.pdf, message)
+                session.rendered = digests
+                session.laid_out_chars += sum(len(str(m.get("content", ""))) for m in new_messages)
+                rendering.set(appended=len(new_messages))
+                self._count("messages_appended", len(new_messages))
+
+                data = _output(session.pdf)
+            session.outputs[version] = data
+            while len(session.outputs) > _VERSIONS_PER_SESSION:
+                session.outputs.popitem(last=False)
+            self._count("renders")
+            self._resize(session)
+            return data
+
+    def submit(self, session_id: str, details: dict, history: list, chart_data: dict = None) -> Future:
+        """
+        Schedules a render and returns at once. Repeated calls for the same chat version
+        share one render, and an already rendered version comes back as a finished future.
+        The arguments are copied, so the caller may keep mutating its history.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the PDF bytes.
+        """
+        cached = self.cached(session_id, details, history)
+        if cached is not None:
+            self._count("cache_hits")
+            future = Future()
+            future.set_result(cached)
+            return future
+        key = (session_id, report_version(details, history))
+        with self._lock:
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pool.submit(self.render, session_id, copy.deepcopy(details),
+                                           [dict(m) for m in history], copy.deepcopy(chart_data))
+                self._pending[key] = future
+                future.add_done_callback(lambda _, key=key: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._counters, sessions=len(self._sessions), pending=len(self._pending),
+                        estimated_bytes=sum(s.size for s in self._sessions.values()), max_bytes=self._max_bytes)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+
+@functools.lru_cache(maxsize=None)
+def get_report_renderer() -> ReportRenderer:
+    """The renderer shared by all sessions, created once per process."""
+    renderer = ReportRenderer()
+    register_stats("report", renderer.stats)
+    return renderer
+
+
+if __name__ == '__main__':
+    # Example usage for direct testing of this module
+    import time
+
+    from astrology_engine.calculator import calculate_chart
+
+    birth = {"name": "Test User", "gender": "Female", "dob": datetime.date(1990, 5, 15),
+             "tob": datetime.time(10, 30), "pob": "New Delhi, India", "timezone": "Asia/Kolkata",
+             "latitude": 28.6139, "longitude": 77.2090}
+    chart = calculate_chart(birth["name"], birth["gender"], birth["dob"], birth["tob"], birth["pob"],
+                            birth["timezone"], birth["latitude"], birth["longitude"])
+    chat = [{"role": "assistant", "content": "Welcome, seeker! ✨"}]
+    renderer = get_report_renderer()
+    for turn in range(3):
+        chat += [{"role": "user", "content": f"Question {turn}?"},
+                 {"role": "assistant", "content": "The stars suggest patience. " * 40}]
+        started = time.perf_counter()
+        pdf_bytes = renderer.submit("demo", birth, chat, chart).result()
+        print(f"{len(chat)} messages: {len(pdf_bytes)} bytes in {time.perf_counter() - started:.3f}s")
+    started = time.perf_counter()
+    renderer.submit("demo", birth, chat, chart).result()
+    print(f"Repeat download: {time.perf_counter() - started:.4f}s; stats {renderer.stats()}")
+    renderer.shutdown()
@@ -0,0 +1,134 @@
+# response_cache.py
+# This module caches the AI Astrologer's generated text so that repeat questions
+# skip `model.generate`, which takes several seconds per answer on CPU.
+#
+# Keys hash everything that determines the distribution of the answer: model name,
+# generation settings, system prompt, raw predictions and the normalized user query.
+# A follow-up answer depends on the person's chart and on the conversation so far, so
+# follow-up keys also hold the session id and a digest of the history; callers do not
+# cache follow-ups that have no session.
+# Each key can hold several sampled variants, and a random one is served so repeat
+# visitors do not always see the identical wording.
+
+import hashlib
+import json
+import os
+import random
+
+from astrology_engine.result_cache import TwoTierCache
+
+# Set to a file path to enable the on-disk tier, e.g. /var/cache/jyotish/responses.sqlite3.
+RESPONSE_CACHE_DB_ENV = "JYOTISH_RESPONSE_CACHE_DB"
+# Lifetime of a cached answer in seconds (default one week); 0 disables expiry.
+RESPONSE_CACHE_TTL_ENV = "JYOTISH_RESPONSE_CACHE_TTL"
+# Number of sampled variants collected per key before answers are served from cache.
+RESPONSE_VARIANTS_ENV = "JYOTISH_RESPONSE_VARIANTS"
+
+_DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+def normalize_query(query: str) -> str:
+    """Case-folds a user query, collapses whitespace and drops trailing punctuation."""
+    if not query:
+        return ""
+    return " ".join(query.casefold().split()).rstrip(" ?!.")
+
+
+def history_digest(conversation_history: list) -> str:
+    """Hex SHA-256 of the roles and contents of the chat messages, in order."""
+    turns = [[msg.get("role"), msg.get("content")] for msg in conversation_history or []]
+    return hashlib.sha256(json.dumps(turns, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def response_key(model_name: str, generation_config: dict, system_prompt: str, raw_predictions: list,
+                 user_query: str = None, session_id: str = None, conversation_history: list = None) -> str:
+    """
+    Cache key for one humanization request.
+
+    Args:
+        model_name (str): Model identifier.
+        generation_config (dict): Keyword arguments passed to `model.generate`.
+        system_prompt (str): The system prompt in use.
+        raw_predictions (list): Raw insights from the rule matcher, in order.
+        user_query (str, optional): The user's question; normalized before hashing.
+        session_id (str, optional): Chat session of a follow-up.
+        conversation_history (list, optional): Past chat messages of a follow-up.
+
+    Returns:
+        str | None: Hex SHA-256 digest; None for a follow-up without a session, which
+                    must not be cached since nothing ties the answer to one chart.
+    """
+    conversation = None
+    if user_query:
+        if session_id is None:
+            return None
+        conversation = [str(session_id), history_digest(conversation_history)]
+    payload = json.dumps(
+        [model_name, generation_config, system_prompt, list(raw_predictions or []), normalize_query(user_query),
+         conversation],
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Stores up to `variants_per_key` generated answers per key.
+
+    `get` returns None until the key has collected all its variants, so the caller keeps
+    sampling fresh answers (and `add`s them) for the first few requests; afterwards a
+    random stored variant is returned.
+
+    Args:
+        maxsize (int): Maximum number of keys kept in memory.
+        disk_path (str, optional): SQLite file for the on-disk tier.
+        ttl_seconds (float, optional): Lifetime of a key's variants. None means no expiry.
+        variants_per_key (int): Answers sampled per key before serving from cache.
+    """
+
+    def __init__(self, maxsize: int = 512, disk_path: str = None, ttl_seconds: float = None,
+                 variants_per_key: int = 1):
+        self.variants_per_key = max(1, variants_per_key)
+        self._cache = TwoTierCache("responses", maxsize=maxsize, disk_path=disk_path, ttl_seconds=ttl_seconds)
+
+    def get(self, key: str):
+        """A cached answer for `key`, or None if more variants should be generated first (or `key` is None)."""
+        if key is None:
+            return None
+        entry = self._cache.get(key)
+        if entry is None or len(entry["variants"]) < self.variants_per_key:
+            return None
+        return random.choice(entry["variants"])
+
+    def add(self, key: str, response_text: str):
+        """Records a freshly generated answer as one more variant of `key`; a None key is not cached."""
+        if key is None or not response_text:
+            return
+        def add_variant(entry):
+            variants = list((entry or {}).get("variants", []))
+            if response_text not in variants:
+                variants.append(response_text)
+            # Keep the newest variants if the setting was lowered since they were stored.
+            return {"variants": variants[-self.variants_per_key:]}
+
+        # Not a get/put pair: storing must not count as a lookup in the hit rate, and two
+        # concurrent adds for one key must not drop each other's variant.
+        self._cache.update(key, add_variant)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+def _ttl_from_env():
+    ttl = float(os.environ.get(RESPONSE_CACHE_TTL_ENV, _DEFAULT_TTL_SECONDS))
+    return ttl if ttl > 0 else None
+
+
+response_cache = ResponseCache(
+    disk_path=os.environ.get(RESPONSE_CACHE_DB_ENV),
+    ttl_seconds=_ttl_from_env(),
+    variants_per_key=int(os.environ.get(RESPONSE_VARIANTS_ENV, "1")),
+)
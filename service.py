@@ -0,0 +1,233 @@
+# service.py
+# This module serves the chart, rule and humanization pipeline over HTTP, without Streamlit.
+#
+# One asyncio process owns one model instance. Chart calculation and rule matching run on
+# a thread pool, so the event loop keeps accepting requests; humanization requests from all
+# clients go through the batching inference scheduler and are awaited as futures.
+#
+# Endpoints (JSON in, JSON out):
+#     GET  /health   model status and cache/scheduler metrics
+#     GET  /metrics  stage timings, token counts and cache hit rates in the Prometheus text format
+#     POST /chart    birth details -> chart
+#     POST /predict  birth details -> chart key and raw predictions (+ "interpretation" with "humanize": true)
+#     POST /chat     {"query", "history", "session_id", and "raw_predictions" or birth details} -> {"answer"}
+#                    (only the predictions relevant to the query are put in the prompt; see insight_retrieval.py)
+#
+# Birth details: {"name", "gender", "dob": "YYYY-MM-DD", "tob": "HH:MM", "pob",
+#                 "timezone" (default UTC), "latitude"/"longitude" (default: resolved from "pob")}
+# A "pob" that cannot be resolved without coordinates is a 400, not a chart at 0°N 0°E.
+#
+# Usage:
+#     python service.py --host 0.0.0.0 --port 8080 --telemetry --log-format json
+
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from ai_integrator import get_inference_scheduler, humanize_response_async, start_model_loading
+from astrology_engine.chart_cache import cache_stats, calculate_chart_cached, match_rules_cached
+from astrology_engine.birth_record import parse_birth_record
+from astrology_engine.rule_matcher import _load_all_rules_cached, rule_load_errors
+from insight_retrieval import index_session
+from response_cache import response_cache
+from telemetry import LOG_FORMAT_ENV, configure_logging, enable, metrics, prometheus_text, register_stats, span
+
+logger = logging.getLogger(__name__)
+
+_EXECUTOR = web.AppKey("executor", ThreadPoolExecutor)
+# Retry-After of the 503 answered to humanization requests while the model is loading.
+MODEL_LOADING_RETRY_SECONDS = 10
+
+
+def _bad_request(message: str):
+    return web.HTTPBadRequest(text=json.dumps({"error": message}), content_type="application/json")
+
+
+def parse_birth_details(payload: dict) -> dict:
+    """
+    Validates birth details from a request body (see birth_record.parse_birth_record).
+
+    Raises:
+        web.HTTPBadRequest: If a field is missing or malformed, or "pob" cannot be resolved
+                            and no coordinates were given.
+    """
+    try:
+        return parse_birth_record(payload)
+    except ValueError as e:
+        raise _bad_request(str(e))
+
+
+def _chart_and_predictions(details: dict) -> tuple:
+    with span("chart.calculate"):
+        chart_data = calculate_chart_cached(**details)
+    with span("rules.load"):
+        rules = _load_all_rules_cached()
+    with span("rules.match") as matching:
+        raw_predictions = match_rules_cached(chart_data, rules)
+        matching.set(predictions=len(raw_predictions))
+    return chart_data, raw_predictions
+
+
+def _relevant_insights(session_id, raw_predictions: list, query: str, chart_data: dict = None) -> list:
+    """The insights for a follow-up; the session's index is reused while its predictions are unchanged."""
+    insights = index_session(session_id, raw_predictions, _load_all_rules_cached(), chart_data)
+    return insights.search(query)
+
+
+async def _json_body(request: web.Request) -> dict:
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise _bad_request("Request body must be JSON")
+    if not isinstance(payload, dict):
+        raise _bad_request("Request body must be a JSON object")
+    return payload
+
+
+async def _run(request: web.Request, fn, *args):
+    """Runs blocking work on the service's thread pool, inside the request's trace."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(request.app[_EXECUTOR], context.run, fn, *args)
+
+
+async def _humanize(request: web.Request, raw_predictions, history=None, query=None, session_id=None) -> str:
+    status = start_model_loading().status
+    if status == "failed":
+        raise web.HTTPServiceUnavailable(text=json.dumps({"error": "AI model failed to load"}),
+                                         content_type="application/json")
+    if status == "loading":
+        # Waiting for the load would hold a pool thread per request and stall /chart behind them.
+        raise web.HTTPServiceUnavailable(text=json.dumps({"error": "AI model is still loading"}),
+                                         content_type="application/json",
+                                         headers={"Retry-After": str(MODEL_LOADING_RETRY_SECONDS)})
+    future = await _run(request, humanize_response_async, raw_predictions, history, query, session_id)
+    return await asyncio.wrap_future(future)
+
+
+async def health(request: web.Request) -> web.Response:
+    loader = start_model_loading()
+    body = {
+        "model": loader.status,
+        "rule_errors": rule_load_errors(),
+        "chart_cache": cache_stats(),
+        "response_cache": response_cache.stats(),
+    }
+    if loader.status == "ready":
+        scheduler = get_inference_scheduler()
+        body["scheduler"] = scheduler.stats() if scheduler is not None else None
+    return web.json_response(body)
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(text=prometheus_text(), content_type="text/plain", charset="utf-8",
+                        headers={"X-Content-Type-Options": "nosniff"})
+
+
+async def chart(request: web.Request) -> web.Response:
+    details = parse_birth_details(await _json_body(request))
+    chart_data = await _run(request, _traced_chart, details)
+    return web.json_response(chart_data)
+
+
+def _traced_chart(details: dict) -> dict:
+    with span("chart.calculate"):
+        return calculate_chart_cached(**details)
+
+
+async def predict(request: web.Request) -> web.Response:
+    payload = await _json_body(request)
+    details = parse_birth_details(payload)
+    chart_data, raw_predictions = await _run(request, _chart_and_predictions, details)
+    body = {"chart_key": chart_data["birth_details"]["cache_key"], "raw_predictions": raw_predictions}
+    if payload.get("humanize"):
+        body["interpretation"] = await _humanize(request, raw_predictions)
+    return web.json_response(body)
+
+
+async def chat(request: web.Request) -> web.Response:
+    payload = await _json_body(request)
+    query = payload.get("query")
+    if not query:
+        raise _bad_request("Missing field 'query'")
+    history = payload.get("history") or []
+    if not isinstance(history, list) or not all(isinstance(m, dict) and "role" in m and "content" in m
+                                                for m in history):
+        raise _bad_request("'history' must be a list of {\"role\", \"content\"} objects")
+
+    raw_predictions, chart_data = payload.get("raw_predictions"), None
+    if raw_predictions is None and "dob" in payload:
+        chart_data, raw_predictions = await _run(request, _chart_and_predictions, parse_birth_details(payload))
+    session_id = payload.get("session_id")
+    insights = await _run(request, _relevant_insights, session_id, raw_predictions or [], str(query), chart_data)
+    answer = await _humanize(request, insights, history, str(query), session_id)
+    return web.json_response({"answer": answer})
+
+
+@web.middleware
+async def _trace_requests(request: web.Request, handler):
+    """One trace per request; the handler's stages become its children."""
+    status = 500
+    with span("http.request", method=request.method, path=request.path) as trace:
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            trace.set(status=status)
+            metrics.inc("jyotish_http_requests_total", path=request.path, status=status)
+
+
+async def _on_startup(app: web.Application):
+    start_model_loading()  # background load; humanization requests before it finishes get a 503
+
+
+async def _on_cleanup(app: web.Application):
+    app[_EXECUTOR].shutdown(wait=False)
+
+
+def create_app(workers: int = None) -> web.Application:
+    """
+    Builds the HTTP application.
+
+    Args:
+        workers (int, optional): Threads for chart and rule work; defaults to the CPU count.
+    """
+    app = web.Application(client_max_size=1024 * 1024, middlewares=[_trace_requests])
+    app[_EXECUTOR] = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix="jyotish")
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.router.add_post("/chart", chart)
+    app.router.add_post("/predict", predict)
+    app.router.add_post("/chat", chat)
+    register_stats("cache", lambda: cache_stats()["charts"], cache="charts")
+    register_stats("cache", lambda: cache_stats()["predictions"], cache="predictions")
+    app.on_startup.append(_on_startup)
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve JyotishAI over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="Threads for chart and rule work.")
+    parser.add_argument("--telemetry", action="store_true", help="Record stage timings and generation metrics.")
+    parser.add_argument("--log-format", choices=("text", "json"), default=os.environ.get(LOG_FORMAT_ENV, "text"))
+    args = parser.parse_args()
+    configure_logging(args.log_format)
+    if args.telemetry:
+        enable()
+    web.run_app(create_app(args.workers), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+# telemetry.py
+# This module times the stages of the prediction pipeline and exports the results.
+#
+# Stages are wrapped in nested spans:
+#
+#     with span("chart.calculate"):
+#         ...
+#
+# Every finished span adds its duration to the `jyotish_stage_seconds` histogram, and
+# every finished top-level span is written to the "jyotish.trace" logger with its whole
+# tree of child spans, so one log line shows where a slow request spent its time.
+# Generations additionally record prompt tokens, generated tokens and tokens/sec
+# (record_generation), and cache hit rates are read from the caches' own stats() at
+# scrape time (register_stats). prometheus_text() renders everything in the Prometheus
+# text format; service.py serves it at /metrics, and start_metrics_server() serves it
+# for the Streamlit app.
+#
+# Telemetry is off unless JYOTISH_TELEMETRY=1 (or enable() is called). While it is off,
+# span() returns one shared no-op object and record_generation() returns at once, so the
+# instrumentation costs a function call and a flag check per stage.
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TELEMETRY_ENV = "JYOTISH_TELEMETRY"
+# "json" writes every log record, traces included, as one JSON object per line.
+LOG_FORMAT_ENV = "JYOTISH_LOG_FORMAT"
+# Port for the standalone /metrics endpoint of the Streamlit app (service.py has its own).
+METRICS_PORT_ENV = "JYOTISH_METRICS_PORT"
+
+# Histogram buckets: stage durations in seconds, generation speed in tokens/sec.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKENS_PER_SECOND_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 500.0)
+
+trace_logger = logging.getLogger("jyotish.trace")
+
+_enabled = os.environ.get(TELEMETRY_ENV, "0") == "1"
+_current_span = contextvars.ContextVar("jyotish_current_span", default=None)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(on: bool = True):
+    """Turns span recording and generation metrics on or off for the whole process."""
+    global _enabled
+    _enabled = on
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms, plus stats callbacks exported as gauges.
+    Label values are strings; each distinct label set is its own series.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._stats = {}
+
+    @staticmethod
+    def _series(name: str, labels: dict) -> tuple:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """Adds `value` to a counter."""
+        series = self._series(name, labels)
+        with self._lock:
+            self._counters[series] = self._counters.get(series, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets=LATENCY_BUCKETS, **labels):
+        """Records one observation in a histogram with the given upper bucket bounds."""
+        series = self._series(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(series)
+            if histogram is None:
+                histogram = self._histograms[series] = {"buckets": buckets, "counts": [0] * len(buckets),
+                                                        "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+                    break
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def register_stats(self, prefix: str, stats_fn, **labels):
+        """
+        Exports the numeric values of `stats_fn()` as gauges named `jyotish_<prefix>_<key>`.
+        Registering the same prefix and labels again replaces the callback.
+        """
+        with self._lock:
+            self._stats[self._series(prefix, labels)] = stats_fn
+
+    def render(self) -> str:
+        """All series in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {series: dict(h, counts=list(h["counts"])) for series, h in self._histograms.items()}
+            stats = dict(self._stats)
+
+        lines = []
+        for name, samples in _group(counters).items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        for name, samples in _group(histograms).items():
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in samples:
+                cumulative = 0
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', _number(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(histogram['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+
+        gauges = {}
+        for (prefix, labels), stats_fn in stats.items():
+            try:
+                values = stats_fn()
+            except Exception:
+                logging.getLogger(__name__).exception("Stats callback for '%s' failed", prefix)
+                continue
+            for key, value in (values or {}).items():
+                if isinstance(value, (int, float)):
+                    gauges[(f"jyotish_{prefix}_{key}", labels)] = float(value)
+        for name, samples in _group(gauges).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+def _group(series: dict) -> dict:
+    grouped = {}
+    for (name, labels), value in sorted(series.items(), key=lambda item: item[0]):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+metrics = MetricsRegistry()
+register_stats = metrics.register_stats
+
+
+class Span:
+    """
+    One timed stage. Use through `span()`; attributes can be added while it runs with `set`.
+    The parent is whichever span is open in the current context (thread, asyncio task,
+    or contextvars.Context copied into a worker).
+    """
+
+    __slots__ = ("name", "attributes", "parent", "children", "started_at", "seconds", "_started")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.children = []
+        self.started_at = None
+        self.seconds = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        _current_span.set(self)
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.seconds = time.perf_counter() - self._started
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.attributes["error"] = exc_type.__name__
+        # Restores the parent rather than resetting a token, so a streaming generator that
+        # is closed from another context cannot raise here.
+        _current_span.set(self.parent)
+        metrics.observe("jyotish_stage_seconds", self.seconds, stage=self.name)
+        if self.parent is not None:
+            self.parent.children.append(self)
+        else:
+            trace_logger.info("trace %s %.1f ms", self.name, self.seconds * 1000.0, extra={"trace": self.to_dict()})
+        return False
+
+    def to_dict(self) -> dict:
+        """The span and its finished children as plain data, durations in milliseconds."""
+        node = {"name": self.name, "ms": round((self.seconds or 0.0) * 1000.0, 3)}
+        if self.attributes:
+            node["attributes"] = self.attributes
+        if self.children:
+            node["children"] = [child.to_dict() for child in sorted(self.children, key=lambda c: c.started_at)]
+        return node
+
+
+class _NoopSpan:
+    """Stands in for Span while telemetry is off."""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attributes):
+    """
+    Context manager timing one pipeline stage, nested under the span that is currently open.
+
+    Args:
+        name (str): Stage name, e.g. "rules.match".
+        **attributes: Values to attach to the span (shown in the trace log).
+
+    Returns:
+        Span: Or a shared no-op object while telemetry is off.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name: str):
+    """Decorator form of `span` for whole functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """The innermost open span, or the no-op span if there is none or telemetry is off."""
+    return (_current_span.get() if _enabled else None) or _NOOP_SPAN
+
+
+def record_generation(prompt_tokens: int, generated_tokens: int, seconds: float, mode: str = "stream"):
+    """
+    Records one model generation (or one batch of them).
+
+    Args:
+        prompt_tokens (int): Tokens fed to the model (all rows of a batch).
+        generated_tokens (int): Tokens the model produced.
+        seconds (float): Wall time of the generation.
+        mode (str): "stream" or "batch", used as a label.
+    """
+    if not _enabled:
+        return
+    tokens_per_second = generated_tokens / seconds if seconds > 0 else 0.0
+    metrics.inc("jyotish_generations_total", mode=mode)
+    metrics.inc("jyotish_prompt_tokens_total", prompt_tokens, mode=mode)
+    metrics.inc("jyotish_generated_tokens_total", generated_tokens, mode=mode)
+    metrics.observe("jyotish_generation_tokens_per_second", tokens_per_second, TOKENS_PER_SECOND_BUCKETS, mode=mode)
+    current_span().set(prompt_tokens=prompt_tokens, generated_tokens=generated_tokens,
+                       tokens_per_second=round(tokens_per_second, 2))
+
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    return metrics.render()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as single-line JSON objects; traces are included as a nested "trace" field."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        trace = getattr(record, "trace", None)
+        if trace is not None:
+            entry["trace"] = trace
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(log_format: str = "text", level: int = logging.INFO):
+    """Sets up the root logger with plain-text or JSON output on stderr."""
+    handler = logging.StreamHandler()
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes every few seconds would flood the log
+
+
+@functools.lru_cache(maxsize=None)
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """Serves /metrics on a daemon thread; cached, so only the first call per port starts a server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
+
+
+@functools.lru_cache(maxsize=None)
+def configure_from_env():
+    """
+    Applies JYOTISH_LOG_FORMAT and JYOTISH_METRICS_PORT once per process
+    (JYOTISH_TELEMETRY is read at import).
+    """
+    if os.environ.get(LOG_FORMAT_ENV) == "json":
+        configure_logging("json")
+    port = os.environ.get(METRICS_PORT_ENV)
+    if port:
+        start_metrics_server(int(port))